@@ -0,0 +1,77 @@
+# benchmarks/bench_audio.py
+# The playback engine against the null device: latency from play() to the (pretend)
+# sound card, underruns with a TTS that keeps up, how fast stop() silences a long
+# reply (barge-in) and what one audio callback costs.
+import time
+
+import numpy as np
+
+from harness import scenario, ms
+from components.audio_output import AudioOutput
+
+RATE = 22050
+BLOCK = 256
+
+
+def _speech(seconds, rate=RATE):
+    # a wobbling tone is close enough to speech for level taps and buffering
+    t = np.arange(int(seconds * rate)) / rate
+    wave = 0.4 * np.sin(2 * np.pi * 180 * t) * (0.6 + 0.4 * np.sin(2 * np.pi * 3 * t))
+    return (wave * 32767).astype(np.int16)
+
+
+@scenario("audio_output")
+def audio_output():
+    out = AudioOutput(samplerate=RATE, blocksize=BLOCK, buffer_seconds=5.0, device="null")
+    levels = []
+    out.level_taps.append(lambda level: levels.append((time.perf_counter(), level)))
+    out.start()
+    try:
+        # 1) a TTS producing 100 ms chunks a bit faster than real time, 16 kHz so it gets resampled
+        chunk = _speech(0.1, rate=16000)
+        for _ in range(10):
+            out.play(chunk, samplerate=16000)
+            time.sleep(0.08)
+        out.wait(timeout=5.0)
+        streaming = out.stats()
+
+        # from idle, averaged since it depends on where the callback is in its cycle
+        firsts = []
+        for _ in range(8):
+            out.latencies.clear()
+            out.play(chunk, samplerate=16000)
+            out.wait(timeout=1.0)
+            firsts.append(out.latencies[0])
+        first_audio_s = sum(firsts) / len(firsts)
+
+        # 2) barge-in: a long reply is queued, the user talks over it
+        out.play(_speech(4.0))
+        time.sleep(0.2)
+        stopped_at = time.perf_counter()
+        out.stop()
+        time.sleep(0.1)
+        silent = [t for t, level in levels if t > stopped_at and level == 0.0]
+        stop_s = (silent[0] - stopped_at) if silent else 1.0
+        queued_after_stop = out.ring.available()
+    finally:
+        out.close()
+
+    # 3) callback cost with a full buffer, called directly
+    probe = AudioOutput(samplerate=RATE, blocksize=BLOCK, buffer_seconds=2.0, device="null", volume=0.8)
+    probe.level_taps.append(lambda level: None)
+    block = np.zeros((BLOCK, 1), dtype=np.float32)
+    probe.ring.write(probe._to_frames(_speech(1.9), RATE))
+    n_calls = probe.ring.available() // BLOCK
+    start = time.perf_counter()
+    for _ in range(n_calls):
+        probe._callback(block, BLOCK, None, None)
+    callback_s = (time.perf_counter() - start) / n_calls
+
+    return {
+        "first_audio_ms": ms(first_audio_s),
+        "queued_latency_ms_p50": round(streaming['latency_ms_p50'], 3),
+        "underruns": streaming['underruns'],
+        "stop_ms": ms(stop_s),
+        "stop_flushed_rate": float(queued_after_stop == 0),
+        "callback_us": round(callback_s * 1e6, 2),
+    }
@@ -0,0 +1,51 @@
+# benchmarks/bench_autotune.py
+# Calibration on a fake 8-core machine: how much the tuned settings beat the hard-coded
+# defaults, how long calibration takes, and that router.get_backend applies the result.
+import os
+import tempfile
+import time
+
+import config
+from harness import scenario, local_backend, ms, quiet
+from fakes import FakeLlama, install_fake_llama, write_gguf
+from components.autotune import calibrate, save_tuned_params
+
+
+@scenario("autotune")
+def autotune():
+    install_fake_llama()
+    FakeLlama.tokens_per_second = 800.0
+    FakeLlama.prompt_tokens_per_second = 8000.0
+    FakeLlama.load_seconds = 0.0
+    FakeLlama.hardware_cores = 8
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            model_path = os.path.join(tmp, "bench-tune.gguf")
+            write_gguf(model_path)
+
+            start = time.perf_counter()
+            with quiet():
+                result = calibrate(model_path, ram_budget_mb=4096, max_threads=16)
+            elapsed = time.perf_counter() - start
+
+            user_config = os.path.join(tmp, "user_config.json")
+            save_tuned_params(user_config, model_path, result)
+
+            saved = config.USER_CONFIG_PATH
+            config.USER_CONFIG_PATH = user_config
+            try:
+                # tuned entries are keyed by file name + size, so the copy local_backend makes matches
+                with local_backend(filename="bench-tune.gguf") as backend:
+                    pass
+            finally:
+                config.USER_CONFIG_PATH = saved
+    finally:
+        FakeLlama.hardware_cores = None
+        FakeLlama.load_seconds = 0.05
+
+    applied = all(backend.llama_params.get(k) == result[k] for k in ("n_threads", "n_batch", "n_ctx"))
+    return {
+        "calibrate_ms": ms(elapsed),
+        "tuned_speedup": round(result["default_turn_seconds"] / result["turn_seconds"], 2),
+        "tuned_applied_rate": 1.0 if applied else 0.0,
+    }
@@ -0,0 +1,88 @@
+# benchmarks/bench_chat.py
+# End-to-end chat turns through router.get_backend -> ChatSession -> TextToSpeech
+# with the fake llama, fake OpenAI server and fake TTS sink standing in.
+import os
+import tempfile
+import time
+
+from harness import (
+    scenario, local_backend, remote_backend, run_turn, summarize_turns, ms, quiet,
+)
+from fakes import FakeLlama, FakeOpenAIServer, install_fake_llama, make_fake_tts
+from components.chat_log import ChatLog
+
+PROMPTS = [
+    "Hello K2SO",
+    "What is the weather like?",
+    "Tell me a joke",
+    "What are the odds of surviving an asteroid field?",
+    "Summarize the plans for the mission in two sentences.",
+]
+TURNS = 10
+
+
+def _chat(backend, tts):
+    session = backend.start_chat()
+    return [run_turn(session, tts, PROMPTS[i % len(PROMPTS)]) for i in range(TURNS)]
+
+
+@scenario("local_chat")
+def local_chat():
+    install_fake_llama()
+    FakeLlama.tokens_per_second = 200.0
+    FakeLlama.prompt_tokens_per_second = 2000.0
+    FakeLlama.reply_tokens = 48
+
+    with quiet():
+        tts = make_fake_tts()
+
+    start = time.perf_counter()
+    with local_backend() as backend:
+        load = time.perf_counter() - start
+        metrics = summarize_turns(_chat(backend, tts))
+
+    metrics["load_ms"] = ms(load)
+    return metrics
+
+
+@scenario("remote_chat")
+def remote_chat():
+    with quiet():
+        tts = make_fake_tts()
+
+    with FakeOpenAIServer(latency=0.02, reply_tokens=48) as server:
+        with remote_backend(server) as backend:
+            start = time.perf_counter()
+            turns = _chat(backend, tts)
+            elapsed = time.perf_counter() - start
+            kept_errors, kept_replies = _failed_turn(server, backend)
+
+    metrics = summarize_turns(turns)
+    # a remote reply arrives in one piece, so report requests/s instead of tokens/s
+    metrics.pop("tokens_per_s")
+    metrics["turns_per_s"] = round(len(turns) / elapsed, 2)
+    metrics["failed_turns_recorded"] = kept_errors  # error text kept as an assistant turn
+    metrics["ok_turns_recorded"] = kept_replies
+    return metrics
+
+
+def _failed_turn(server, backend):
+    # a 503 reply is shown to the user but must not end up in history or the chat log
+    saved = backend.retries
+    backend.retries = 0
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            with quiet():
+                chat_log = ChatLog(os.path.join(tmp, "chat_log.db"))
+            session = backend.start_chat(chat_log=chat_log)
+            server.httpd.fail_next = 1
+            session.send_message("are you there?")
+            session.send_message("are you there now?")
+            chat_log.flush()
+            logged = [turn['assistant'] for turn in chat_log.recent_turns(10)]
+            chat_log.close()
+    finally:
+        backend.retries = saved
+    kept = [turn['assistant'] for turn in session.history] + logged
+    errors = sum(reply.startswith("Error contacting") for reply in kept)
+    return errors, len(kept) - errors
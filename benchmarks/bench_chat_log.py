@@ -0,0 +1,74 @@
+# benchmarks/bench_chat_log.py
+# Chat log cost as seen by the chat loop (append), background write throughput,
+# full-text search over a large history and the startup reload of recent turns.
+import os
+import tempfile
+import time
+
+from harness import scenario, ms, quiet
+from fakes import fake_reply
+from components.chat_log import ChatLog
+
+HISTORY_TURNS = 50000  # a few months of heavy daily use
+APPENDS = 2000
+QUERIES = ["asteroid", "rebellion plans", "weather tomorrow", "probability captain"]
+TOPICS = ["asteroid", "weather", "rebellion", "music", "timer", "recipe", "captain", "mission"]
+
+
+def _seed(chat_log, n):
+    for i in range(n):
+        topic = TOPICS[i % len(TOPICS)]
+        chat_log.append(f"question {i} about the {topic} today", "".join(fake_reply(topic + str(i), 24)))
+    chat_log.flush()
+
+
+@scenario("chat_log")
+def chat_log_bench():
+    with tempfile.TemporaryDirectory() as tmp:
+        with quiet():
+            chat_log = ChatLog(os.path.join(tmp, "chat_log.db"))
+
+        start = time.perf_counter()
+        _seed(chat_log, HISTORY_TURNS)
+        seed_elapsed = time.perf_counter() - start
+
+        # what the chat loop pays per turn
+        start = time.perf_counter()
+        for i in range(APPENDS):
+            chat_log.append(f"follow up {i}", "noted")
+        append_elapsed = time.perf_counter() - start
+        chat_log.flush()
+
+        searches = []
+        for q in QUERIES * 5:
+            start = time.perf_counter()
+            chat_log.search(q)
+            searches.append(time.perf_counter() - start)
+
+        # startup path: a fresh process opening the log and loading context
+        chat_log.close()
+        start = time.perf_counter()
+        with quiet():
+            reopened = ChatLog(os.path.join(tmp, "chat_log.db"))
+        reopened.recent_turns(4)
+        reload_elapsed = time.perf_counter() - start
+
+        # sqlite builds without fts5 fall back to LIKE, where % and _ in user text are wildcards
+        reopened.has_fts = False
+        reopened.append("battery at 100% now", "charged")
+        reopened.append("battery at 1000 mAh", "big one")
+        reopened.append("rename it to snake_case", "done")
+        reopened.append("rename it to snakeXcase", "done")
+        reopened.flush()
+        literal = [(q, reopened.search(q)) for q in ("100%", "snake_case")]
+        wildcard_hits = sum(q not in turn['user'] for q, turns in literal for turn in turns)
+        reopened.close()
+
+    return {
+        "append_us": round(append_elapsed / APPENDS * 1e6, 2),
+        "write_turns_per_s": round(HISTORY_TURNS / seed_elapsed, 1),
+        "search_ms_max": ms(max(searches)),
+        "search_ms_avg": ms(sum(searches) / len(searches)),
+        "reload_ms": ms(reload_elapsed),
+        "like_wildcard_matches": wildcard_hits,  # turns matched only through an unescaped % / _
+    }
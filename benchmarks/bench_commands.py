@@ -0,0 +1,93 @@
+# benchmarks/bench_commands.py
+# Command turns ("turn it down to 30") three ways on a Pi-speed fake model:
+#   free text: the old path, a normal reply asked to contain JSON, decoded to the end and parsed
+#   early stop: the same unconstrained stream, read only up to the object's closing brace
+#   grammar: GBNF-constrained (what LocalModel.stream_structured does), closed at the brace
+# All three should come out with the same parsed commands, the last two much sooner.
+import time
+
+from harness import scenario, local_backend, ms, quiet
+from fakes import FakeLlama, FakeLlamaGrammar, install_fake_llama
+from components.commands import default_commands, read_object, request_command, Command
+
+REQUESTS = [
+    ("turn it down to thirty percent", '{"action":"set_volume","level":30}', Command("set_volume", {"level": 30})),
+    ("shut up for a second", '{"action":"stop_speaking"}', Command("stop_speaking")),
+    ("what did we say about the rebellion plans", '{"action":"search_history","query":"rebellion plans"}',
+     Command("search_history", {"query": "rebellion plans"})),
+    ("use the bars animation", '{"action":"set_animation","mode":"frequency"}',
+     Command("set_animation", {"mode": "frequency"})),
+    ("switch to the phi model", '{"action":"switch_model","name":"bench-phi3"}',
+     Command("switch_model", {"name": "bench-phi3"})),
+]
+
+
+def _run(fn):
+    times, tokens, correct = [], 0, 0
+    for request, reply, expected in REQUESTS:
+        FakeLlama.command_reply = reply
+        start = time.perf_counter()
+        try:
+            command, n = fn(request)
+        except ValueError:
+            command, n = None, 0
+        times.append(time.perf_counter() - start)
+        tokens += n
+        correct += command == expected
+    return sum(times) / len(times), tokens / len(REQUESTS), correct / len(REQUESTS)
+
+
+@scenario("structured_commands")
+def structured_commands():
+    install_fake_llama()
+    FakeLlama.tokens_per_second = 20.0  # a small model decoding on a Pi 5, roughly
+    FakeLlama.reply_tokens = 96
+    commands = default_commands(["bench-phi3", "bench-remote"])
+    try:
+        with local_backend() as backend:
+            session = backend.start_chat(history_turns=4)
+
+            def free_text(request):
+                reply = session.send_message(commands.prompt(request), record=False)
+                return commands.parse(reply), backend.last_decode['tokens']
+
+            def early_stop(request):
+                text, n = read_object(backend.stream_response(commands.prompt(request), 256))
+                return commands.parse(text), n
+
+            def grammar(request):
+                command = request_command(session, commands, request)
+                return command, backend.last_decode['tokens'] + 1
+
+            with quiet():
+                free_s, free_tokens, free_ok = _run(free_text)
+                early_s, early_tokens, early_ok = _run(early_stop)
+                parsed_before = FakeLlamaGrammar.parsed
+                grammar_s, grammar_tokens, grammar_ok = _run(grammar)
+                grammar_parses = FakeLlamaGrammar.parsed - parsed_before
+    finally:
+        FakeLlama.command_reply = None
+        FakeLlama.tokens_per_second = 200.0
+        FakeLlama.reply_tokens = 48
+
+    # parsing/validation on its own, without the model
+    text = '{"action":"search_history","query":"odds of \\"success\\""}'
+    start = time.perf_counter()
+    for _ in range(2000):
+        commands.parse(text)
+    parse_us = (time.perf_counter() - start) / 2000 * 1e6
+
+    return {
+        "free_text_command_ms": ms(free_s),
+        "early_stop_command_ms": ms(early_s),
+        "grammar_command_ms": ms(grammar_s),
+        "grammar_speedup": round(free_s / grammar_s, 2),
+        "free_text_tokens": round(free_tokens, 1),
+        "grammar_tokens": round(grammar_tokens, 1),
+        "early_stop_tokens": round(early_tokens, 1),
+        "free_text_correct_rate": free_ok,
+        "grammar_correct_rate": grammar_ok,
+        "early_stop_correct_rate": early_ok,
+        "grammar_parses": grammar_parses,  # once per model, not once per command
+        "parse_us": round(parse_us, 1),
+    }
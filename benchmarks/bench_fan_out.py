@@ -0,0 +1,77 @@
+# benchmarks/bench_fan_out.py
+# Several remote prompts at once (components/fan_out.py) against two fake servers with injected
+# latency, standing in for a small and a big model on the LAN. Asked one after another, the
+# batch takes the sum of the latencies; fanned out it should take about as long as the slowest
+# request. With a per-server limit, no more than that many requests are in flight on that server.
+# Fanned-out requests should go through the shared httpx client (RemoteModel._apost), and a
+# server answering 503 once should still get its reply after a retry.
+import time
+
+from harness import scenario, ms, quiet
+from fakes import FakeOpenAIServer
+from components.fan_out import ask_all, close_client
+from components.remote_model import RemoteModel
+
+PROMPTS = [
+    "What are the odds of surviving an asteroid field?",
+    "Summarize the plans for the mission in two sentences.",
+    "Tell me a joke",
+    "What is the weather like?",
+]
+FAST, SLOW = 0.15, 0.3  # seconds per request on each server
+
+
+@scenario("remote_fan_out")
+def remote_fan_out():
+    with FakeOpenAIServer(latency=FAST) as small, FakeOpenAIServer(latency=SLOW) as big:
+        tiny = RemoteModel({"url": small.url}, max_concurrency=8)
+        deepseek = RemoteModel({"url": big.url}, max_concurrency=8)
+        # every prompt to both models, like /compare for each
+        requests = [(backend, prompt) for prompt in PROMPTS for backend in (tiny, deepseek)]
+
+        with quiet():
+            start = time.perf_counter()
+            sequential = [backend.generate_response(prompt) for backend, prompt in requests]
+            sequential_s = time.perf_counter() - start
+
+            # the client is made once per run of the assistant, not per batch
+            start = time.perf_counter()
+            ask_all([(tiny, PROMPTS[0])])
+            first_batch_s = time.perf_counter() - start
+
+            agents_before = small.user_agents.get("python-httpx", 0) + big.user_agents.get("python-httpx", 0)
+            start = time.perf_counter()
+            fanned = ask_all(requests)
+            fan_out_s = time.perf_counter() - start
+            httpx_requests = small.user_agents.get("python-httpx", 0) + big.user_agents.get("python-httpx", 0) - agents_before
+
+            # the same eight requests to the slow server only, at most two at a time there
+            limited = RemoteModel({"url": big.url, "max_concurrency": 2})
+            peak_before = big.peak_in_flight
+            big.httpd.peak_in_flight = 0
+            start = time.perf_counter()
+            ask_all([(limited, prompt) for prompt in PROMPTS * 2])
+            limited_s = time.perf_counter() - start
+            limited_peak = big.peak_in_flight
+
+            # a transient 503 is retried (after the backoff) instead of coming back as an error
+            big.httpd.fail_next = 1
+            attempts_before = sum(big.user_agents.values())
+            [retried] = ask_all([(deepseek, PROMPTS[0])])
+            retried_ok = retried['reply'] == sequential[1] and sum(big.user_agents.values()) - attempts_before == 2
+            close_client()
+
+    return {
+        "sequential_ms": ms(sequential_s),
+        "first_batch_ms": ms(first_batch_s),  # includes making the client
+        "fan_out_ms": ms(fan_out_s),
+        "fan_out_speedup": round(sequential_s / fan_out_s, 2),
+        # 1.0 would be exactly the slowest single request
+        "fan_out_vs_slowest": round(fan_out_s / SLOW, 2),
+        "fan_out_peak_in_flight_rate": round(peak_before / len(PROMPTS), 2),
+        "limited_ms": ms(limited_s),
+        "limited_peak_in_flight": limited_peak,
+        "reply_match_rate": sum(a == b['reply'] for a, b in zip(sequential, fanned)) / len(requests),
+        "httpx_request_rate": round(httpx_requests / len(requests), 2),
+        "retried_reply_rate": float(retried_ok),
+    }
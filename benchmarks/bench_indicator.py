@@ -0,0 +1,104 @@
+# benchmarks/bench_indicator.py
+# Fullscreen (1920x1080) indicator frames: the classic renderer (recompute radii, jitter and
+# color strings, recreate every canvas item each frame) vs the atlas renderer (look the frame
+# up, move a fixed set of items). There is no display here, so the canvas is a counting fake.
+# The times are the Python side of a frame, the canvas calls are what Tk would have to do.
+# State changes recreate the center circle; the atlas must not keep state for deleted items.
+import math
+import time
+
+from harness import scenario, ms, quiet
+from fakes import FakeCanvas
+from components.ai_indicator import AIIndicator, AIState
+from components.indicator_atlas import RIPPLE_LOOP, BAR_LOOP, LEVELS
+
+FRAMES = 600  # 20 s at 30 fps
+WIDTH, HEIGHT = 1920, 1080
+
+
+def _indicator(renderer, mode):
+    indicator = AIIndicator(fullscreen=True, animation_mode=mode, renderer=renderer)
+    indicator.canvas = FakeCanvas()
+    indicator.canvas_width, indicator.canvas_height = WIDTH, HEIGHT
+    indicator.center_x, indicator.center_y = WIDTH // 2, HEIGHT // 2
+    indicator.base_radius = int(60 * HEIGHT / 400)
+    indicator.wave_amplitude = int(20 * HEIGHT / 400)
+    with quiet():
+        indicator._draw_elements()
+        if renderer == "atlas":
+            from components.indicator_atlas import AtlasRenderer
+            indicator.atlas = AtlasRenderer(indicator.canvas, WIDTH, HEIGHT, indicator.base_radius,
+                                            indicator.wave_amplitude, indicator.wave_count, indicator.colors)
+        indicator.set_state(AIState.SPEAKING)
+    return indicator
+
+
+def _level(frame):
+    # speech-ish envelope: syllables on top of phrases
+    return max(0.0, 0.5 * math.sin(frame * 0.7) * (0.6 + 0.4 * math.sin(frame * 0.05)) + 0.3)
+
+
+def _run(indicator):
+    offsets = [0.3 * i for i in range(indicator.wave_count)]
+    step = indicator._animate_atlas if indicator.atlas else (
+        (lambda frame: indicator._animate_water_ripples(frame, offsets)) if indicator.animation_mode == "ripples"
+        else indicator._animate_audio_waveform)
+    indicator.canvas.reset_calls()
+    times = []
+    for frame in range(FRAMES):
+        indicator.audio_level = _level(frame)
+        start = time.perf_counter()
+        step(frame)
+        times.append(time.perf_counter() - start)
+    calls = indicator.canvas.calls
+    times.sort()
+    return {
+        'frame_s': sum(times) / len(times),
+        'frame_p95_s': times[int(len(times) * 0.95)],
+        'ops': sum(calls.values()) / FRAMES,
+        'created': calls['create'] / FRAMES,
+    }
+
+
+@scenario("indicator_render")
+def indicator_render():
+    results = {}
+    for mode in ("ripples", "frequency"):
+        for renderer in ("classic", "atlas"):
+            indicator = _indicator(renderer, mode)
+            if renderer == "atlas":
+                # the atlas fills itself lazily, time a cold pass over every phase and level
+                start = time.perf_counter()
+                loop = RIPPLE_LOOP if mode == "ripples" else BAR_LOOP
+                for frame in range(loop):
+                    for level in range(LEVELS):
+                        indicator.audio_level = (level + 0.5) / LEVELS
+                        indicator._animate_atlas(frame)
+                results[f"{mode}_atlas_fill_ms"] = ms(time.perf_counter() - start)
+            results[(mode, renderer)] = _run(indicator)
+
+    indicator = _indicator("atlas", "ripples")
+    with quiet():
+        for frame in range(60):
+            indicator.set_state((AIState.IDLE, AIState.PROCESSING, AIState.SPEAKING)[frame % 3])
+            indicator._animate_atlas(frame)
+    live = set(indicator.atlas.rings) | set(indicator.atlas.bars) | {indicator.center_circle}
+    stale_items = sum(item not in live for item in indicator.atlas._last)
+
+    ripples_classic, ripples_atlas = results[("ripples", "classic")], results[("ripples", "atlas")]
+    bars_classic, bars_atlas = results[("frequency", "classic")], results[("frequency", "atlas")]
+    return {
+        "ripples_classic_frame_us": round(ripples_classic['frame_s'] * 1e6, 1),
+        "ripples_atlas_frame_us": round(ripples_atlas['frame_s'] * 1e6, 1),
+        "ripples_atlas_frame_us_p95": round(ripples_atlas['frame_p95_s'] * 1e6, 1),
+        "ripples_speedup": round(ripples_classic['frame_s'] / ripples_atlas['frame_s'], 2),
+        "bars_classic_frame_us": round(bars_classic['frame_s'] * 1e6, 1),
+        "bars_atlas_frame_us": round(bars_atlas['frame_s'] * 1e6, 1),
+        "bars_speedup": round(bars_classic['frame_s'] / bars_atlas['frame_s'], 2),
+        "ripples_classic_canvas_ops": round(ripples_classic['ops'], 1),
+        "ripples_atlas_canvas_ops": round(ripples_atlas['ops'], 1),
+        "atlas_items_created_per_frame": max(ripples_atlas['created'], bars_atlas['created']),
+        "ripples_atlas_fill_ms": results["ripples_atlas_fill_ms"],
+        "frequency_atlas_fill_ms": results["frequency_atlas_fill_ms"],
+        "atlas_stale_items": stale_items,  # after 60 state changes
+    }
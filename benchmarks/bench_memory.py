@@ -0,0 +1,117 @@
+# benchmarks/bench_memory.py
+# The memory budget: does the plan fit a q4 Phi-3-mini + Whisper + the rest into Pi-sized
+# budgets, what the low-memory profile lands on for a 4 GB Pi, whether the RSS / mapped
+# file accounting sees what was actually loaded, and how fast the watchdog reacts. Background
+# swapping must not count as pressure, and one pressure event must not repeat every tick.
+import mmap
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from harness import scenario, ms, quiet
+from fakes import write_gguf
+from components.model_registry import ModelRegistry
+from components import memory_budget as budget_module
+from components.memory_budget import MemoryProfile, plan_runtime, mapped_files_mb, rss_mb, DEFAULT_COMPONENTS
+
+MODEL_BYTES = 2_300_000_000  # Phi-3-mini-4k-instruct-q4.gguf
+BUDGETS = [3200, 3481, 4000, 6000]  # 3481 = 85% of a 4 GB Pi
+PARAMS = {'n_ctx': 4096, 'n_threads': 4, 'use_mmap': True, 'use_mlock': False}
+
+
+def _plan(info, budget, low_memory=False):
+    return plan_runtime(info, PARAMS, budget, components=DEFAULT_COMPONENTS, whisper_size="base",
+                        embedder=True, low_memory=low_memory)
+
+
+@scenario("memory_budget")
+def memory_budget():
+    with tempfile.TemporaryDirectory() as models_dir:
+        write_gguf(os.path.join(models_dir, "phi3-q4.gguf"), tensor_bytes=MODEL_BYTES)
+        info = ModelRegistry(models_dir).info("phi3-q4.gguf")
+
+        plans = [_plan(info, budget) for budget in BUDGETS]
+        start = time.perf_counter()
+        for _ in range(200):
+            _plan(info, 3000)
+        plan_s = (time.perf_counter() - start) / 200
+        pi = _plan(info, 3481, low_memory=True)
+        too_small = _plan(info, 2600)  # less than the weights + tiny whisper + python
+
+        # a model-sized file mmap'd and touched like llama.cpp does with the weights
+        path = os.path.join(models_dir, "weights.bin")
+        with open(path, "wb") as f:
+            f.truncate(64 * 1024 * 1024)
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            sum(mm[i] for i in range(0, len(mm), 4096))
+            mapped = mapped_files_mb().get(path, 0)
+
+        profile = MemoryProfile(budget_mb=100000)
+        with profile.track("buffer"):
+            buffer = np.ones(48 * 1024 * 1024 // 8)  # 48 MB, touched
+        tracked = profile.components["buffer"]
+        del buffer
+
+        start = time.perf_counter()
+        for _ in range(20):
+            report = profile.report()
+        report_s = (time.perf_counter() - start) / 20
+        start = time.perf_counter()
+        for _ in range(50):
+            profile.check()
+        check_s = (time.perf_counter() - start) / 50
+
+        # budget below what the process already uses: the watchdog must call for help
+        reacted = []
+        tight = MemoryProfile(budget_mb=1)
+        tight.pressure_callbacks.append(lambda reason: reacted.append(time.perf_counter()))
+        with quiet():
+            start = time.perf_counter()
+            tight.start_watchdog(interval=0.05)
+            while not reacted and time.perf_counter() - start < 2.0:
+                time.sleep(0.005)
+            time.sleep(0.5)  # ten more ticks, still over budget
+            tight.stop_watchdog()
+
+        # swap-out counter driven by hand: a trickle vs a steady stream while near the budget
+        swapped = [0]
+        real_pages_swapped_out = budget_module.pages_swapped_out
+        budget_module.pages_swapped_out = lambda: swapped[0]
+        try:
+            near = MemoryProfile(budget_mb=int(rss_mb() * 1.05) + 1, cooldown_s=0)
+            idle = MemoryProfile(budget_mb=100000, cooldown_s=0)
+            with quiet():
+                trickle, storm, storm_idle = [], [], []
+                for _ in range(5):
+                    time.sleep(0.02)
+                    swapped[0] += 1  # ~50 pages/s
+                    trickle.append(near.check())
+                for _ in range(5):
+                    time.sleep(0.02)
+                    swapped[0] += 200  # ~10000 pages/s
+                    storm.append(near.check())
+                    storm_idle.append(idle.check())
+        finally:
+            budget_module.pages_swapped_out = real_pages_swapped_out
+
+    return {
+        "plan_fit_rate": sum(p['fits'] for p in plans) / len(plans),
+        "plan_untouched_rate": float(not plans[-1]['changes']),  # plenty of RAM: nothing changed
+        "infeasible_flagged_rate": float(not too_small['fits']),
+        "pi_plan_mb": pi['total_mb'],
+        "pi_n_ctx": pi['llama_params']['n_ctx'],
+        "plan_us": round(plan_s * 1e6, 2),
+        "mapped_detect_rate": float(60 <= mapped <= 66),
+        "track_error_mb": abs(tracked - 48),
+        "report_ms": ms(report_s),
+        "check_us": round(check_s * 1e6, 2),
+        "pressure_reaction_ms": ms(reacted[0] - start) if reacted else 2000.0,
+        "pressure_repeats": len(reacted) - 1,  # debounced: acted once, not every tick
+        "swap_trickle_flagged_rate": sum(r is not None for r in trickle) / len(trickle),
+        "swap_storm_flagged_rate": sum(r is not None for r in storm) / len(storm),
+        # swapping while we're far from our budget (and RAM isn't short) is someone else's problem
+        "swap_storm_far_from_budget_flagged_rate": sum(r is not None for r in storm_idle) / len(storm_idle),
+        "report_has_components_rate": float("buffer" in report['components']),
+    }
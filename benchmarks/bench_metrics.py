@@ -0,0 +1,110 @@
+# benchmarks/bench_metrics.py
+# The metrics exporter: what recording costs on the hot paths (a counter bump per turn, a
+# histogram observe per indicator frame), whether counts stay exact with several threads
+# recording at once, and how long a scrape / snapshot takes with the assistant's metrics.
+import json
+import os
+import tempfile
+import threading
+import time
+import urllib.request
+
+from harness import scenario, ms, measure_peak_kb
+from components.metrics import MetricsRegistry, MetricsServer, SnapshotWriter
+
+CALLS = 200_000
+THREADS = 4
+
+
+def _per_call_ns(fn, arg):
+    start = time.perf_counter()
+    for _ in range(CALLS):
+        fn(arg)
+    return (time.perf_counter() - start) / CALLS * 1e9
+
+
+def _assistant_metrics(registry):
+    # roughly what a running assistant registers
+    for name in ("turns_total", "tokens_generated_total", "remote_requests_total", "remote_errors_total",
+                 "remote_retries_total", "tts_utterances_total", "stt_transcriptions_total"):
+        registry.counter(name, name).inc(3)
+    for name in ("turn_seconds", "time_to_first_token_seconds", "remote_request_seconds", "tts_synth_seconds",
+                 "tts_speak_seconds", "indicator_frame_seconds", "stt_real_time_factor", "tokens_per_second"):
+        histogram = registry.histogram(name, name)
+        for i in range(100):
+            histogram.observe(i * 0.01)
+    registry.gauge("tts_queued_seconds", "queued", fn=lambda: 1.5)
+
+
+@scenario("metrics")
+def metrics_exporter():
+    registry = MetricsRegistry()
+    counter = registry.counter("bench_total", "bench")
+    histogram = registry.histogram("bench_seconds", "bench")
+    _per_call_ns(counter.inc, 1)  # warm up (first call registers the thread's cells)
+    inc_ns = min(_per_call_ns(counter.inc, 1) for _ in range(3))
+    observe_ns = min(_per_call_ns(histogram.observe, 0.02) for _ in range(3))
+
+    def observe_many():
+        # steady state recording should make no garbage at all
+        for _ in range(1000):
+            histogram.observe(0.004)
+
+    observe_peak_kb = measure_peak_kb(observe_many)
+
+    # several threads recording at once, nothing may be lost
+    shared_counter = registry.counter("threads_total", "bench")
+    shared_histogram = registry.histogram("threads_seconds", "bench")
+
+    def record():
+        for i in range(CALLS // THREADS):
+            shared_counter.inc()
+            shared_histogram.observe((i % 100) * 0.001)
+
+    threads = [threading.Thread(target=record) for _ in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    buckets, _, count = shared_histogram.totals()
+    exact = shared_counter.value() == CALLS and count == CALLS and sum(buckets) == CALLS
+
+    _assistant_metrics(registry)
+    start = time.perf_counter()
+    for _ in range(100):
+        text = registry.render()
+    render_s = (time.perf_counter() - start) / 100
+
+    server = MetricsServer(registry, port=0).start()
+    try:
+        scrapes = []
+        for _ in range(20):
+            start = time.perf_counter()
+            with urllib.request.urlopen(server.url) as response:
+                body = response.read().decode("utf-8")
+            scrapes.append(time.perf_counter() - start)
+    finally:
+        server.close()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "metrics.json")
+        writer = SnapshotWriter(registry, path)
+        start = time.perf_counter()
+        for _ in range(20):
+            writer.write()
+        snapshot_s = (time.perf_counter() - start) / 20
+        with open(path) as f:
+            snapshot = json.load(f)['metrics']
+
+    return {
+        "counter_inc_ns": round(inc_ns, 1),
+        "histogram_observe_ns": round(observe_ns, 1),
+        "observe_peak_kb": observe_peak_kb,
+        "threaded_exact_rate": float(exact),
+        "render_ms": ms(render_s),
+        "scrape_ms": ms(min(scrapes)),
+        "exposition_kb": round(len(text) / 1024.0, 1),
+        "scrape_complete_rate": float(body == registry.render() and "k2so_turns_total 3" in body),
+        "snapshot_write_ms": ms(snapshot_s),
+        "snapshot_metrics": len(snapshot),
+    }
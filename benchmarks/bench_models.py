@@ -0,0 +1,57 @@
+# benchmarks/bench_models.py
+# Switching between three local models under a RAM budget that fits two of them:
+# resident switches should cost nothing, misses a model load, and the budget must hold.
+import time
+
+from harness import scenario, local_models, ms, quiet
+from fakes import FakeLlama, install_fake_llama
+from router import get_backend, estimate_backend_mb
+from components.model_manager import ModelManager
+
+MODELS = {
+    "bench-a": "bench-a-q4.gguf",
+    "bench-b": "bench-b-q4.gguf",
+    "bench-c": "bench-c-q4.gguf",
+}
+WEIGHTS_BYTES = 1024 * 1024 * 1024  # sparse file, ~1 GB weights + ~1.5 GB kv cache each
+BUDGET_MB = 6000
+# mostly bouncing between two models with the odd third one, like a real session
+SWITCHES = ["bench-a", "bench-b", "bench-a", "bench-b", "bench-c", "bench-a", "bench-c",
+            "bench-a", "bench-b", "bench-a", "bench-b", "bench-a"] * 3
+
+
+@scenario("model_residency")
+def model_residency():
+    install_fake_llama()
+    FakeLlama.load_seconds = 0.2
+    FakeLlama.open_count = 0
+    try:
+        with local_models(MODELS, tensor_bytes=WEIGHTS_BYTES):
+            manager = ModelManager(get_backend, BUDGET_MB, size_hint=estimate_backend_mb, log=lambda *_: None)
+            hits, misses, peak_mb = [], [], 0
+            with quiet():
+                for name in SWITCHES:
+                    resident = ("local", name) in manager.resident
+                    start = time.perf_counter()
+                    manager.get("local", name)
+                    (hits if resident else misses).append(time.perf_counter() - start)
+                    peak_mb = max(peak_mb, manager.used_mb())
+                # unloaded models must actually let go of their llama instance
+                leaked = FakeLlama.open_count - len(manager.resident)
+                manager.close()
+    finally:
+        FakeLlama.load_seconds = 0.05
+
+    report = manager.report()
+    requests = sum(r['hits'] + r['misses'] for r in report)
+    hit_ms = sum(hits) / len(hits) if hits else 0.0
+    miss_ms = sum(misses) / len(misses) if misses else 0.0
+    return {
+        "switch_hit_ms": ms(hit_ms),
+        "switch_miss_ms": ms(miss_ms),
+        "switch_saved_ms": ms(miss_ms - hit_ms),
+        "hit_rate": round(sum(r['hits'] for r in report) / requests, 3),
+        "budget_respected_rate": float(peak_mb <= BUDGET_MB),
+        "leaked_models": leaked,
+        "closed_rate": float(FakeLlama.open_count == 0),
+    }
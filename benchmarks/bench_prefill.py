@@ -0,0 +1,82 @@
+# benchmarks/bench_prefill.py
+# Time to first token with and without idle-time prefill, on a Pi-like prompt eval speed.
+# Once the history window is full every turn drops the oldest exchange, so the whole
+# history has to be evaluated again - exactly what prefill moves into the typing time.
+# Also checks that a prefill the reply can't use (the history changed) isn't reported as saved.
+import time
+
+from harness import scenario, local_backend, ms, percentile, quiet
+from fakes import FakeLlama, install_fake_llama
+
+PROMPTS = [
+    "what are the odds we make it to the vault?",
+    "and if we take the east corridor instead?",
+    "how many stormtroopers are on that level?",
+    "can you open the shield gate from here?",
+    "what did the captain say about the plans?",
+    "is the shuttle still fuelled?",
+    "how long until the patrol comes back?",
+    "remind me what the access code was",
+    "should we wait for Cassian?",
+    "what's our way out after that?",
+]
+TYPING_SECONDS = 0.3
+
+
+def _session_ttfts(prefill):
+    ttfts, saved = [], []
+    with local_backend() as backend:
+        session = backend.start_chat(history_turns=4)
+        for prompt in PROMPTS:
+            if prefill:
+                session.prefill()
+            time.sleep(TYPING_SECONDS)  # the user typing
+            start = time.perf_counter()
+            first = None
+            with quiet():
+                for _ in session.stream_message(prompt):
+                    if first is None:
+                        first = time.perf_counter()
+            ttfts.append(first - start)
+            saved.append((backend.last_decode or {}).get('prefill_saved_ms', 0.0))
+        # enter pressed right away: how long until the model is free again
+        session.prefill()
+        start = time.perf_counter()
+        session.cancel_prefill()
+        cancel_s = time.perf_counter() - start
+    return ttfts, saved, cancel_s
+
+
+def _stale_prefill_tokens():
+    # prefill for one history, then answer with another: only the chat template tokens at
+    # the start of the first turn are still shared
+    history = [{'user': p, 'assistant': "noted"} for p in PROMPTS[:3]]
+    other = [{'user': p, 'assistant': "noted"} for p in PROMPTS[3:6]]
+    with local_backend() as backend:
+        backend.prefill(history)
+        with quiet():
+            for _ in backend.stream_response(PROMPTS[6], conversation_history=other):
+                pass
+        return (backend.last_decode or {}).get('prefill_tokens', 0)
+
+
+@scenario("idle_prefill")
+def idle_prefill():
+    install_fake_llama()
+    FakeLlama.prompt_tokens_per_second = 400.0  # Phi-3-mini prompt eval on a Pi 5, roughly
+    try:
+        plain, _, _ = _session_ttfts(prefill=False)
+        warm, saved, cancel_s = _session_ttfts(prefill=True)
+        stale_tokens = _stale_prefill_tokens()
+    finally:
+        FakeLlama.prompt_tokens_per_second = 2000.0
+
+    return {
+        "ttft_ms_p50_plain": ms(percentile(plain, 50)),
+        "ttft_ms_p95_plain": ms(percentile(plain, 95)),
+        "ttft_ms_p50_prefill": ms(percentile(warm, 50)),
+        "ttft_ms_p95_prefill": ms(percentile(warm, 95)),
+        "prefill_saved_ms": round(sum(saved) / len(saved), 3),
+        "cancel_ms": ms(cancel_s),
+        "stale_prefill_tokens": stale_tokens,  # reported as reused after the history changed
+    }
@@ -0,0 +1,89 @@
+# benchmarks/bench_registry.py
+# Model folder listing: a cold scan has to walk every GGUF header (token lists included),
+# a warm scan should only stat the files and hit model_index.json. Also checks that the
+# chat template in the header picks the right prompt format.
+import os
+import tempfile
+import time
+
+from harness import scenario, local_backend, ms, percentile, quiet
+from fakes import PHI3_HEADER, write_gguf
+from components.model_registry import INDEX_NAME, ModelRegistry, detect_prompt_format, is_gguf
+
+N_MODELS = 24
+VOCAB_SIZE = 32064  # phi-3 vocabulary, the biggest thing in a real header
+WEIGHTS_BYTES = 512 * 1024 * 1024  # sparse, never read
+
+# chat_template snippet -> expected format
+TEMPLATES = {
+    "<|start_header_id|>{{ role }}<|end_header_id|>": "llama3",
+    "<|im_start|>{{ role }}\n{{ content }}<|im_end|>": "chatml",
+    "<start_of_turn>{{ role }}\n{{ content }}<end_of_turn>": "gemma",
+    "<|user|>\n{{ content }}<|end|>\n<|assistant|>": "phi3",
+    "<|user|>\n{{ content }}</s>\n<|assistant|>": "zephyr",
+    "[INST] {{ content }} [/INST]": "llama2",
+    "": "generic",
+}
+
+
+def _write_folder(folder):
+    tokens = [f"tok{i}" for i in range(VOCAB_SIZE)]
+    templates = [tpl for tpl in TEMPLATES if tpl]  # no template would fall back to the phi3 arch
+    for i in range(N_MODELS):
+        header = dict(PHI3_HEADER)
+        header["tokenizer.chat_template"] = templates[i % len(templates)]
+        header["tokenizer.ggml.tokens"] = tokens
+        header["tokenizer.ggml.scores"] = [0.0] * VOCAB_SIZE
+        write_gguf(os.path.join(folder, f"model-{i:02d}.gguf"), header, tensor_bytes=WEIGHTS_BYTES)
+    # things that must not show up
+    with open(os.path.join(folder, "notes.txt"), "w") as f:
+        f.write("not a model")
+    os.mkdir(os.path.join(folder, "old.gguf"))
+
+
+@scenario("model_registry")
+def model_registry():
+    with tempfile.TemporaryDirectory() as folder:
+        _write_folder(folder)
+        templates = [fmt for tpl, fmt in TEMPLATES.items() if tpl]
+
+        # best of a few, the first pass also pays for the page cache
+        cold = float("inf")
+        for _ in range(3):
+            if os.path.exists(os.path.join(folder, INDEX_NAME)):
+                os.remove(os.path.join(folder, INDEX_NAME))
+            start = time.perf_counter()
+            found = ModelRegistry(folder).scan()
+            cold = min(cold, time.perf_counter() - start)
+
+        warm = []
+        for _ in range(20):
+            start = time.perf_counter()
+            ModelRegistry(folder).scan()
+            warm.append(time.perf_counter() - start)
+
+        correct = sum(
+            found[f"model-{i:02d}.gguf"]["prompt_format"] == templates[i % len(templates)]
+            for i in range(N_MODELS)
+        )
+        correct += sum(detect_prompt_format(tpl) == fmt for tpl, fmt in TEMPLATES.items())
+
+        start = time.perf_counter()
+        for name in os.listdir(folder):
+            is_gguf(os.path.join(folder, name))
+        magic_us = (time.perf_counter() - start) / len(os.listdir(folder)) * 1e6
+
+    # end to end: the router hands the header to LocalModel, which formats with it
+    with local_backend() as backend:
+        with quiet():
+            prompt = backend._format_prompt("hello", [{"user": "hi", "assistant": "hey"}])
+    applied = float(backend.model_info is not None and prompt.endswith("<|end|>\n<|assistant|>"))
+
+    return {
+        "models_found": len(found),
+        "scan_cold_ms": ms(cold),
+        "scan_warm_ms_p50": ms(percentile(warm, 50)),
+        "magic_check_us": round(magic_us, 2),
+        "format_detect_rate": round(correct / (N_MODELS + len(TEMPLATES)), 3),
+        "header_format_applied_rate": applied,
+    }
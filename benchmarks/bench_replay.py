@@ -0,0 +1,98 @@
+# benchmarks/bench_replay.py
+# Session record/replay: what recording costs per turn, how big a session (with mic audio)
+# gets on disk, and whether a replay reproduces the run. Played back from the recording it
+# should give the same replies as fast as possible, or with the recorded timing in realtime
+# mode. Run live against the model it should come out with a sensible latency diff.
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from harness import scenario, local_backend, run_turn, ms, quiet, percentile
+from fakes import FakeLlama, install_fake_llama, make_fake_tts
+from components.session_replay import SessionRecorder, SessionReplayer, latency_diff, decode_audio
+
+PROMPTS = [
+    "Hello K2SO",
+    "What is the weather like?",
+    "Tell me a joke",
+    "What are the odds of surviving an asteroid field?",
+    "Summarize the plans for the mission in two sentences.",
+    "And the odds of that?",
+]
+MIC_RATE = 48000
+
+
+def _speech_like(seconds, seed):
+    # voiced bursts over a bit of room noise, compresses about like a real recording
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * MIC_RATE)) / MIC_RATE
+    voice = 0.2 * np.sin(2 * np.pi * 180 * t) * (np.sin(2 * np.pi * 3 * t) > 0)
+    return (voice + 0.005 * rng.standard_normal(len(t))).astype(np.float32)
+
+
+@scenario("session_replay")
+def session_replay():
+    install_fake_llama()
+    FakeLlama.tokens_per_second = 200.0
+    tts = make_fake_tts()
+    with tempfile.TemporaryDirectory() as tmp, local_backend() as backend:
+        path = os.path.join(tmp, "session.jsonl")
+        recorder = SessionRecorder(path, mode="local", model="bench-phi3", backend=backend)
+        session = backend.start_chat(history_turns=4, recorder=recorder)
+        audio_seconds = 0.0
+        recorded = []
+        for i, prompt in enumerate(PROMPTS):
+            if i % 3 == 0:  # every third prompt was spoken
+                audio = _speech_like(3.0, i)
+                audio_seconds += 3.0
+                recorder.audio(audio, MIC_RATE, prompt, 0.4)
+            recorded.append(run_turn(session, tts, prompt))
+            recorder.speech("x" * 80, recorded[-1]["turn"] - recorded[-1]["ttft"] - recorded[-1]["decode"])
+
+        # what the recorder itself adds to a turn (one json line, flushed)
+        start = time.perf_counter()
+        for _ in range(200):
+            recorder.turn("a prompt", "a reply of a few words", time.perf_counter(), 0.1, 0.5, {'tokens': 6})
+        turn_write_s = (time.perf_counter() - start) / 200
+        recorder.close()
+        # drop the timing-only turns again so the file is the session
+        with open(path) as f:
+            lines = f.readlines()[:-200]
+        with open(path, "w") as f:
+            f.writelines(lines)
+        session_kb = os.path.getsize(path) / 1024.0
+
+        fast = SessionReplayer(path)
+        start = time.perf_counter()
+        with quiet():
+            fast.replay()
+        fast_s = time.perf_counter() - start
+        identical = all(a['response'] == t['response'] for a, t in zip(fast.results, fast.turns))
+        audio_ok = all(len(decode_audio(t['audio']['chunks'])) == 3 * MIC_RATE for t in fast.turns if t['audio'])
+
+        paced = SessionReplayer(path, realtime=True)
+        with quiet():
+            paced.replay()
+        timing_error = [abs(a['reply_s'] - t['reply_s']) for a, t in zip(paced.results, paced.turns)]
+
+        live = SessionReplayer(path, backend_factory=lambda mode, model: backend)
+        with quiet():
+            live.replay()
+        diff = latency_diff(live.turns, live.results)
+
+    recorded_total = sum(t["turn"] for t in recorded)
+    reply = diff['summary']['reply_s']['p50']
+    return {
+        "record_turn_write_us": round(turn_write_s * 1e6, 1),
+        "session_kb": round(session_kb, 1),
+        "audio_kb_per_s": round((session_kb - 4.0) / audio_seconds, 1),
+        "fast_replay_ms": ms(fast_s),
+        "fast_replay_speedup": round(recorded_total / fast_s, 1),
+        "replay_identical_rate": float(identical and audio_ok and len(fast.results) == len(PROMPTS)),
+        "realtime_timing_error_ms_p95": ms(percentile(timing_error, 95)),
+        "live_reply_ms_recorded_p50": round(reply[0], 3),
+        "live_reply_ms_replayed_p50": round(reply[1], 3),
+        "live_diff_rate": float(len(diff['turns']) == len(PROMPTS) and all(r['same_response'] for r in diff['turns'])),
+    }
@@ -0,0 +1,75 @@
+# benchmarks/bench_snapshot.py
+# Start-up cost of the persona: the first start evaluates the system prompt and writes a
+# snapshot, later starts restore it from disk. Measured from creating the backend to the
+# first token of the first reply, at a Pi-like prompt eval speed. Also checks that editing
+# the persona makes a new snapshot and removes the old one, and that a persona longer
+# than n_batch restores too.
+import os
+import tempfile
+import time
+
+import config
+from harness import scenario, local_backend, ms, quiet
+from fakes import FakeLlama, install_fake_llama
+
+PROMPT = "what are the odds?"
+
+
+def _boot_to_first_token():
+    start = time.perf_counter()
+    with local_backend() as backend:
+        loaded = time.perf_counter()
+        with quiet():
+            for _ in backend.stream_response(PROMPT):
+                break
+        first = time.perf_counter()
+        evaluated = backend.llm.prompt_tokens_evaluated
+    return loaded - start, first - start, evaluated
+
+
+def _snapshots(cache_dir):
+    return sorted(name for name in os.listdir(cache_dir) if name.endswith(".state"))
+
+
+@scenario("prompt_snapshot")
+def prompt_snapshot():
+    install_fake_llama()
+    FakeLlama.prompt_tokens_per_second = 400.0  # Phi-3-mini prompt eval on a Pi 5, roughly
+    saved = (config.PROMPT_CACHE_DIR, config.SYSTEM_PROMPT)
+    try:
+        with tempfile.TemporaryDirectory() as cache_dir:
+            config.PROMPT_CACHE_DIR = cache_dir
+            cold_load, cold_first, cold_evaluated = _boot_to_first_token()
+            before = _snapshots(cache_dir)
+            snapshot_kb = os.path.getsize(os.path.join(cache_dir, before[0])) / 1024.0
+
+            warm = [_boot_to_first_token() for _ in range(3)]
+            warm_load = min(w[0] for w in warm)
+            warm_first = min(w[1] for w in warm)
+            warm_evaluated = warm[0][2]
+
+            # persona edited: the old snapshot must not be used, and gets replaced
+            config.SYSTEM_PROMPT = saved[1] + " Never apologise."
+            _, _, edited_evaluated = _boot_to_first_token()
+            after = _snapshots(cache_dir)
+
+            # more tokens than n_batch (512), so there is no logits row for the last one
+            config.SYSTEM_PROMPT = saved[1] + " Stay in character." * 120
+            _, _, long_cold_evaluated = _boot_to_first_token()
+            _, _, long_warm_evaluated = _boot_to_first_token()
+    finally:
+        config.PROMPT_CACHE_DIR, config.SYSTEM_PROMPT = saved
+        FakeLlama.prompt_tokens_per_second = 2000.0
+
+    return {
+        "cold_load_ms": ms(cold_load),
+        "snapshot_load_ms": ms(warm_load),
+        "cold_first_token_ms": ms(cold_first),
+        "snapshot_first_token_ms": ms(warm_first),
+        "boot_speedup": round(cold_first / warm_first, 2),
+        "prompt_tokens_cold": cold_evaluated,
+        "prompt_tokens_snapshot": warm_evaluated,
+        "snapshot_kb": round(snapshot_kb, 1),
+        "long_persona_restored_rate": float(long_warm_evaluated < long_cold_evaluated / 2),
+        "invalidated_rate": float(len(after) == 1 and after != before and edited_evaluated > warm_evaluated),
+    }
@@ -0,0 +1,66 @@
+# benchmarks/bench_speculative.py
+# Plain decoding vs speculative decoding (prompt-lookup drafter) on the same prompts.
+# The replies must match exactly, only the speed should change. A GGUF drafter is only used
+# when its vocabulary is the main model's (TinyLlama's 32000 tokens lack Phi-3's chat tokens).
+import os
+import tempfile
+
+from harness import scenario, local_backend, quiet
+from fakes import FakeLlama, install_fake_llama
+
+PROMPTS = [
+    "Explain how the shield gate works.",
+    "Repeat the mission plan back to me.",
+    "List the crew and their jobs.",
+    "What is the probability we survive this?",
+]
+
+
+def _decode_all(options):
+    replies, tokens, seconds, acceptance = [], 0, 0.0, []
+    with local_backend(options=options) as backend:
+        with quiet():
+            for prompt in PROMPTS:
+                replies.append(backend.generate_response(prompt, max_tokens=256))
+                stats = backend.last_decode
+                tokens += stats['tokens']
+                seconds += stats['seconds']
+                if 'acceptance_rate' in stats:
+                    acceptance.append(stats['acceptance_rate'])
+    return replies, tokens / seconds, acceptance
+
+
+@scenario("speculative_decode")
+def speculative_decode():
+    install_fake_llama()
+    FakeLlama.tokens_per_second = 200.0
+    FakeLlama.prompt_tokens_per_second = 2000.0
+    FakeLlama.reply_tokens = 128
+    FakeLlama.draft_acceptance = 0.7
+
+    plain, plain_tps, _ = _decode_all(None)
+    spec, spec_tps, acceptance = _decode_all({"draft": "prompt_lookup", "draft_tokens": 8})
+
+    with tempfile.TemporaryDirectory() as tmp:
+        drafters = {"tinyllama-1.1b-chat-q4.gguf": 32000, "phi3-draft-q4.gguf": 32064}
+        loaded = {}
+        for name, n_vocab in drafters.items():
+            path = os.path.join(tmp, name)
+            open(path, "wb").close()
+            FakeLlama.vocab_sizes[name] = n_vocab
+            with local_backend(options={"draft": path}) as backend:
+                loaded[name] = backend.draft_model is not None
+                with quiet():
+                    reply = backend.generate_response(PROMPTS[0], max_tokens=16)
+                loaded[name, "ok"] = not reply.startswith("error")
+
+    return {
+        "plain_tokens_per_s": round(plain_tps, 1),
+        "spec_tokens_per_s": round(spec_tps, 1),
+        "spec_speedup": round(spec_tps / plain_tps, 2),
+        "draft_acceptance_rate": round(sum(acceptance) / len(acceptance), 3),
+        "output_match_rate": sum(a == b for a, b in zip(plain, spec)) / len(PROMPTS),
+        "mismatched_drafter_refused_rate": float(not loaded["tinyllama-1.1b-chat-q4.gguf"]),
+        "matching_drafter_loaded_rate": float(loaded["phi3-draft-q4.gguf"]),
+        "reply_ok_rate": (loaded["tinyllama-1.1b-chat-q4.gguf", "ok"] + loaded["phi3-draft-q4.gguf", "ok"]) / 2,
+    }
@@ -0,0 +1,100 @@
+# benchmarks/bench_tts_parallel.py
+# Long replies through the sentence scheduler vs rendering the whole reply in one go, with an
+# engine that renders slower than it speaks (like a neural voice on one core). Parallel workers
+# should start speaking after one sentence and stay ahead of playback (no underruns). Playback
+# must stay in order, and barge-in should leave little rendered for nothing.
+import threading
+import time
+
+from harness import scenario, ms, quiet
+from fakes import make_fake_tts
+from components.audio_output import AudioOutput
+from components.tts_scheduler import split_sentences
+
+REPLY = (
+    "The odds of successfully navigating an asteroid field are approximately three thousand seven "
+    "hundred and twenty to one. I would not recommend it. Then again, nobody asks me.\n\n"
+    "If you insist, keep the shields angled forward, stay close to the larger rocks, and do not "
+    "follow the captain's instincts. They are statistically the worst part of the ship. "
+    "I have run the numbers twice. They did not improve.\n\n"
+    "Finally, please remember that I am required to tell you this: congratulations, you are "
+    "being rescued. Please do not resist. It will only make the odds worse."
+)
+SYNTH_CPS = 200.0  # one worker renders 200 chars per second
+SPOKEN_CPS = 300.0  # and they take 1/300 s each to play, so a single worker falls behind
+WORKERS = 4
+
+
+def _output():
+    out = AudioOutput(samplerate=16000, blocksize=256, buffer_seconds=10.0, device="null")
+    heard = []
+    out.level_taps.append(lambda level: heard.append(time.perf_counter()) if level > 0 and not heard else None)
+    played = []
+    play = out.play
+    out.play = lambda pcm, samplerate=None: (played.append(len(pcm)), play(pcm, samplerate))
+    out.start()
+    return out, heard, played
+
+
+def _tts(out, workers):
+    with quiet():
+        tts = make_fake_tts(chars_per_second=SYNTH_CPS, startup_seconds=0.02, spoken_chars_per_second=SPOKEN_CPS)
+    tts.set_audio_output(out)
+    tts.set_synthesis_workers(workers)
+    return tts
+
+
+@scenario("tts_parallel")
+def tts_parallel():
+    # before: the whole reply rendered, then played
+    out, heard, _ = _output()
+    try:
+        tts = _tts(out, 1)
+        start = time.perf_counter()
+        pcm, rate = tts._render_bench_sink(REPLY)
+        out.play(pcm, samplerate=rate)
+        out.wait()
+        whole_first, whole_total = heard[0] - start, time.perf_counter() - start
+    finally:
+        out.close()
+
+    out, heard, played = _output()
+    try:
+        tts = _tts(out, WORKERS)
+        underruns = out.underruns
+        start = time.perf_counter()
+        with quiet():
+            tts.speak(REPLY)
+        parallel_first, parallel_total = heard[0] - start, time.perf_counter() - start
+        underruns = out.underruns - underruns
+        sentences = split_sentences(REPLY)
+        expected = [int(len(s) / SPOKEN_CPS * 16000) for s in sentences]
+
+        # barge-in half a second into the reply
+        tts.reset()
+        speaker = threading.Thread(target=lambda: tts.speak(REPLY * 3))
+        with quiet():
+            speaker.start()
+            time.sleep(0.5)
+            stopped = time.perf_counter()
+            tts.stop()
+            speaker.join()
+        stop_s = time.perf_counter() - stopped
+        time.sleep(0.3)  # let anything still rendering finish, it shouldn't be much
+        rendered_after_stop = len(tts.utterances)
+        tts.close()
+    finally:
+        out.close()
+
+    return {
+        "whole_first_audio_ms": ms(whole_first),
+        "parallel_first_audio_ms": ms(parallel_first),
+        "whole_total_ms": ms(whole_total),
+        "parallel_total_ms": ms(parallel_total),
+        "first_audio_speedup": round(whole_first / parallel_first, 2),
+        "parallel_underruns": underruns,
+        "sentences": len(sentences),
+        "in_order_rate": float(played == expected),
+        "barge_in_stop_ms": ms(stop_s),
+        "rendered_after_barge_in": rendered_after_stop,
+    }
@@ -0,0 +1,86 @@
+# benchmarks/bench_voice.py
+# Spoken turns from WAV files, fed at mic speed through the voice loop, with and without
+# starting the reply from a stable partial transcript. Latency is from the endpoint (the user
+# has clearly stopped) to the first reply chunk. The WAV with a pause mid-sentence has to
+# cancel its speculative reply and still answer the whole sentence. Replies must come out the
+# same either way. Each mode is one conversation, so later turns carry some history. Kept
+# speculative replies must show up in the session recording like any other turn, each with its
+# own audio.
+import os
+import tempfile
+import time
+
+from harness import scenario, local_backend, ms, quiet, percentile
+from fakes import FakeLlama, FakeWhisperSTT, install_fake_llama, write_speech_wav
+from components.session_replay import SessionRecorder, load_session
+from components.voice_loop import VoiceLoop, wav_frames
+
+UTTERANCES = {
+    "short": dict(words=4),
+    "question": dict(words=9),
+    "thinking_pause": dict(words=7, pauses={2: 650}),  # "what are the ... odds of surviving an asteroid"
+}
+
+
+def _conversation(backend, paths, speculate, record_path):
+    recorder = SessionRecorder(record_path)
+    stt = FakeWhisperSTT()
+    stt.recorder = recorder
+    session = backend.start_chat(history_turns=4, recorder=recorder)
+    loop = VoiceLoop(stt, session, speculate=speculate)
+    turns = {}
+    for name, path in paths.items():
+        turns[name] = _turn(loop, path)
+        turns[name]['history'] = list(session.history)
+    recorder.close()
+    return turns, loop.report()
+
+
+def _turn(loop, path):
+    rate, frames = wav_frames(path)
+    transcript, replies = loop.listen(frames, rate, realtime=True)
+    first, chunks = None, []
+    for chunk in replies:
+        if first is None:
+            first = time.perf_counter()
+        chunks.append(chunk)
+    return {'latency': first - loop.last_turn['endpoint_at'], 'transcript': transcript, 'reply': "".join(chunks),
+            'stats': dict(loop.responder.stats)}
+
+
+@scenario("speculative_start")
+def speculative_start():
+    install_fake_llama()
+    FakeLlama.prompt_tokens_per_second = 100.0  # Phi-3-mini prompt eval on a Pi 4, roughly
+    FakeLlama.tokens_per_second = 40.0
+    FakeLlama.reply_tokens = 16
+    try:
+        with tempfile.TemporaryDirectory() as tmp, local_backend() as backend:
+            paths = {}
+            for i, (name, spec) in enumerate(UTTERANCES.items()):
+                paths[name] = os.path.join(tmp, f"{name}.wav")
+                write_speech_wav(paths[name], seed=i, **spec)
+            with quiet():
+                plain, _ = _conversation(backend, paths, False, os.path.join(tmp, "plain.jsonl"))
+                early, stats = _conversation(backend, paths, True, os.path.join(tmp, "early.jsonl"))
+            _, recorded = load_session(os.path.join(tmp, "early.jsonl"))
+    finally:
+        FakeLlama.prompt_tokens_per_second = 2000.0
+        FakeLlama.tokens_per_second = 200.0
+        FakeLlama.reply_tokens = 48
+
+    paused, before_pause = early["thinking_pause"], early["question"]
+    return {
+        "endpoint_to_reply_ms_p50": ms(percentile([t['latency'] for t in plain.values()], 50)),
+        "speculative_endpoint_to_reply_ms_p50": ms(percentile([t['latency'] for t in early.values()], 50)),
+        "speculation_saved_ms": ms(stats['saved_s'] / max(1, stats['wins'])),
+        "speculation_win_rate": round(stats['win_rate'], 2),
+        # the pause turn: one reply started too early and thrown away, then the real one
+        "pause_wasted_ms": ms(paused['stats']['wasted_s'] - before_pause['stats']['wasted_s']),
+        "pause_full_sentence_rate": float(paused['transcript'] == plain["thinking_pause"]['transcript']
+                                          and len(paused['transcript'].split()) == UTTERANCES["thinking_pause"]['words']),
+        "reply_match_rate": sum(early[n]['reply'] == plain[n]['reply'] and early[n]['history'] == plain[n]['history']
+                                for n in paths) / len(paths),
+        "recorded_turn_rate": sum(t['audio'] is not None and t['audio']['transcript'] == t['prompt']
+                                  and t['ttft_s'] is not None for t in recorded) / len(paths),
+    }
@@ -0,0 +1,134 @@
+# benchmarks/bench_worker.py
+# In-process vs out-of-process inference. A 10 ms ticker thread stands in for the
+# indicator animation: with llama in-process it has to fight generation for the GIL,
+# with the worker process the main process mostly waits on the pipe. Also measures
+# cancellation and recovery after the worker is killed, and starts one worker the way the
+# app does (its own program) to check it doesn't import main.py and the TTS with it.
+import json
+import os
+import signal
+import threading
+import time
+
+from harness import scenario, local_backend, local_models, ms, percentile, quiet
+from fakes import FakeLlama, install_fake_llama
+from components.inference_worker import WorkerModel
+
+PROMPTS = ["status report", "odds of success?", "open the vault door", "who is the captain?"]
+TICK = 0.01
+
+
+class Ticker(threading.Thread):
+    """wakes every TICK seconds and records how late each wakeup was"""
+
+    def __init__(self):
+        super().__init__(daemon=True)
+        self.late = []
+        self.running = True
+
+    def run(self):
+        expected = time.perf_counter() + TICK
+        while self.running:
+            time.sleep(max(0.0, expected - time.perf_counter()))
+            now = time.perf_counter()
+            self.late.append(now - expected)
+            expected = max(expected + TICK, now)
+
+    def stop(self):
+        self.running = False
+        self.join()
+
+
+def _chat(backend):
+    ticker = Ticker()
+    ticker.start()
+    tokens = 0
+    start = time.perf_counter()
+    for prompt in PROMPTS:
+        for _ in backend.stream_response(prompt):
+            tokens += 1
+    elapsed = time.perf_counter() - start
+    ticker.stop()
+    return percentile(ticker.late, 95), tokens / elapsed
+
+
+@scenario("inference_worker")
+def inference_worker():
+    install_fake_llama()
+    FakeLlama.cpu_bound = True
+    FakeLlama.tokens_per_second = 200.0
+    try:
+        with local_backend() as backend:
+            inproc_late, inproc_tps = _chat(backend)
+
+        with local_models({"bench-worker": "bench-worker-q4.gguf"}) as models_dir:
+            with quiet():
+                start = time.perf_counter()
+                # fork so the child inherits the fake llama_cpp module and its tuning
+                worker = WorkerModel("bench-worker-q4.gguf", models_dir, start_method="fork")
+                start_s = time.perf_counter() - start
+            try:
+                worker_late, worker_tps = _chat(worker)
+
+                # cancel a long reply after a few chunks by dropping the stream
+                FakeLlama.reply_tokens = 400
+                stream = worker.stream_response("tell me everything")
+                for _, _ in zip(range(5), stream):
+                    pass
+                start = time.perf_counter()
+                stream.close()
+                cancel_s = time.perf_counter() - start
+                after_cancel = "".join(worker.stream_response("still there?", max_tokens=8))
+
+                # hard crash mid-reply: that reply ends with an error, the next one works again
+                chunks = []
+                start = time.perf_counter()
+                with quiet():
+                    for chunk in worker.stream_response("tell me everything again"):
+                        chunks.append(chunk)
+                        if len(chunks) == 3:
+                            os.kill(worker.process.pid, signal.SIGKILL)
+                recovered = "".join(worker.stream_response("hello again", max_tokens=8))
+                restart_s = time.perf_counter() - start
+                crashed = chunks[-1]
+            finally:
+                worker.unload()
+
+            shim = os.path.join(os.path.dirname(os.path.abspath(__file__)), "worker_env")
+            modules_path = os.path.join(models_dir, "worker_modules.json")
+            saved = {key: os.environ.get(key) for key in ("PYTHONPATH", "BENCH_WORKER_MODULES")}
+            os.environ.update(PYTHONPATH=shim, BENCH_WORKER_MODULES=modules_path)
+            try:
+                with quiet():
+                    start = time.perf_counter()
+                    worker = WorkerModel("bench-worker-q4.gguf", models_dir)
+                    program_start_s = time.perf_counter() - start
+                    program_reply = "".join(worker.stream_response("status report", max_tokens=8))
+                    worker.unload()
+            finally:
+                for key, value in saved.items():
+                    if value is None:
+                        os.environ.pop(key, None)
+                    else:
+                        os.environ[key] = value
+            with open(modules_path) as f:
+                program_imported = json.load(f)
+    finally:
+        FakeLlama.cpu_bound = False
+        FakeLlama.tokens_per_second = 200.0
+        FakeLlama.reply_tokens = 48
+
+    return {
+        "inproc_tick_late_ms_p95": ms(inproc_late),
+        "worker_tick_late_ms_p95": ms(worker_late),
+        "inproc_tokens_per_s": round(inproc_tps, 1),
+        "worker_tokens_per_s": round(worker_tps, 1),
+        "worker_start_ms": ms(start_s),
+        "cancel_ms": ms(cancel_s),
+        "cancel_then_reply_rate": float(bool(after_cancel) and not after_cancel.startswith("error")),
+        "crash_recovered_rate": float(crashed.startswith("error") and not recovered.startswith("error")),
+        "restart_ms": ms(restart_s),
+        "program_worker_start_ms": ms(program_start_s),
+        "program_worker_reply_rate": float(bool(program_reply) and not program_reply.startswith("error")),
+        "program_worker_app_imports": len(program_imported),  # main.py / TTS pulled into the worker
+    }
@@ -0,0 +1,581 @@
+# benchmarks/fakes.py
+# Deterministic stand-ins for the heavy/outside pieces of the assistant.
+# Nothing in here touches a real model, the network (beyond 127.0.0.1) or a sound card,
+# so the benchmark suite runs the same on a laptop, a Pi or a plain CI box.
+import json
+import os
+import random
+import struct
+import sys
+import threading
+import time
+import types
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+# small fixed vocabulary so generated replies look like text and are reproducible
+VOCAB = [
+    "the", "droid", "says", "probability", "of", "success", "is", "low", "captain",
+    "I", "will", "not", "do", "that", "because", "rebellion", "plans", "are", "here",
+    "there", "is", "a", "problem", "with", "your", "request", "certainly", "yes",
+]
+
+
+def fake_reply(prompt, n_tokens):
+    """deterministic reply of n_tokens words seeded from the prompt"""
+    rng = random.Random(sum(prompt.encode("utf-8")))
+    words = [rng.choice(VOCAB) for _ in range(n_tokens)]
+    return [(" " if i else "") + w for i, w in enumerate(words)]
+
+
+class FakeLlama:
+    """stand-in for llama_cpp.Llama that 'decodes' at a fixed rate"""
+
+    # tuned by the scenarios before a backend is created
+    tokens_per_second = 200.0          # decode speed
+    prompt_tokens_per_second = 2000.0  # prompt eval speed
+    reply_tokens = 48                  # tokens per reply (capped by max_tokens)
+    load_seconds = 0.05                # simulated model load
+    draft_acceptance = 0.7             # chance each drafted token is accepted (speculative mode)
+    verify_cost = 0.15                 # extra cost per drafted token in a batched verify step
+    hardware_cores = None              # set to make speed depend on n_threads/n_batch/n_ctx (autotune)
+    open_count = 0                     # instances loaded and not closed yet (model manager)
+    cpu_bound = False                  # spin in python (holding the GIL) instead of sleeping
+    command_reply = None               # JSON a command prompt gets back (structured commands)
+    vocab_sizes = {}                   # model file name -> n_vocab(), anything else is Phi-3's 32064
+    _vocab = {}                        # 4-char chunk -> token id, shared so ids are stable
+    _chunks = ["<unk>", "<s>", "</s>"]  # token id -> chunk
+
+    # enough GGUF header keys for the kv-cache estimate (Phi-3-mini shapes)
+    metadata = {
+        "general.architecture": "phi3",
+        "phi3.block_count": "32",
+        "phi3.embedding_length": "3072",
+        "phi3.attention.head_count": "32",
+        "phi3.attention.head_count_kv": "32",
+        "phi3.context_length": "4096",
+    }
+
+    def __init__(self, model_path=None, **kwargs):
+        self.model_path = model_path
+        self.kwargs = kwargs
+        self.n_ctx_value = kwargs.get("n_ctx", 4096)
+        self.draft_model = kwargs.get("draft_model")
+        self.decode_rate, self.prompt_rate = self._rates(kwargs)
+        self.context_text = ""  # what is currently in the (pretend) kv cache
+        self.prompt_tokens_evaluated = 0
+        time.sleep(self.load_seconds)
+        FakeLlama.open_count += 1
+
+    def close(self):
+        FakeLlama.open_count -= 1
+
+    def _spend(self, seconds):
+        # a real llama.cpp call keeps a core busy, cpu_bound also keeps the GIL busy
+        # (a worst case for in-process inference, like a python sampler/grammar would)
+        if not self.cpu_bound:
+            time.sleep(seconds)
+            return
+        end = time.perf_counter() + seconds
+        while time.perf_counter() < end:
+            pass
+
+    def _rates(self, kwargs):
+        if not self.hardware_cores:
+            return self.tokens_per_second, self.prompt_tokens_per_second
+        # more threads help up to the core count then oversubscription hurts,
+        # prompt eval also wants big batches, long contexts cost a little decode speed
+        cores = self.hardware_cores
+        threads = kwargs.get("n_threads", 4)
+        scale = min(threads, cores) / cores * (min(1.0, cores / threads) ** 2)
+        batch = min(1.0, kwargs.get("n_batch", 512) / 256.0)
+        ctx = 1.0 - 0.03 * (self.n_ctx_value / 1024.0)
+        return self.tokens_per_second * scale * ctx, self.prompt_tokens_per_second * scale * batch
+
+    def reset(self):
+        self.context_text = ""
+
+    # token-level api, the cache is still context_text underneath
+    @property
+    def n_tokens(self):
+        return len(self.tokenize(self.context_text)) if self.context_text else 0
+
+    @n_tokens.setter
+    def n_tokens(self, n):
+        # keep the first n tokens (bos + n-1 four-character chunks)
+        self.context_text = self.context_text[:max(0, n - 1) * 4]
+
+    @property
+    def input_ids(self):
+        return np.array(self.tokenize(self.context_text) if self.context_text else [], dtype=np.intc)
+
+    def detokenize(self, tokens):
+        return "".join(self._chunks[t] for t in tokens if t >= 3).encode("utf-8")
+
+    def eval(self, tokens):
+        # appends after the first n_tokens, like llama-cpp-python
+        self.prompt_tokens_evaluated += len(tokens)
+        self._spend(len(tokens) / self.prompt_rate)
+        self.context_text += self.detokenize(tokens).decode("utf-8")
+
+    def token_eos(self):
+        return 2
+
+    def n_vocab(self):
+        return self.vocab_sizes.get(os.path.basename(self.model_path or ""), 32064)
+
+    # kv cache snapshots: the "state" is the cached text padded out to a realistic-ish size
+    state_bytes_per_token = 4096
+
+    def save_state(self):
+        n_tokens = self.n_tokens
+        text = self.context_text.encode("utf-8")
+        size = 4 + len(text) + n_tokens * self.state_bytes_per_token
+        data = bytearray(size)
+        data[:4 + len(text)] = struct.pack("<I", len(text)) + text
+        return FakeLlamaState(
+            input_ids=self.input_ids,
+            scores=self._scores(),
+            n_tokens=n_tokens,
+            llama_state=data,
+            llama_state_size=size,
+            seed=1234,
+        )
+
+    def _scores(self):
+        # llama-cpp-python keeps a row per position only with logits_all, otherwise n_batch rows
+        # (narrow here, the real ones are n_vocab wide)
+        rows = self.n_ctx_value if self.kwargs.get("logits_all") else self.kwargs.get("n_batch", 512)
+        return np.zeros((rows, 32), dtype=np.float32)
+
+    def load_state(self, state):
+        self._scores()[:state.n_tokens, :] = state.scores  # raises on a shape that doesn't fit, like the real one
+        raw = bytes(state.llama_state[:state.llama_state_size])  # the copy llama.cpp makes
+        n = struct.unpack_from("<I", raw)[0]
+        self.context_text = raw[4:4 + n].decode("utf-8")
+        if self.n_tokens != state.n_tokens:
+            raise RuntimeError("state does not match its token count")
+
+    def generate(self, tokens, reset=True, **kwargs):
+        # only the part after the longest cached prefix is evaluated
+        tokens = list(tokens)
+        cached = len(os.path.commonprefix([list(self.input_ids), tokens]))
+        self.n_tokens = cached
+        self.eval(tokens[cached:])
+        while True:
+            time.sleep(1.0 / self.decode_rate)
+            yield 100
+
+    def n_ctx(self):
+        return self.n_ctx_value
+
+    def tokenize(self, text, add_bos=True, special=False):
+        if isinstance(text, bytes):
+            text = text.decode("utf-8", errors="replace")
+        # one token per 4 characters, roughly what a real BPE vocab does with english
+        ids = [1] if add_bos else []
+        for i in range(0, len(text), 4):
+            chunk = text[i:i + 4]
+            if chunk not in self._vocab:
+                self._vocab[chunk] = len(self._chunks)
+                self._chunks.append(chunk)
+            ids.append(self._vocab[chunk])
+        return ids
+
+    def _eval_prompt(self, prompt):
+        # like llama-cpp-python, only the part after the longest cached prefix is evaluated
+        cached = len(os.path.commonprefix([self.context_text, prompt]))
+        n_new = len(self.tokenize(prompt[cached:], add_bos=not cached))
+        self.prompt_tokens_evaluated += n_new
+        self._spend(n_new / self.prompt_rate)
+        self.context_text = prompt
+
+    def _tokens(self, prompt, max_tokens, grammar=None):
+        n = min(self.reply_tokens, max_tokens or self.reply_tokens)
+        if self.command_reply and "as JSON" in prompt:
+            if grammar is not None:
+                # the grammar allows nothing but the object, then only end-of-text
+                grammar.uses += 1
+                reply = self.command_reply
+                return [reply[i:i + 4] for i in range(0, len(reply), 4)][:max_tokens]
+            # left to itself a chat model wraps the JSON in pleasantries and keeps going
+            reply = "Sure! Here is the command: " + self.command_reply + " Let me know if"
+            tokens = [reply[i:i + 4] for i in range(0, len(reply), 4)]
+            return tokens + fake_reply(prompt, max(0, n - len(tokens)))
+        return fake_reply(prompt, n)
+
+    def __call__(self, prompt, max_tokens=16, stream=False, **kwargs):
+        return self.create_completion(prompt, max_tokens=max_tokens, stream=stream, **kwargs)
+
+    def create_completion(self, prompt, max_tokens=16, stream=False, **kwargs):
+        self._eval_prompt(prompt)
+        tokens = self._tokens(prompt, max_tokens, kwargs.get("grammar"))
+        if stream:
+            return self._stream(tokens)
+        text = "".join(self._decode(tokens))
+        return {
+            "choices": [{"text": text, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": len(self.tokenize(prompt)), "completion_tokens": len(tokens)},
+        }
+
+    def _stream(self, tokens):
+        for tok in self._decode(tokens):
+            yield {"choices": [{"text": tok, "finish_reason": None}]}
+
+    def _decode(self, tokens):
+        # one main-model step per token, or per verified draft when a draft model is set
+        step = 1.0 / self.decode_rate
+        rng = random.Random(len(tokens))
+        i = 0
+        while i < len(tokens):
+            emit = 1
+            cost = step
+            if self.draft_model is not None:
+                proposed = len(self.draft_model(np.ones(i + 1, dtype=np.intc)))
+                accepted = 0
+                while accepted < proposed and rng.random() < self.draft_acceptance:
+                    accepted += 1
+                emit = accepted + 1
+                cost = step * (1.0 + self.verify_cost * proposed)
+            self._spend(cost)
+            for tok in tokens[i:i + emit]:
+                self.context_text += tok
+                yield tok
+            i += emit
+
+
+class FakeLlamaGrammar:
+    """llama_cpp.LlamaGrammar stand-in, counts how often grammars get parsed"""
+
+    parsed = 0
+
+    def __init__(self, text):
+        self.text = text
+        self.uses = 0
+
+    @classmethod
+    def from_string(cls, grammar, verbose=True):
+        if "root ::=" not in grammar:
+            raise ValueError("grammar has no root rule")
+        cls.parsed += 1
+        return cls(grammar)
+
+
+class FakeLlamaState:
+    """stand-in for llama_cpp.LlamaState"""
+
+    def __init__(self, input_ids, scores, n_tokens, llama_state, llama_state_size, seed):
+        self.input_ids = input_ids
+        self.scores = scores
+        self.n_tokens = n_tokens
+        self.llama_state = llama_state
+        self.llama_state_size = llama_state_size
+        self.seed = seed
+
+
+class FakePromptLookup:
+    """stand-in for llama_cpp.llama_speculative.LlamaPromptLookupDecoding"""
+
+    def __init__(self, max_ngram_size=2, num_pred_tokens=10):
+        self.num_pred_tokens = num_pred_tokens
+
+    def __call__(self, input_ids, **kwargs):
+        return np.zeros(self.num_pred_tokens, dtype=np.intc)
+
+
+# tokenizer.chat_template of the real Phi-3-mini GGUF, shortened
+PHI3_CHAT_TEMPLATE = (
+    "{% for message in messages %}{% if message['role'] == 'user' %}"
+    "{{'<|user|>' + '\\n' + message['content'] + '<|end|>' + '\\n' + '<|assistant|>' + '\\n'}}"
+    "{% elif message['role'] == 'assistant' %}{{message['content'] + '<|end|>' + '\\n'}}"
+    "{% endif %}{% endfor %}"
+)
+
+PHI3_HEADER = {
+    "general.architecture": "phi3",
+    "general.name": "Phi3 (bench)",
+    "general.file_type": 15,  # Q4_K_M
+    "phi3.context_length": 4096,
+    "phi3.block_count": 32,
+    "phi3.embedding_length": 3072,
+    "phi3.attention.head_count": 32,
+    "phi3.attention.head_count_kv": 32,
+    "tokenizer.chat_template": PHI3_CHAT_TEMPLATE,
+}
+
+
+def _gguf_value(value):
+    # (type, payload) in GGUF v3 encoding, just the types the benches use
+    if isinstance(value, bool):
+        return 7, struct.pack("<?", value)
+    if isinstance(value, int):
+        return 4, struct.pack("<I", value)
+    if isinstance(value, float):
+        return 6, struct.pack("<f", value)
+    if isinstance(value, str):
+        data = value.encode("utf-8")
+        return 8, struct.pack("<Q", len(data)) + data
+    if isinstance(value, list):
+        item_type = _gguf_value(value[0])[0] if value else 8
+        items = b"".join(_gguf_value(v)[1] for v in value)
+        return 9, struct.pack("<IQ", item_type, len(value)) + items
+    raise TypeError(f"can't encode {type(value).__name__}")
+
+
+def write_gguf(path, metadata=None, tensor_bytes=0):
+    """a GGUF file with a real key/value header (Phi-3 shapes by default) and
+    tensor_bytes of zeros standing in for the weights"""
+    metadata = PHI3_HEADER if metadata is None else metadata
+    with open(path, "wb") as f:
+        f.write(b"GGUF" + struct.pack("<IQQ", 3, 0, len(metadata)))
+        for key, value in metadata.items():
+            vtype, payload = _gguf_value(value)
+            name = key.encode("utf-8")
+            f.write(struct.pack("<Q", len(name)) + name + struct.pack("<I", vtype) + payload)
+        if tensor_bytes:
+            f.truncate(f.tell() + tensor_bytes)
+
+
+def install_fake_llama():
+    """make `from llama_cpp import Llama` (and the speculative drafters) resolve to the fakes"""
+    module = types.ModuleType("llama_cpp")
+    module.Llama = FakeLlama
+    module.LlamaState = FakeLlamaState
+    module.LlamaGrammar = FakeLlamaGrammar
+    speculative = types.ModuleType("llama_cpp.llama_speculative")
+    speculative.LlamaPromptLookupDecoding = FakePromptLookup
+    module.llama_speculative = speculative
+    sys.modules["llama_cpp"] = module
+    sys.modules["llama_cpp.llama_speculative"] = speculative
+    return module
+
+
+class _ChatHandler(BaseHTTPRequestHandler):
+    # latency/reply size live on the server object so each FakeOpenAIServer is independent
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        prompt = body.get("messages", [{}])[-1].get("content", "")
+
+        with self.server.lock:
+            agent = self.headers.get("User-Agent", "").split("/")[0]
+            self.server.user_agents[agent] = self.server.user_agents.get(agent, 0) + 1
+            failing = self.server.fail_next > 0
+            if failing:
+                self.server.fail_next -= 1
+        if failing:
+            self.send_error(503, "overloaded (injected)")
+            return
+
+        with self.server.lock:
+            self.server.in_flight += 1
+            self.server.peak_in_flight = max(self.server.peak_in_flight, self.server.in_flight)
+        time.sleep(self.server.latency)
+        with self.server.lock:
+            self.server.in_flight -= 1
+            self.server.request_count += 1
+
+        text = "".join(fake_reply(prompt, self.server.reply_tokens))
+        payload = json.dumps({
+            "id": "bench",
+            "object": "chat.completion",
+            "model": body.get("model", "bench"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+        }).encode("utf-8")
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass  # keep benchmark output clean
+
+
+class FakeOpenAIServer:
+    """local OpenAI-compatible /v1/chat/completions server with injectable latency"""
+
+    def __init__(self, latency=0.02, reply_tokens=48):
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), _ChatHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.latency = latency
+        self.httpd.reply_tokens = reply_tokens
+        self.httpd.request_count = 0
+        self.httpd.lock = threading.Lock()
+        self.httpd.in_flight = 0
+        self.httpd.peak_in_flight = 0  # most requests handled at the same time (fan-out limits)
+        self.httpd.user_agents = {}  # "python-requests" / "python-httpx" -> requests seen
+        self.httpd.fail_next = 0  # answer this many requests with 503 (retry paths)
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address
+        return f"http://{host}:{port}/v1/chat/completions"
+
+    @property
+    def request_count(self):
+        return self.httpd.request_count
+
+    @property
+    def peak_in_flight(self):
+        return self.httpd.peak_in_flight
+
+    @property
+    def user_agents(self):
+        return dict(self.httpd.user_agents)
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def make_fake_tts(chars_per_second=2000.0, startup_seconds=0.01, spoken_chars_per_second=15.0):
+    """build a TextToSpeech whose only backend is an in-memory sink. With an audio output and
+    synthesis workers set it renders pcm instead (spoken_chars_per_second long)"""
+    from components.text_to_speech import TextToSpeech
+
+    class FakeTTSSink(TextToSpeech):
+        # synthesis cost is modelled, playback is not (it would only add wall time)
+        def __init__(self):
+            self.chars_per_second = chars_per_second
+            self.startup_seconds = startup_seconds
+            self.first_audio_at = None
+            self.utterances = []
+            super().__init__()
+
+        def _initialize_backends(self):
+            self.backends.append({'name': 'bench_sink'})
+
+        def _speak_bench_sink(self, text):
+            time.sleep(self.startup_seconds + len(text) / self.chars_per_second)
+            if self.first_audio_at is None:
+                self.first_audio_at = time.perf_counter()
+            self.utterances.append(text)
+            return True
+
+        def _render_bench_sink(self, text):
+            # sleeping stands in for waiting on an engine process, so workers overlap like real ones
+            time.sleep(self.startup_seconds + len(text) / self.chars_per_second)
+            self.utterances.append(text)
+            n = int(len(text) / spoken_chars_per_second * 16000)
+            t = np.arange(n) / 16000.0
+            return (8000 * np.sin(2 * np.pi * 180 * t)).astype(np.int16), 16000
+
+        def reset(self):
+            self.first_audio_at = None
+            self.utterances.clear()
+
+    return FakeTTSSink()
+
+
+SPOKEN = ["what", "are", "the", "odds", "of", "surviving", "an", "asteroid", "field", "captain",
+          "tell", "me", "a", "joke", "about", "droids", "please", "now"]
+
+
+def write_speech_wav(path, words, samplerate=48000, word_ms=220, gap_ms=90, pauses=None, tail_ms=1200, seed=0):
+    """16-bit WAV of `words` voiced bursts over faint room noise. pauses maps a word index to
+    the silence (ms) after it, a stand-in for someone stopping to think mid-sentence"""
+    import wave
+    rng = np.random.default_rng(seed)
+    pieces = [np.zeros(int(samplerate * 0.3))]
+    for i in range(words):
+        t = np.arange(int(samplerate * word_ms / 1000)) / samplerate
+        envelope = np.sin(np.pi * t / t[-1]) ** 0.3
+        pieces.append(0.25 * envelope * np.sin(2 * np.pi * (140 + 15 * (i % 5)) * t))
+        pieces.append(np.zeros(int(samplerate * (pauses or {}).get(i, gap_ms) / 1000)))
+    pieces.append(np.zeros(int(samplerate * tail_ms / 1000)))
+    audio = np.concatenate(pieces)
+    audio += 0.001 * rng.standard_normal(len(audio))
+    with wave.open(path, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(samplerate)
+        wav.writeframes((np.clip(audio, -1, 1) * 32767).astype(np.int16).tobytes())
+
+
+class FakeWhisperSTT:
+    """stands in for WhisperSTT (no whisper here): every voiced burst in the 16 kHz audio is
+    heard as the next word of SPOKEN, and transcribing costs time like a small model on a Pi"""
+
+    def __init__(self, seconds=0.15, real_time_factor=0.1, samplerate=48000):
+        self.seconds = seconds
+        self.real_time_factor = real_time_factor
+        self.samplerate = samplerate
+        self.device = None
+        self.denoise = True
+        self.agc = True
+        self.recorder = None
+        self.calls = 0
+
+    def _transcribe(self, audio, samplerate, announce=True):
+        self.calls += 1
+        time.sleep(self.seconds + self.real_time_factor * len(audio) / samplerate)
+        hop = samplerate // 50
+        n = len(audio) // hop
+        voiced = np.sqrt((audio[:n * hop].reshape(n, hop) ** 2).mean(axis=1)) > 0.02
+        words, run, silent = 0, 0, n
+        for v in voiced:
+            run = run + 1 if v else 0
+            if run == 3:  # 60 ms of voice starts a word
+                words += 1
+            silent = 0 if v else silent + 1
+        if not words:
+            return ""
+        # like whisper, the punctuation depends on how the audio ends
+        text = " ".join(SPOKEN[i % len(SPOKEN)] for i in range(words))
+        return text.capitalize() + ("." if silent >= 15 else "...")
+
+
+class FakeCanvas:
+    """stands in for tk.Canvas (no display here), counts what the indicator asks it to do"""
+
+    def __init__(self):
+        self.items = {}
+        self.next_id = 1
+        self.calls = {'create': 0, 'delete': 0, 'coords': 0, 'itemconfigure': 0}
+
+    def _create(self, kind, coords, options):
+        self.calls['create'] += 1
+        item = self.next_id
+        self.next_id += 1
+        self.items[item] = (kind, coords, dict(options))
+        return item
+
+    def create_oval(self, *coords, **options):
+        return self._create("oval", coords, options)
+
+    def create_line(self, *coords, **options):
+        return self._create("line", coords, options)
+
+    def delete(self, item):
+        self.calls['delete'] += 1
+        self.items.pop(item, None)
+
+    def coords(self, item, *coords):
+        self.calls['coords'] += 1
+        kind, _, options = self.items[item]
+        self.items[item] = (kind, coords, options)
+
+    def itemconfigure(self, item, **options):
+        self.calls['itemconfigure'] += 1
+        self.items[item][2].update(options)
+
+    itemconfig = itemconfigure
+
+    def reset_calls(self):
+        for key in self.calls:
+            self.calls[key] = 0
@@ -0,0 +1,199 @@
+# benchmarks/harness.py
+# Shared plumbing for the benchmark suite: scenario registry, timing helpers,
+# fake-backend setup through the real router, and baseline comparison.
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import config
+from router import get_backend
+from fakes import write_gguf
+
+# the memory plan (components/memory_budget.py) would otherwise depend on this box's RAM
+config.RUNTIME_PROFILE = "default"
+config.MEMORY_BUDGET_MB = 16384
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+# name -> callable returning {metric_name: value}
+SCENARIOS = {}
+
+# metrics with these suffixes get better as they go up, everything else is "lower is better"
+HIGHER_IS_BETTER = ("_per_s", "_rate", "_saved_ms", "_speedup", "_gain_db")
+
+# absolute slack per unit so tiny numbers don't flap on scheduler noise
+ABS_SLACK = {"_ms": 2.0, "_us": 5.0, "_kb": 64.0}
+
+
+def scenario(name):
+    """register a benchmark scenario under name"""
+    def register(fn):
+        SCENARIOS[name] = fn
+        return fn
+    return register
+
+
+def percentile(values, pct):
+    """nearest-rank percentile, good enough for a handful of samples"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * (len(ordered) - 1)))))
+    return ordered[idx]
+
+
+def ms(seconds):
+    return round(seconds * 1000.0, 3)
+
+
+@contextlib.contextmanager
+def quiet():
+    """swallow the component print() chatter while a scenario sets up"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+def measure_peak_kb(fn):
+    """run fn once with tracemalloc and return the python-heap peak in KB"""
+    tracemalloc.start()
+    try:
+        with quiet():
+            fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return round(peak / 1024.0, 1)
+
+
+def max_rss_mb():
+    """process high-water RSS (linux reports KB, macOS bytes)"""
+    try:
+        import resource
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return round(rss / (1024.0 * 1024.0 if sys.platform == "darwin" else 1024.0), 1)
+    except ImportError:  # windows
+        return 0.0
+
+
+@contextlib.contextmanager
+def local_models(entries, tensor_bytes=0):
+    """temporary MODELS_DIR with a fake GGUF per entry, registered in config.LOCAL_MODELS
+    entries: name -> filename or dict-style LOCAL_MODELS entry"""
+    saved = (config.MODELS_DIR, dict(config.LOCAL_MODELS))
+    with tempfile.TemporaryDirectory() as models_dir:
+        for name, entry in entries.items():
+            filename = entry["file"] if isinstance(entry, dict) else entry
+            # FakeLlama never reads it, but the model registry parses its header
+            write_gguf(os.path.join(models_dir, filename), tensor_bytes=tensor_bytes)
+            config.LOCAL_MODELS[name] = entry
+        config.MODELS_DIR = models_dir
+        try:
+            yield models_dir
+        finally:
+            config.MODELS_DIR, config.LOCAL_MODELS = saved
+
+
+@contextlib.contextmanager
+def local_backend(name="bench-phi3", filename="bench-phi3-mini-q4.gguf", options=None):
+    """route a fake GGUF through config + router.get_backend like main.py does,
+    options are the extra keys of a dict-style LOCAL_MODELS entry"""
+    with local_models({name: dict(options, file=filename) if options else filename}):
+        with quiet():
+            backend = get_backend("local", name)
+        yield backend
+
+
+@contextlib.contextmanager
+def remote_backend(server, name="bench-remote"):
+    """route the fake OpenAI server through config + router.get_backend"""
+    saved = dict(config.REMOTE_MODELS)
+    config.REMOTE_MODELS[name] = {"url": server.url, "api_key_env": None}
+    try:
+        yield get_backend("remote", name)
+    finally:
+        config.REMOTE_MODELS = saved
+
+
+def run_turn(session, tts, prompt):
+    """one chat loop iteration: stream the reply, then speak it"""
+    tts.reset()
+    start = time.perf_counter()
+    first = None
+    chunks = []
+    for chunk in session.stream_message(prompt):
+        if first is None:
+            first = time.perf_counter()
+        chunks.append(chunk)
+    replied = time.perf_counter()
+    with quiet():
+        tts.speak("".join(chunks))
+    done = time.perf_counter()
+    return {
+        "turn": done - start,
+        "ttft": (first or replied) - start,
+        "ttfa": (tts.first_audio_at or done) - start,
+        "tokens": len(chunks),
+        "decode": replied - (first or replied),
+    }
+
+
+def summarize_turns(turns):
+    """collapse per-turn samples into the standard chat metrics"""
+    decode = sum(t["decode"] for t in turns)
+    tokens = sum(t["tokens"] for t in turns)
+    return {
+        "turn_ms_p50": ms(percentile([t["turn"] for t in turns], 50)),
+        "turn_ms_p95": ms(percentile([t["turn"] for t in turns], 95)),
+        "ttft_ms_p50": ms(percentile([t["ttft"] for t in turns], 50)),
+        "ttfa_ms_p50": ms(percentile([t["ttfa"] for t in turns], 50)),
+        "tokens_per_s": round(tokens / decode, 1) if decode > 0 else 0.0,
+    }
+
+
+def higher_is_better(metric):
+    return metric.endswith(HIGHER_IS_BETTER)
+
+
+def load_baseline(path=BASELINE_PATH):
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def save_baseline(results, path=BASELINE_PATH):
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def compare(results, baseline, tolerance=0.25):
+    """return rows of (scenario, metric, base, now, change, status)"""
+    rows = []
+    for name, metrics in results.items():
+        base_metrics = baseline.get(name, {})
+        for metric, now in metrics.items():
+            base = base_metrics.get(metric)
+            if base is None:
+                rows.append((name, metric, None, now, None, "new"))
+                continue
+
+            slack = next((v for k, v in ABS_SLACK.items() if metric.endswith(k)), 0.0)
+            limit = abs(base) * tolerance + slack
+            delta = now - base
+            worse = -delta if higher_is_better(metric) else delta
+            change = (delta / base) if base else 0.0
+
+            if worse > limit:
+                status = "REGRESSION"
+            elif -worse > limit:
+                status = "improved"
+            else:
+                status = "ok"
+            rows.append((name, metric, base, now, change, status))
+    return rows
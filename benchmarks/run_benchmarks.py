@@ -0,0 +1,104 @@
+# benchmarks/run_benchmarks.py
+# Offline benchmark runner for K-2SO.
+#
+# usage (from the repo root):
+#   python benchmarks/run_benchmarks.py                    # run everything, compare with baseline.json
+#   python benchmarks/run_benchmarks.py -s local_chat      # run one scenario
+#   python benchmarks/run_benchmarks.py --update-baseline  # accept the current numbers
+#
+# exits with status 1 if any metric regressed past the tolerance.
+import argparse
+import glob
+import importlib
+import json
+import os
+import sys
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, os.path.join(os.path.dirname(BENCH_DIR), "src"))
+
+import harness  # noqa: E402
+
+
+def load_scenarios():
+    """import every bench_*.py so their @scenario decorators register"""
+    for path in sorted(glob.glob(os.path.join(BENCH_DIR, "bench_*.py"))):
+        module = os.path.splitext(os.path.basename(path))[0]
+        try:
+            importlib.import_module(module)
+        except ImportError as e:
+            # a scenario that needs an optional package (numpy, sounddevice...) just gets skipped
+            print(f"skipping {module}: {e}")
+
+
+def run(names):
+    results = {}
+    for name in names:
+        print(f"running {name}...")
+        fn = harness.SCENARIOS[name]
+        metrics = fn()
+        # second pass only for memory so tracemalloc overhead doesn't skew timings
+        metrics["peak_py_kb"] = harness.measure_peak_kb(fn)
+        results[name] = metrics
+    return results
+
+
+def print_report(rows):
+    print(f"\n{'scenario':<22}{'metric':<22}{'baseline':>12}{'current':>12}{'change':>10}  status")
+    print("-" * 86)
+    for name, metric, base, now, change, status in rows:
+        base_s = f"{base:.2f}" if base is not None else "-"
+        change_s = f"{change * 100:+.1f}%" if change is not None else "-"
+        print(f"{name:<22}{metric:<22}{base_s:>12}{now:>12.2f}{change_s:>10}  {status}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="K-2SO offline benchmark suite")
+    parser.add_argument("-s", "--scenario", action="append", help="run only this scenario (repeatable)")
+    parser.add_argument("--list", action="store_true", help="list scenarios and exit")
+    parser.add_argument("--baseline", default=harness.BASELINE_PATH, help="baseline json path")
+    parser.add_argument("--update-baseline", action="store_true", help="write results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative slowdown (default 0.25)")
+    parser.add_argument("--json", help="also write raw results to this file")
+    args = parser.parse_args(argv)
+
+    load_scenarios()
+    if args.list:
+        for name in sorted(harness.SCENARIOS):
+            print(name)
+        return 0
+
+    names = args.scenario or sorted(harness.SCENARIOS)
+    unknown = [n for n in names if n not in harness.SCENARIOS]
+    if unknown:
+        print(f"unknown scenario(s): {', '.join(unknown)}")
+        return 2
+
+    results = run(names)
+    print(f"max rss: {harness.max_rss_mb()} MB")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    baseline = harness.load_baseline(args.baseline)
+    rows = harness.compare(results, baseline, args.tolerance)
+    print_report(rows)
+
+    if args.update_baseline:
+        # only overwrite the scenarios that actually ran
+        baseline.update(results)
+        harness.save_baseline(baseline, args.baseline)
+        print(f"\nbaseline updated: {args.baseline}")
+        return 0
+
+    regressions = [r for r in rows if r[5] == "REGRESSION"]
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) past {args.tolerance:.0%} tolerance")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
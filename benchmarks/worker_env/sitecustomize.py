@@ -0,0 +1,26 @@
+# benchmarks/worker_env/sitecustomize.py
+# Put on PYTHONPATH for inference workers started as their own program
+# (python -m components.inference_worker), which don't inherit the fakes like a forked
+# child does. Installs the fake llama_cpp and, on exit, writes the app modules the worker
+# ended up importing to $BENCH_WORKER_MODULES.
+import atexit
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fakes import install_fake_llama  # noqa: E402
+
+install_fake_llama()
+
+
+@atexit.register
+def _report_modules():
+    path = os.environ.get("BENCH_WORKER_MODULES")
+    if path:
+        with open(path, "w") as f:
+            # __mp_main__ always exists (multiprocessing aliases __main__), what matters is what it is
+            app = [name for name, module in list(sys.modules.items())
+                   if os.path.basename(getattr(module, "__file__", None) or "") in ("main.py", "text_to_speech.py")]
+            json.dump(sorted(app), f)
@@ -0,0 +1,58 @@
+# src/calibrate.py
+# Benchmarks llama.cpp settings (threads, batch, context) for a local model on THIS machine
+# and saves the fastest ones into user_config.json. main.py/router.py use them automatically.
+#
+# usage (from the project root, same place you run main.py):
+#   python src/calibrate.py phi3-mini
+#   python src/calibrate.py phi3-mini --ram-budget 3000 --max-threads 4
+import argparse
+import os
+import sys
+
+import config
+from components.autotune import calibrate, hardware_fingerprint, read_user_config, save_tuned_params
+
+CONFIG_PATH = os.path.join(os.getcwd(), "user_config.json")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tune llama.cpp runtime settings for this machine")
+    parser.add_argument("model", help="key from config.LOCAL_MODELS")
+    parser.add_argument("--models-dir", help="defaults to models_dir from user_config.json")
+    parser.add_argument("--ram-budget", type=int, help="MB the model may use (default 75%% of RAM)")
+    parser.add_argument("--max-threads", type=int, help="don't try more threads than this")
+    parser.add_argument("--dry-run", action="store_true", help="measure but don't save")
+    args = parser.parse_args(argv)
+
+    entry = config.LOCAL_MODELS.get(args.model)
+    if entry is None:
+        print(f"unknown model '{args.model}', choose from: {', '.join(config.LOCAL_MODELS)}")
+        return 2
+    filename = entry["file"] if isinstance(entry, dict) else entry
+    if not filename.endswith(".gguf"):
+        print(f"'{args.model}' is not a GGUF model, nothing to calibrate")
+        return 2
+
+    models_dir = args.models_dir or read_user_config(CONFIG_PATH).get("models_dir")
+    if not models_dir:
+        print("models directory unknown, run main.py once or pass --models-dir")
+        return 2
+    model_path = os.path.join(models_dir, filename)
+    if not os.path.exists(model_path):
+        print(f"model file not found: {model_path}")
+        return 2
+
+    result = calibrate(model_path, ram_budget_mb=args.ram_budget, max_threads=args.max_threads)
+
+    print(f"\nbest: threads={result['n_threads']} batch={result['n_batch']} ctx={result['n_ctx']}")
+    print(f"      prompt {result['prompt_tokens_per_s']} tok/s, decode {result['decode_tokens_per_s']} tok/s")
+    print(f"      ~{result['turn_seconds']}s per typical turn (untuned: ~{result['default_turn_seconds']}s)")
+
+    if not args.dry_run:
+        save_tuned_params(CONFIG_PATH, model_path, result)
+        print(f"saved to {CONFIG_PATH} for {hardware_fingerprint()}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,15 +5,26 @@ import math
 import random
 from enum import Enum
 
+from components.metrics import metrics
+from components.indicator_atlas import AtlasRenderer
+
+# drawing one animation frame, past ~33 ms the indicator can't hold 30 fps
+_frame_seconds = metrics.histogram(
+    "indicator_frame_seconds", "time to draw one indicator frame",
+    buckets=(0.0005, 0.001, 0.002, 0.004, 0.008, 0.016, 0.033, 0.066, 0.1),
+)
+
 class AIState(Enum):
     IDLE = "idle"
     PROCESSING = "processing" 
     SPEAKING = "speaking"
 
 class AIIndicator:
-    def __init__(self, fullscreen=False, animation_mode="ripples"):
+    def __init__(self, fullscreen=False, animation_mode="ripples", renderer="atlas"):
         self.fullscreen = fullscreen
         self.animation_mode = animation_mode  # "ripples" or "frequency"
+        self.renderer = renderer  # "atlas" (precomputed frames) or "classic" (recomputed every frame)
+        self.atlas = None
         self.current_state = AIState.IDLE
         self.window = None
         self.canvas = None
@@ -101,6 +112,9 @@ class AIIndicator:
         
         # draw initial elements
         self._draw_elements()
+        if self.renderer == "atlas":
+            self.atlas = AtlasRenderer(self.canvas, canvas_width, canvas_height, self.base_radius,
+                                       self.wave_amplitude, self.wave_count, self.colors)
         
         # start animation loop
         self._start_animation()
@@ -113,6 +127,8 @@ class AIIndicator:
         # clear previous elements
         if self.center_circle:
             self.canvas.delete(self.center_circle)
+            if self.atlas:
+                self.atlas.forget(self.center_circle)  # a new circle gets a new id
         for ring in self.wave_rings:
             self.canvas.delete(ring)
         self.wave_rings.clear()
@@ -140,7 +156,10 @@ class AIIndicator:
         
         while self.animation_running and self.window:
             try:
-                if self.current_state == AIState.SPEAKING:
+                start = time.perf_counter()
+                if self.atlas:
+                    self._animate_atlas(frame)
+                elif self.current_state == AIState.SPEAKING:
                     # choose animation based on mode
                     if self.animation_mode == "ripples":
                         self._animate_water_ripples(frame, wave_offsets)
@@ -156,12 +175,23 @@ class AIIndicator:
                     self._animate_idle()
                 
                 frame += 1
+                _frame_seconds.observe(time.perf_counter() - start)
                 time.sleep(0.033)  # 30 fps for smoother animation
                 
             except Exception as e:
                 print(f"Animation error: {e}")
                 break
     
+    def _animate_atlas(self, frame):
+        """same animations, looked up from the precomputed atlas"""
+        if self.current_state == AIState.SPEAKING:
+            if self.animation_mode == "ripples":
+                self.atlas.draw_ripples(frame, self.audio_level, self.center_circle)
+            else:
+                self.atlas.draw_bars(frame, self.audio_level, self.center_circle)
+        else:
+            self.atlas.draw_pulse(self.current_state, frame, self.center_circle)
+
     def _animate_water_ripples(self, frame, wave_offsets):
         """create organic water-like ripples when speaking"""
         if not self.canvas:
@@ -402,6 +432,9 @@ class AIIndicator:
             size_factor = min(self.canvas_width, self.canvas_height) / 400
             self.base_radius = int(60 * size_factor)
             self.wave_amplitude = int(20 * size_factor)
+            if self.atlas:
+                self.atlas.resize(self.canvas_width, self.canvas_height, self.base_radius,
+                                  self.wave_amplitude, self.wave_count)
             
             # redraw elements with new center position
             self._draw_elements()
@@ -0,0 +1,278 @@
+# src/components/audio_frontend.py
+# Cleans up microphone audio before it goes to Whisper: resample whatever the mic gives
+# (44.1/48 kHz are common, Whisper wants 16 kHz), take out steady background noise
+# (fans, hum) and level the volume so quiet and loud speakers look the same.
+#
+# Everything works a frame at a time (20 ms by default) straight from the input stream
+# callback. Buffers are allocated once up front and the per-frame work is numpy calls
+# writing into them, so a frame costs microseconds and makes no garbage. The FFTs in the
+# noise suppressor write into their buffers as well where numpy has out= for them (2.0+),
+# though rfft still copies a float32 input internally. numpy 1.26 allocates both results.
+import math
+
+import numpy as np
+
+
+def _fft_out_supported():
+    try:
+        np.fft.rfft(np.zeros(4, dtype=np.float32), out=np.empty(3, dtype=np.complex64))
+        return True
+    except TypeError:
+        return False
+
+
+_FFT_OUT = _fft_out_supported()
+
+
+def _lowpass(n_taps, cutoff, gain):
+    """windowed-sinc prototype, cutoff in cycles per sample"""
+    n = np.arange(n_taps) - (n_taps - 1) / 2.0
+    return (gain * 2 * cutoff * np.sinc(2 * cutoff * n) * np.kaiser(n_taps, 8.0)).astype(np.float32)
+
+
+class PolyphaseResampler:
+    """rational-ratio resampler (in_rate * up / down = out_rate) for fixed-size input frames.
+    Only the filter phases that land on an output sample are ever computed."""
+
+    def __init__(self, in_rate, out_rate, frame, taps_per_phase=24):
+        g = math.gcd(int(in_rate), int(out_rate))
+        self.up, self.down = int(out_rate) // g, int(in_rate) // g
+        self.frame = frame
+        self.taps = taps_per_phase
+        self.max_out = frame * self.up // self.down + 2
+
+        # phase p, tap j (oldest sample first) -> h[p + (taps - 1 - j) * up]
+        h = _lowpass(self.up * self.taps, 0.45 / max(self.up, self.down), self.up)
+        self.bank = np.ascontiguousarray(h.reshape(self.taps, self.up)[::-1].T)
+
+        self.buf = np.zeros(self.taps - 1 + frame, dtype=np.float32)  # history + the new frame
+        self.filled = self.taps - 1
+        self.pos = 0  # next output, in up-sampled units from the start of buf
+        self._plans = {}  # pos at the start of a frame -> (gather indices, coefficients)
+        self._windows = np.empty((self.max_out, self.taps), dtype=np.float32)
+        self.out = np.empty(self.max_out, dtype=np.float32)
+
+    @property
+    def passthrough(self):
+        return self.up == self.down
+
+    def _plan(self, pos):
+        # which samples and filter phase each output of a frame uses only depends on where
+        # the frame starts (pos < up), and with whole-ms frames that is one or two values
+        plan = self._plans.get(pos)
+        if plan is None:
+            positions = pos + np.arange(self.max_out) * self.down
+            gather = (positions // self.up)[:, None] + np.arange(self.taps)
+            plan = (gather, self.bank[positions % self.up])
+            if len(self._plans) >= 32:  # odd rate pairs, don't let it grow
+                self._plans.pop(next(iter(self._plans)))
+            self._plans[pos] = plan
+        return plan
+
+    def process(self, frame):
+        """resample one frame (<= self.frame samples), returns a view of self.out"""
+        n_in = len(frame)
+        if self.passthrough:
+            self.out[:n_in] = frame
+            return self.out[:n_in]
+        self.buf[self.filled:self.filled + n_in] = frame
+        self.filled += n_in
+
+        # outputs whose whole window is in the buffer: start + taps <= filled
+        last = (self.filled - self.taps) * self.up + self.up - 1
+        count = max(0, min(self.max_out, (last - self.pos) // self.down + 1))
+        if count:
+            gather, coefs = self._plan(self.pos)
+            windows = self._windows[:count]
+            np.take(self.buf, gather[:count], out=windows, mode="clip")  # "raise" would buffer out
+            np.multiply(windows, coefs[:count], out=windows)
+            np.sum(windows, axis=1, out=self.out[:count])
+
+        # drop input nothing will need any more
+        self.pos += count * self.down
+        consumed = min(self.pos // self.up, self.filled)
+        keep = self.filled - consumed
+        self.buf[:keep] = self.buf[consumed:self.filled]
+        self.filled = keep
+        self.pos -= consumed * self.up
+        return self.out[:count]
+
+
+class NoiseSuppressor:
+    """spectral subtraction on 50% overlapped sqrt-hann frames (one hop of delay).
+    The noise spectrum is learned from bins that don't look like speech, so it adapts to the room."""
+
+    def __init__(self, hop, strength=2.0, floor=0.1, noise_frames=10, smoothing=0.5,
+                 noise_rate=0.1, speech_ratio=3.0):
+        self.hop = hop
+        self.size = 2 * hop
+        self.strength = strength  # how much of the noise estimate to subtract
+        self.floor = floor  # never attenuate a bin below this, avoids "musical noise"
+        self.smoothing = smoothing  # gain smoothing between frames
+        self.noise_rate = noise_rate  # how fast the noise estimate follows the room
+        self.speech_ratio = speech_ratio  # bins this far above the noise are speech, not learned
+        n_bins = hop + 1
+
+        self.window = np.sqrt(np.hanning(self.size + 1)[:-1]).astype(np.float32)  # periodic, sums to 1
+        self.frame = np.zeros(self.size, dtype=np.float32)  # previous hop + current hop
+        self.overlap = np.zeros(hop, dtype=np.float32)
+        self.power = np.empty(n_bins, dtype=np.float32)
+        self.smoothed = np.zeros(n_bins, dtype=np.float32)  # power averaged over a few frames
+        self.noise = np.zeros(n_bins, dtype=np.float32)
+        self.gain = np.ones(n_bins, dtype=np.float32)
+        self._target = np.empty(n_bins, dtype=np.float32)
+        self._noisy = np.empty(n_bins, dtype=bool)
+        self._windowed = np.empty(self.size, dtype=np.float32)
+        self._spectrum = np.empty(n_bins, dtype=np.complex64)
+        self.out = np.empty(hop, dtype=np.float32)
+        self._learn = noise_frames  # the first frames are taken as pure noise
+        self._seen = 0
+
+    def process(self, hop_samples):
+        """clean one hop of samples, returns a view of self.out (delayed by one hop)"""
+        self.frame[:self.hop] = self.frame[self.hop:]
+        self.frame[self.hop:] = hop_samples
+        np.multiply(self.frame, self.window, out=self._windowed)
+        if _FFT_OUT:
+            spectrum = np.fft.rfft(self._windowed, out=self._spectrum)
+        else:
+            spectrum = np.fft.rfft(self._windowed)
+        np.abs(spectrum, out=self.power)
+        np.square(self.power, out=self.power)
+
+        if self._seen < self._learn:
+            # running mean over the warm-up frames
+            self._seen += 1
+            np.subtract(self.power, self.noise, out=self._target)
+            self._target /= self._seen
+            self.noise += self._target
+        else:
+            np.multiply(self.noise, self.speech_ratio, out=self._target)
+            np.less(self.power, self._target, out=self._noisy)
+            np.subtract(self.power, self.noise, out=self._target)
+            self._target *= self.noise_rate
+            np.add(self.noise, self._target, out=self.noise, where=self._noisy)
+
+        # gain = max(floor, 1 - strength * noise / power), smoothed over time
+        self.smoothed *= 0.5
+        np.multiply(self.power, 0.5, out=self._target)
+        self.smoothed += self._target
+        np.maximum(self.smoothed, 1e-12, out=self._target)
+        np.divide(self.noise, self._target, out=self._target)
+        np.multiply(self._target, -self.strength, out=self._target)
+        np.add(self._target, 1.0, out=self._target)
+        np.maximum(self._target, self.floor, out=self._target)
+        self._target *= 1.0 - self.smoothing
+        self.gain *= self.smoothing
+        self.gain += self._target
+        spectrum *= self.gain
+
+        if _FFT_OUT:
+            np.fft.irfft(spectrum, n=self.size, out=self._windowed)
+            self._windowed *= self.window
+        else:
+            np.multiply(np.fft.irfft(spectrum, n=self.size), self.window, out=self._windowed)
+        np.add(self._windowed[:self.hop], self.overlap, out=self.out)
+        self.overlap[:] = self._windowed[self.hop:]
+        return self.out
+
+
+class AutomaticGainControl:
+    """levels speech towards target_rms. The gain moves quickly down (loud onsets) and slowly
+    up, and isn't raised at all for near-silence so room noise doesn't get pumped up."""
+
+    def __init__(self, hop, samplerate, target_rms=0.1, max_gain=20.0, silence_rms=0.003,
+                 attack_ms=10.0, release_ms=400.0):
+        self.target_rms = target_rms
+        self.max_gain = max_gain
+        self.silence_rms = silence_rms
+        hop_s = hop / float(samplerate)
+        self.attack = 1.0 - math.exp(-hop_s / (attack_ms / 1000.0))
+        self.release = 1.0 - math.exp(-hop_s / (release_ms / 1000.0))
+        self.gain = 1.0
+        self._ramp = np.linspace(0.0, 1.0, hop, endpoint=False, dtype=np.float32)
+        self._gains = np.empty(hop, dtype=np.float32)
+
+    def process(self, samples):
+        """apply the gain to samples in place, ramped across the block so it doesn't click"""
+        n = len(samples)
+        rms = math.sqrt(float(np.dot(samples, samples)) / n) if n else 0.0
+        wanted = self.gain  # near-silence: hold, don't chase the noise floor
+        if rms > self.silence_rms:
+            wanted = min(self.max_gain, self.target_rms / rms)
+        rate = self.attack if wanted < self.gain else self.release
+        new_gain = self.gain + (wanted - self.gain) * rate
+
+        gains = self._gains[:n]
+        np.multiply(self._ramp[:n], new_gain - self.gain, out=gains)
+        gains += self.gain
+        np.multiply(samples, gains, out=samples)
+        np.clip(samples, -1.0, 1.0, out=samples)
+        self.gain = new_gain
+        return samples
+
+
+class AudioFrontEnd:
+    """mic frames in (any rate, frame_ms long), clean 16 kHz mono out"""
+
+    def __init__(self, in_rate, out_rate=16000, frame_ms=20, denoise=True, agc=True):
+        self.in_rate = int(in_rate)
+        self.out_rate = int(out_rate)
+        self.frame = int(round(self.in_rate * frame_ms / 1000.0))  # input samples per frame
+        self.hop = int(round(self.out_rate * frame_ms / 1000.0))  # output samples per hop
+        self.resampler = PolyphaseResampler(self.in_rate, self.out_rate, self.frame)
+        self.denoiser = NoiseSuppressor(self.hop) if denoise else None
+        self.agc = AutomaticGainControl(self.hop, self.out_rate) if agc else None
+
+        # resampled samples wait here until there is a whole hop
+        self._staged = np.zeros(self.hop + self.resampler.max_out, dtype=np.float32)
+        self._n_staged = 0
+        self._mono = np.empty(self.frame, dtype=np.float32)
+        self.out = np.empty(self.hop * (self.resampler.max_out // self.hop + 2), dtype=np.float32)
+
+    def process(self, frame):
+        """one input frame (float32 or int16, mono or (n, channels)), returns a view of the
+        cleaned output produced so far (usually exactly one hop)"""
+        mono = self._to_mono(frame)
+        resampled = self.resampler.process(mono)
+        n = len(resampled)
+        self._staged[self._n_staged:self._n_staged + n] = resampled
+        self._n_staged += n
+
+        produced = 0
+        while self._n_staged >= self.hop:
+            hop = self._staged[:self.hop]
+            cleaned = self.denoiser.process(hop) if self.denoiser else hop
+            out = self.out[produced:produced + self.hop]
+            out[:] = cleaned
+            if self.agc:
+                self.agc.process(out)
+            produced += self.hop
+            rest = self._n_staged - self.hop
+            self._staged[:rest] = self._staged[self.hop:self._n_staged]
+            self._n_staged = rest
+        return self.out[:produced]
+
+    def _to_mono(self, frame):
+        samples = np.asarray(frame)
+        mono = self._mono[:len(samples)]
+        scale = 1.0 / 32768.0 if samples.dtype == np.int16 else 1.0
+        if samples.ndim == 2 and samples.shape[1] > 1:
+            np.mean(samples, axis=1, out=mono, dtype=np.float32)
+        else:
+            mono[:] = samples.reshape(len(samples))
+        if scale != 1.0:
+            mono *= scale
+        return mono
+
+    def process_recording(self, audio):
+        """run a whole recording through frame by frame, returns a new 16 kHz float32 array"""
+        audio = np.asarray(audio)
+        n_frames = -(-len(audio) // self.frame)
+        result = np.empty(n_frames * (self.hop + 2) + self.hop, dtype=np.float32)
+        filled = 0
+        for i in range(0, len(audio), self.frame):
+            out = self.process(audio[i:i + self.frame])
+            result[filled:filled + len(out)] = out
+            filled += len(out)
+        return result[:filled]
@@ -0,0 +1,246 @@
+# src/components/audio_output.py
+# One long-lived output stream that all speech goes through.
+# TTS backends hand over PCM chunks, they are copied into a preallocated ring buffer and
+# the sound card callback pulls fixed-size blocks out of it. Because the app owns the
+# stream it can change the volume, stop mid-sentence (barge-in), feed the indicator with
+# the level of what is actually playing, and count underruns / measure output latency.
+#
+# device="null" plays into a paced silent stream instead, which is what the benchmarks use.
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+
+class RingBuffer:
+    """fixed-size float32 sample FIFO, one writer thread + the audio callback"""
+
+    def __init__(self, capacity, channels=1):
+        self.data = np.zeros((capacity, channels), dtype=np.float32)
+        self.capacity = capacity
+        self.read_pos = 0
+        self.write_pos = 0  # both count frames since the start, index with % capacity
+        self.lock = threading.Lock()
+
+    def available(self):
+        return self.write_pos - self.read_pos
+
+    def free(self):
+        return self.capacity - self.available()
+
+    def write(self, frames):
+        """copy in as many frames as fit, returns how many"""
+        with self.lock:
+            n = min(len(frames), self.free())
+            start = self.write_pos % self.capacity
+            first = min(n, self.capacity - start)
+            self.data[start:start + first] = frames[:first]
+            self.data[:n - first] = frames[first:n]
+            self.write_pos += n
+            return n
+
+    def read_into(self, out):
+        """fill out with the next frames, returns how many were available (rest is left alone)"""
+        with self.lock:
+            n = min(len(out), self.available())
+            start = self.read_pos % self.capacity
+            first = min(n, self.capacity - start)
+            out[:first] = self.data[start:start + first]
+            out[first:n] = self.data[:n - first]
+            self.read_pos += n
+            return n
+
+    def clear(self):
+        with self.lock:
+            self.read_pos = self.write_pos
+
+
+class NullOutputStream:
+    """stands in for sounddevice.OutputStream: calls the callback at real-time pace, plays nothing"""
+
+    def __init__(self, samplerate, blocksize, channels, dtype, callback, **kwargs):
+        self.samplerate = samplerate
+        self.blocksize = blocksize
+        self.channels = channels
+        self.callback = callback
+        self.latency = blocksize / samplerate
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="null-audio", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        out = np.zeros((self.blocksize, self.channels), dtype=np.float32)
+        period = self.blocksize / self.samplerate
+        next_at = time.perf_counter()
+        while self._running:
+            self.callback(out, self.blocksize, None, None)
+            next_at += period
+            delay = next_at - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                next_at = time.perf_counter()  # fell behind, don't try to catch up
+
+    def stop(self):
+        self._running = False
+        if self._thread:
+            self._thread.join()
+
+    def close(self):
+        self.stop()
+
+
+class AudioOutput:
+    def __init__(self, samplerate=22050, channels=1, blocksize=256, buffer_seconds=30.0,
+                 device=None, volume=1.0):
+        self.samplerate = samplerate
+        self.channels = channels
+        self.blocksize = blocksize
+        self.device = device
+        self.volume = volume
+        self.ring = RingBuffer(int(buffer_seconds * samplerate), channels)
+        self.stream = None
+        self.level_taps = []  # fn(rms 0..1) per block, called on the audio thread so keep them cheap
+
+        self.underruns = 0  # blocks that ran dry mid-utterance (or the device reported one)
+        self.latencies = deque(maxlen=200)  # seconds from play() to the sound card, per chunk
+        self._marks = deque()  # (frame position, time play() was called)
+        self._space = threading.Condition()
+        self._speaking = False  # chunks are (still) coming in
+        self._ending = False  # producer is done, running dry now is just the end
+        self._stops = 0  # bumped by stop() so a play() waiting for room gives up
+
+    def start(self):
+        if self.stream:
+            return
+        stream_cls = NullOutputStream
+        if self.device != "null":
+            import sounddevice as sd  # ImportError/OSError (no PortAudio) go to the caller
+            stream_cls = sd.OutputStream
+        self.stream = stream_cls(
+            samplerate=self.samplerate,
+            blocksize=self.blocksize,
+            channels=self.channels,
+            dtype="float32",
+            callback=self._callback,
+            **({"device": self.device, "latency": "low"} if stream_cls is not NullOutputStream else {}),
+        )
+        self.stream.start()
+
+    def _callback(self, outdata, frames, time_info, status):
+        # audio thread: no allocation, no printing
+        if status is not None and getattr(status, "output_underflow", False):
+            self.underruns += 1
+        n = self.ring.read_into(outdata)
+        if n < frames:
+            outdata[n:] = 0.0
+            if self._speaking and not self._ending:
+                self.underruns += 1  # ran dry between chunks, the TTS fell behind
+            self._speaking = False  # counted once per gap, the next play() re-arms it
+        if self.volume != 1.0:
+            np.multiply(outdata, self.volume, out=outdata)
+
+        now = time.perf_counter()
+        try:
+            while self._marks and self._marks[0][0] < self.ring.read_pos:
+                _, queued_at = self._marks.popleft()
+                self.latencies.append(now - queued_at + self._device_latency())
+        except IndexError:
+            pass  # stop() cleared the marks under us
+
+        if self.level_taps:
+            level = float(np.sqrt(np.vdot(outdata, outdata) / outdata.size)) if n else 0.0
+            for tap in self.level_taps:
+                tap(level)
+
+        with self._space:
+            self._space.notify_all()
+
+    def _device_latency(self):
+        latency = getattr(self.stream, "latency", 0.0)
+        return latency if isinstance(latency, float) else 0.0
+
+    def play(self, pcm, samplerate=None):
+        """queue a chunk of samples (int16 or float, mono or (n, channels)), blocks while the buffer is full"""
+        if self.stream is None:
+            self.start()
+        frames = self._to_frames(pcm, samplerate or self.samplerate)
+        if not len(frames):
+            return
+        self._speaking = True
+        self._ending = False
+        self._marks.append((self.ring.write_pos, time.perf_counter()))
+        stops = self._stops
+        written = 0
+        while written < len(frames):
+            n = self.ring.write(frames[written:])
+            written += n
+            if written < len(frames):
+                with self._space:
+                    self._space.wait(timeout=0.05)
+                if self._stops != stops:
+                    return  # stopped while we were waiting for room
+
+    def _to_frames(self, pcm, samplerate):
+        samples = np.asarray(pcm)
+        if samples.dtype == np.int16:
+            samples = samples.astype(np.float32) / 32768.0
+        else:
+            samples = samples.astype(np.float32, copy=False)
+        if samples.ndim == 1:
+            samples = samples[:, None]
+        if samplerate != self.samplerate and len(samples):
+            # linear resample, fine for speech
+            n_out = int(round(len(samples) * self.samplerate / samplerate))
+            positions = np.linspace(0, len(samples) - 1, n_out)
+            samples = np.stack([np.interp(positions, np.arange(len(samples)), samples[:, c])
+                                for c in range(samples.shape[1])], axis=1).astype(np.float32)
+        if samples.shape[1] != self.channels:
+            samples = np.repeat(samples[:, :1], self.channels, axis=1)
+        return samples
+
+    def stop(self):
+        """drop everything queued, silence starts with the next block (barge-in)"""
+        self._speaking = False
+        self._stops += 1
+        self.ring.clear()
+        self._marks.clear()
+        with self._space:
+            self._space.notify_all()
+
+    def wait(self, timeout=None):
+        """block until everything queued has been played, False on timeout"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        self._ending = True
+        with self._space:
+            while self.ring.available() > 0:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._space.wait(timeout=0.05 if remaining is None else min(0.05, remaining))
+        self._speaking = False
+        return True
+
+    def is_playing(self):
+        return self.ring.available() > 0
+
+    def stats(self):
+        latencies = sorted(self.latencies)
+        return {
+            'underruns': self.underruns,
+            'latency_ms_p50': latencies[len(latencies) // 2] * 1000.0 if latencies else 0.0,
+            'latency_ms_max': latencies[-1] * 1000.0 if latencies else 0.0,
+            'buffered_ms': self.ring.available() / self.samplerate * 1000.0,
+        }
+
+    def close(self):
+        self.stop()
+        if self.stream:
+            self.stream.stop()
+            self.stream.close()
+            self.stream = None
@@ -0,0 +1,227 @@
+# src/components/autotune.py
+# Hardware-aware tuning of llama.cpp runtime settings.
+# A Pi 4, a Pi 5 and a 16-core desktop want very different n_threads / n_batch / n_ctx,
+# so calibrate() measures prompt-eval and decode speed on this machine and the winner is
+# stored in user_config.json under the machine's fingerprint + model file.
+# router.get_backend picks the stored settings up automatically.
+import hashlib
+import json
+import os
+import platform
+import time
+
+# what LocalModel uses when nothing has been tuned
+DEFAULT_LLAMA_PARAMS = {
+    'n_ctx': 4096,
+    'n_threads': 4,
+    'n_gpu_layers': 0,
+    'use_mmap': True,
+    'use_mlock': False,
+}
+
+THREAD_CANDIDATES = [1, 2, 3, 4, 6, 8, 12, 16, 24, 32]
+BATCH_CANDIDATES = [32, 64, 128, 256, 512]
+CTX_CANDIDATES = [1024, 2048, 4096, 8192]
+
+# a "typical" K-2SO turn, used to score settings by estimated turn time
+TYPICAL_PROMPT_TOKENS = 300
+TYPICAL_REPLY_TOKENS = 120
+
+CALIBRATION_TEXT = (
+    "K-2SO is a reprogrammed Imperial security droid. He is blunt, literal and calculates odds "
+    "constantly. The crew asked him to review the mission plan, check the shield gate codes, "
+    "estimate the probability of success and report anything that could go wrong on the way "
+    "to the data vault. "
+) * 6
+
+
+def total_ram_mb():
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES') // (1024 * 1024)
+    except (ValueError, OSError, AttributeError):  # windows
+        return 0
+
+
+def _cpu_model():
+    # /proc/cpuinfo has "model name" on x86 and "Model"/"Hardware" on the Pi
+    try:
+        with open("/proc/cpuinfo", "r") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if key.strip() in ("model name", "Model", "Hardware") and value.strip():
+                    return value.strip()
+    except OSError:
+        pass
+    return platform.processor() or platform.machine()
+
+
+def hardware_fingerprint():
+    """short stable key for 'this kind of machine'"""
+    parts = [platform.system(), platform.machine(), _cpu_model(), str(os.cpu_count()), str(total_ram_mb() // 512)]
+    digest = hashlib.sha1("|".join(parts).encode("utf-8")).hexdigest()[:10]
+    return f"{platform.system()}-{platform.machine()}-{os.cpu_count()}c-{digest}"
+
+
+def read_user_config(path):
+    if path and os.path.exists(path):
+        with open(path, "r") as f:
+            return json.load(f)
+    return {}
+
+
+def write_user_config(path, data):
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp, path)
+
+
+def load_tuned_params(user_config_path, model_path):
+    """tuned llama params for this machine + model, {} if never calibrated (or the file changed)"""
+    if not user_config_path or not os.path.exists(model_path):
+        return {}
+    try:
+        tuning = read_user_config(user_config_path).get("llama_tuning", {})
+    except (OSError, ValueError):
+        return {}
+    entry = tuning.get(hardware_fingerprint(), {}).get(os.path.basename(model_path))
+    if not entry or entry.get("model_size") != os.path.getsize(model_path):
+        return {}
+    return {k: entry[k] for k in ('n_threads', 'n_batch', 'n_ctx') if k in entry}
+
+
+def save_tuned_params(user_config_path, model_path, result):
+    data = read_user_config(user_config_path)
+    machines = data.setdefault("llama_tuning", {})
+    models = machines.setdefault(hardware_fingerprint(), {})
+    models[os.path.basename(model_path)] = dict(
+        result,
+        model_size=os.path.getsize(model_path),
+        tuned=time.strftime("%Y-%m-%d %H:%M"),
+    )
+    write_user_config(user_config_path, data)
+
+
+def estimate_kv_cache_mb(metadata, n_ctx):
+    """f16 K+V cache size from GGUF metadata (0 if the keys are missing)"""
+    arch = metadata.get("general.architecture", "llama")
+    try:
+        layers = int(metadata[f"{arch}.block_count"])
+        embd = int(metadata[f"{arch}.embedding_length"])
+        heads = int(metadata[f"{arch}.attention.head_count"])
+        heads_kv = int(metadata.get(f"{arch}.attention.head_count_kv", heads))
+    except (KeyError, ValueError):
+        return 0
+    return 2 * layers * n_ctx * (embd * heads_kv // heads) * 2 // (1024 * 1024)
+
+
+def _measure(model_path, n_threads, n_batch, n_ctx, tokens_prompt):
+    """load with the given settings, return (prompt tokens/s, decode tokens/s, metadata)"""
+    from llama_cpp import Llama
+    llm = Llama(
+        model_path=model_path,
+        n_ctx=n_ctx,
+        n_threads=n_threads,
+        n_batch=n_batch,
+        n_gpu_layers=0,
+        verbose=False,
+        use_mmap=True,
+        use_mlock=False,
+    )
+    try:
+        tokens = llm.tokenize(CALIBRATION_TEXT.encode("utf-8"))[:tokens_prompt]
+
+        llm.reset()
+        start = time.perf_counter()
+        llm.eval(tokens)
+        prompt_tps = len(tokens) / (time.perf_counter() - start)
+
+        # same tokens are already in the kv cache, so generate() goes straight to decoding
+        start = time.perf_counter()
+        n_decoded = 0
+        for _ in llm.generate(tokens, top_k=1, top_p=1.0, temp=0.0, reset=True):
+            n_decoded += 1
+            if n_decoded >= 32:
+                break
+        elapsed = time.perf_counter() - start
+        decode_tps = n_decoded / elapsed if elapsed > 0 else 0.0
+        return prompt_tps, decode_tps, dict(getattr(llm, "metadata", {}) or {})
+    finally:
+        del llm
+
+
+def _turn_seconds(prompt_tps, decode_tps):
+    if not prompt_tps or not decode_tps:
+        return float("inf")
+    return TYPICAL_PROMPT_TOKENS / prompt_tps + TYPICAL_REPLY_TOKENS / decode_tps
+
+
+def calibrate(model_path, ram_budget_mb=None, max_threads=None, log=print):
+    """coordinate sweep: threads, then batch at the best thread count, then the largest
+    context that fits the RAM budget. returns the chosen settings + measured speeds"""
+    cpus = os.cpu_count() or 4
+    max_threads = max_threads or cpus
+    ram_budget_mb = ram_budget_mb or int(total_ram_mb() * 0.75) or 4096
+    model_mb = os.path.getsize(model_path) // (1024 * 1024)
+    tokens_prompt = 256
+
+    results = []
+
+    def run(n_threads, n_batch, n_ctx):
+        prompt_tps, decode_tps, metadata = _measure(model_path, n_threads, n_batch, n_ctx, tokens_prompt)
+        turn = _turn_seconds(prompt_tps, decode_tps)
+        log(f"  threads={n_threads:<3} batch={n_batch:<4} ctx={n_ctx:<5} "
+            f"prompt {prompt_tps:7.1f} tok/s  decode {decode_tps:6.1f} tok/s  ~turn {turn:5.2f}s")
+        results.append((turn, n_threads, n_batch, n_ctx, prompt_tps, decode_tps))
+        return turn, metadata
+
+    log(f"calibrating {os.path.basename(model_path)} ({model_mb} MB) on {hardware_fingerprint()}")
+    log(f"RAM budget {ram_budget_mb} MB")
+
+    # 1) threads, at a small context so the sweep stays cheap
+    base_ctx = CTX_CANDIDATES[0]
+    best_threads, best_turn, metadata = None, float("inf"), {}
+    for n_threads in [t for t in THREAD_CANDIDATES if t <= max_threads]:
+        turn, metadata = run(n_threads, 512, base_ctx)
+        if turn < best_turn:
+            best_threads, best_turn = n_threads, turn
+        elif turn > best_turn * 1.15:
+            break  # past the knee, more threads only fight over cores
+
+    # 2) batch size at the best thread count (512 was already measured in step 1)
+    best_batch = 512
+    for n_batch in BATCH_CANDIDATES:
+        if n_batch == 512:
+            continue
+        turn, _ = run(best_threads, n_batch, base_ctx)
+        if turn < best_turn * 0.98:
+            best_batch, best_turn = n_batch, turn
+
+    # 3) biggest context whose weights + kv cache fit the budget, checked for speed
+    best_ctx = base_ctx
+    ctx_limit = int(metadata.get(f"{metadata.get('general.architecture', 'llama')}.context_length", 0) or 0)
+    for n_ctx in CTX_CANDIDATES[1:]:
+        if ctx_limit and n_ctx > ctx_limit:
+            break
+        needed = model_mb + estimate_kv_cache_mb(metadata, n_ctx) + 256  # + runtime/scratch headroom
+        if needed > ram_budget_mb:
+            log(f"  ctx={n_ctx} needs ~{needed} MB, over budget")
+            break
+        turn, _ = run(best_threads, best_batch, n_ctx)
+        if turn <= best_turn * 1.10:
+            best_ctx = n_ctx
+
+    chosen = next(r for r in results if r[1:4] == (best_threads, best_batch, best_ctx))
+    # untuned settings at the same context, for the before/after line
+    default = _turn_seconds(*_measure(model_path, DEFAULT_LLAMA_PARAMS['n_threads'], 512,
+                                      best_ctx, tokens_prompt)[:2])
+    return {
+        'n_threads': best_threads,
+        'n_batch': best_batch,
+        'n_ctx': best_ctx,
+        'prompt_tokens_per_s': round(chosen[4], 1),
+        'decode_tokens_per_s': round(chosen[5], 1),
+        'turn_seconds': round(chosen[0], 3),
+        'default_turn_seconds': round(default, 3),
+        'ram_budget_mb': ram_budget_mb,
+    }
@@ -0,0 +1,200 @@
+# src/components/chat_log.py
+# Persistent chat history in SQLite.
+# Turns are append-only: the chat loop drops them on a queue and a background
+# thread writes them in batches, so a slow disk (SD card on the Pi) never stalls a reply.
+# An FTS5 index over user/assistant text makes "what did I ask about X" fast even
+# after months of history.
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS turns (
+    id        INTEGER PRIMARY KEY,
+    session   TEXT NOT NULL,
+    created   REAL NOT NULL,
+    model     TEXT,
+    user      TEXT NOT NULL,
+    assistant TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS turns_created ON turns(created);
+"""
+
+# external-content FTS table, kept in sync by an insert trigger (rows are never updated/deleted)
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS turns_fts USING fts5(
+    user, assistant, content='turns', content_rowid='id'
+);
+CREATE TRIGGER IF NOT EXISTS turns_ai AFTER INSERT ON turns BEGIN
+    INSERT INTO turns_fts(rowid, user, assistant) VALUES (new.id, new.user, new.assistant);
+END;
+"""
+
+_STOP = object()
+
+
+def _like_escape(term):
+    # backslash first, then the two LIKE wildcards
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+class ChatLog:
+    def __init__(self, db_path, batch_size=64, flush_interval=0.5):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.session_id = uuid.uuid4().hex[:12]
+        self.has_fts = False
+        self.dropped = 0  # turns lost to write errors (reported, never raised into the chat loop)
+
+        db_dir = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(db_dir, exist_ok=True)
+        self._init_db()
+
+        # one read connection shared by callers, the writer thread owns its own
+        self._read_conn = self._connect(check_same_thread=False)
+        self._read_lock = threading.Lock()
+
+        self._queue = queue.Queue()
+        self._writer = threading.Thread(target=self._write_loop, daemon=True)
+        self._writer.start()
+
+    def _connect(self, check_same_thread=True):
+        conn = sqlite3.connect(self.db_path, check_same_thread=check_same_thread)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")  # safe with WAL, avoids an fsync per commit
+        return conn
+
+    def _init_db(self):
+        conn = self._connect()
+        try:
+            conn.executescript(SCHEMA)
+            try:
+                conn.executescript(FTS_SCHEMA)
+                self.has_fts = True
+            except sqlite3.OperationalError as e:
+                # some sqlite builds ship without fts5, search falls back to LIKE
+                print(f"chat log: full-text search unavailable ({e})")
+            conn.commit()
+        finally:
+            conn.close()
+
+    def append(self, user, assistant, model=None):
+        """queue a finished turn for writing, never blocks the caller"""
+        self._queue.put((self.session_id, time.time(), model, user, assistant))
+
+    def _write_loop(self):
+        conn = self._connect()
+        running = True
+        while running:
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+
+            # grab whatever else is already waiting so a burst is one transaction
+            batch = []
+            taken = 1
+            while True:
+                if item is _STOP:
+                    running = False
+                else:
+                    batch.append(item)
+                if not running or len(batch) >= self.batch_size:
+                    break
+                try:
+                    item = self._queue.get_nowait()
+                    taken += 1
+                except queue.Empty:
+                    break
+
+            if batch:
+                try:
+                    with conn:
+                        conn.executemany(
+                            "INSERT INTO turns(session, created, model, user, assistant) VALUES (?, ?, ?, ?, ?)",
+                            batch,
+                        )
+                except sqlite3.Error as e:
+                    self.dropped += len(batch)
+                    print(f"chat log write failed: {e}")
+
+            for _ in range(taken):
+                self._queue.task_done()
+        conn.close()
+
+    def flush(self):
+        """block until everything queued so far is on disk"""
+        self._queue.join()
+
+    def recent_turns(self, limit=10):
+        """last `limit` turns oldest-first, in the {'user', 'assistant'} shape the backends use"""
+        with self._read_lock:
+            rows = self._read_conn.execute(
+                "SELECT user, assistant FROM turns ORDER BY id DESC LIMIT ?", (limit,)
+            ).fetchall()
+        return [{'user': u, 'assistant': a} for u, a in reversed(rows)]
+
+    def turns_after(self, last_id, limit=512):
+        """(id, user, assistant) rows with id > last_id, for incremental indexers"""
+        with self._read_lock:
+            return self._read_conn.execute(
+                "SELECT id, user, assistant FROM turns WHERE id > ? ORDER BY id LIMIT ?",
+                (last_id, limit),
+            ).fetchall()
+
+    def get_turns(self, ids):
+        """{id: {'user', 'assistant', 'created'}} for the given row ids"""
+        ids = [int(i) for i in ids]
+        if not ids:
+            return {}
+        marks = ",".join("?" * len(ids))
+        with self._read_lock:
+            rows = self._read_conn.execute(
+                f"SELECT id, created, user, assistant FROM turns WHERE id IN ({marks})", ids
+            ).fetchall()
+        return {i: {'created': c, 'user': u, 'assistant': a} for i, c, u, a in rows}
+
+    def search(self, text, limit=10):
+        """best matching past turns for free text, newest first on ties"""
+        terms = [t for t in text.split() if t]
+        if not terms:
+            return []
+
+        with self._read_lock:
+            if self.has_fts:
+                # quote every term so user text can't be parsed as fts5 query syntax
+                match = " ".join('"' + t.replace('"', '""') + '"' for t in terms)
+                rows = self._read_conn.execute(
+                    "SELECT t.id, t.created, t.user, t.assistant FROM turns_fts f "
+                    "JOIN turns t ON t.id = f.rowid WHERE turns_fts MATCH ? "
+                    "ORDER BY bm25(turns_fts), t.id DESC LIMIT ?",
+                    (match, limit),
+                ).fetchall()
+            else:
+                # escape LIKE wildcards so "100%" or "snake_case" match literally
+                where = " AND ".join("(user LIKE ? ESCAPE '\\' OR assistant LIKE ? ESCAPE '\\')" for _ in terms)
+                params = [p for t in terms for p in (f"%{_like_escape(t)}%",) * 2]
+                rows = self._read_conn.execute(
+                    f"SELECT id, created, user, assistant FROM turns WHERE {where} ORDER BY id DESC LIMIT ?",
+                    params + [limit],
+                ).fetchall()
+
+        return [
+            {'id': i, 'created': c, 'user': u, 'assistant': a}
+            for i, c, u, a in rows
+        ]
+
+    def count(self):
+        with self._read_lock:
+            return self._read_conn.execute("SELECT COUNT(*) FROM turns").fetchone()[0]
+
+    def close(self):
+        """flush pending turns and stop the writer"""
+        if self._writer.is_alive():
+            self._queue.put(_STOP)
+            self._writer.join()
+        self._read_conn.close()
@@ -1,8 +1,146 @@
 # src/components/chat_session.py
+import os
+import threading
+import time
+from collections import deque
+
+from components.metrics import metrics
+
+_turns = metrics.counter("turns_total", "chat turns answered")
+_turn_seconds = metrics.histogram("turn_seconds", "prompt sent to reply finished")
+_ttft_seconds = metrics.histogram("time_to_first_token_seconds", "prompt sent to first streamed chunk")
+_tokens = metrics.counter("tokens_generated_total", "tokens decoded by the model")
+_failed_turns = metrics.counter("failed_turns_total", "replies that were a backend error, kept out of history")
+_tokens_per_second = metrics.histogram(
+    "tokens_per_second", "decode speed per reply",
+    buckets=(1, 2, 3, 4, 5, 7.5, 10, 15, 20, 30, 50, 100),
+)
+_prefill_saved_seconds = metrics.histogram("prefill_saved_seconds", "prompt eval a reply skipped thanks to idle prefill")
+
 
 class ChatSession:
-    def __init__(self, backend):
+    def __init__(self, backend, chat_log=None, history_turns=4, memory=None, recorder=None):
         self.backend = backend
+        self.chat_log = chat_log
+        self.memory = memory  # optional LongTermMemory for recalling older conversations
+        self.recorder = recorder  # optional SessionRecorder, keeps prompts + timings for replay
+        # last few turns get sent along with each prompt for follow-up questions
+        self.history = deque(maxlen=history_turns)
+
+        # pick up where the last run left off (cheap indexed query, no file parsing)
+        if chat_log and history_turns:
+            self.history.extend(chat_log.recent_turns(history_turns))
+
+        self._prefill_thread = None
+        self._prefill_stop = threading.Event()
+
+    def prefill(self):
+        """while waiting for the user, let the backend pre-evaluate the part of the next
+        prompt that is already known (history + user tag), in a low priority thread"""
+        if not hasattr(self.backend, "prefill"):
+            return
+        self.cancel_prefill()
+        self._prefill_stop = threading.Event()
+        self._prefill_thread = threading.Thread(
+            target=self._run_prefill,
+            args=(self.backend, list(self.history), self._prefill_stop.is_set),
+            name="prefill",
+            daemon=True,
+        )
+        self._prefill_thread.start()
+
+    def _run_prefill(self, backend, history, should_stop):
+        try:
+            # linux niceness is per thread, llama.cpp's compute threads inherit it
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 10)
+        except (AttributeError, OSError):
+            pass
+        try:
+            backend.prefill(history, should_stop=should_stop)
+        except Exception as e:
+            print(f"prefill failed: {e}")
+
+    def cancel_prefill(self):
+        """stop a running prefill and wait for it, the model can't do two things at once"""
+        if self._prefill_thread:
+            self._prefill_stop.set()
+            self._prefill_thread.join()
+            self._prefill_thread = None
+
+    def send_message(self, prompt, record=True):
+        self.cancel_prefill()
+        start, decode = time.perf_counter(), getattr(self.backend, "last_decode", None)
+        response = self.backend.generate_response(self._with_memory(prompt), conversation_history=list(self.history))
+        if record:
+            self._record(prompt, response)
+            self._observe_turn(prompt, response, start, None, decode)
+        return response
+
+    def stream_message(self, prompt, record=True):
+        # backends that can stream hand back chunks as they decode,
+        # anything else just yields the full reply in one piece.
+        # record=False leaves history/log/metrics alone (speculative replies), see commit_turn()
+        if not hasattr(self.backend, "stream_response"):
+            yield self.send_message(prompt, record=record)
+            return
+
+        self.cancel_prefill()
+        start, decode = time.perf_counter(), getattr(self.backend, "last_decode", None)
+        chunks = []
+        ttft = None
+        model_prompt = self._with_memory(prompt)
+        for chunk in self.backend.stream_response(model_prompt, conversation_history=list(self.history)):
+            if not chunks:
+                ttft = time.perf_counter() - start
+            chunks.append(chunk)
+            yield chunk
+        if record:
+            response = "".join(chunks)
+            self._record(prompt, response)
+            self._observe_turn(prompt, response, start, ttft, decode)
+
+    def commit_turn(self, prompt, response, start, ttft, previous_decode):
+        """keep a reply generated with record=False as if it had been a normal turn.
+        start/ttft/previous_decode are what stream_message would have seen (see _observe_turn)"""
+        self._record(prompt, response)
+        self._observe_turn(prompt, response, start, ttft, previous_decode)
+
+    def _observe_turn(self, prompt, response, start, ttft, previous_decode):
+        elapsed = time.perf_counter() - start
+        _turns.inc()
+        _turn_seconds.observe(elapsed)
+        if ttft is not None:
+            _ttft_seconds.observe(ttft)
+        # local backends (and the worker, which forwards it) report how the decode went,
+        # a reply that failed leaves the previous turn's numbers there
+        decode = getattr(self.backend, "last_decode", None)
+        if decode is previous_decode:
+            decode = None
+        if decode and decode.get('tokens'):
+            _tokens.inc(decode['tokens'])
+            _tokens_per_second.observe(decode['tokens_per_s'])
+        if decode and decode.get('prefill_saved_ms'):
+            _prefill_saved_seconds.observe(decode['prefill_saved_ms'] / 1000.0)
+        if self.recorder:
+            self.recorder.turn(prompt, response, start, ttft, elapsed, decode)
+
+    def _with_memory(self, prompt):
+        # recalled snippets ride along in the current user message, so the
+        # history part of the prompt stays identical turn to turn
+        if not self.memory:
+            return prompt
+        context = self.memory.context_for(prompt, history=self.history)
+        return f"{context}\n{prompt}" if context else prompt
 
-    def send_message(self, prompt):
-        return self.backend.generate_response(prompt)
\ No newline at end of file
+    def _record(self, prompt, response):
+        # an error message ("model not loaded", "Error contacting remote model: ...") isn't
+        # something the assistant said, it must not come back as context or get recalled later
+        if getattr(self.backend, "last_error", None):
+            _failed_turns.inc()
+            return
+        if self.history.maxlen:
+            self.history.append({'user': prompt, 'assistant': response})
+        if self.chat_log:
+            self.chat_log.append(prompt, response, model=getattr(self.backend, "model_name", None))
+        if self.memory:
+            self.memory.notify()
@@ -0,0 +1,273 @@
+# src/components/commands.py
+# Structured commands ("turn it down a bit", "switch to the small model") for the assistant.
+# Here the model answers with one small JSON object instead of prose, e.g.
+# {"action":"set_volume","level":30}.
+#
+# For local models the object is forced by a llama.cpp GBNF grammar built from the command
+# list. Keys come in a fixed order with no whitespace, so the model only has to pick the
+# action and fill in the values. Remote models get the same thing as a JSON schema
+# (response_format). Whatever the backend, the reply is read only up to the brace that closes
+# the object and the stream is closed right there. A model without constraints that keeps
+# talking after the JSON costs nothing extra. The text is then parsed into a typed Command
+# for the CommandDispatcher.
+import json
+import time
+
+from components.metrics import metrics
+
+_command_seconds = metrics.histogram("command_seconds", "request to parsed command (structured output)")
+_parse_failures = metrics.counter("command_parse_failures_total", "structured replies that weren't a valid command")
+
+
+class Arg:
+    """a command argument: 'string', 'integer' (low..high) or 'enum' (one of choices)"""
+
+    def __init__(self, kind, low=None, high=None, choices=None):
+        if kind not in ("string", "integer", "enum"):
+            raise ValueError(f"unknown argument kind: {kind}")
+        self.kind = kind
+        self.low = low
+        self.high = high
+        self.choices = list(choices or [])
+
+    def describe(self):
+        if self.kind == "integer" and self.low is not None and self.high is not None:
+            return f"{self.low}-{self.high}"
+        if self.kind == "enum":
+            return "|".join(self.choices)
+        return self.kind
+
+    def convert(self, name, value):
+        # json.loads already did the syntax, this checks what the grammar can't (ranges, types)
+        if self.kind == "integer":
+            if isinstance(value, bool) or not isinstance(value, int):
+                raise ValueError(f"{name} should be a whole number, got {value!r}")
+            if (self.low is not None and value < self.low) or (self.high is not None and value > self.high):
+                raise ValueError(f"{name} should be {self.describe()}, got {value}")
+            return value
+        if not isinstance(value, str):
+            raise ValueError(f"{name} should be text, got {value!r}")
+        if self.kind == "enum" and value not in self.choices:
+            raise ValueError(f"{name} should be one of {self.describe()}, got {value!r}")
+        return value
+
+
+class CommandSpec:
+    def __init__(self, action, description, **args):
+        self.action = action
+        self.description = description
+        self.args = args  # name -> Arg, in the order the model writes them
+
+
+class Command:
+    """a parsed command: action name plus its arguments, already checked and converted"""
+
+    __slots__ = ("action", "args")
+
+    def __init__(self, action, args=None):
+        self.action = action
+        self.args = args or {}
+
+    def __eq__(self, other):
+        return isinstance(other, Command) and (self.action, self.args) == (other.action, other.args)
+
+    def __repr__(self):
+        return f"Command({self.action!r}, {self.args!r})"
+
+
+def default_commands(model_names=()):
+    """what the assistant itself can be told to do (handlers are registered in main.py).
+    'chat' is the way out for anything that isn't a command"""
+    specs = [
+        CommandSpec("set_volume", "change how loud the voice is, in percent", level=Arg("integer", 0, 100)),
+        CommandSpec("stop_speaking", "stop talking right now"),
+        CommandSpec("search_history", "look something up in past conversations", query=Arg("string")),
+        CommandSpec("show_memory", "show where the memory (RAM) went"),
+        CommandSpec("set_animation", "change the indicator animation", mode=Arg("enum", choices=("ripples", "frequency"))),
+    ]
+    if model_names:
+        specs.append(CommandSpec("switch_model", "switch to another language model",
+                                 name=Arg("enum", choices=model_names)))
+    specs.append(CommandSpec("chat", "anything else: a question or just talking"))
+    return CommandSet(specs)
+
+
+def _gbnf_literal(text):
+    return '"' + text.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def _integer_rule(arg):
+    # plain digits without leading zeros, up to as many as the upper bound has (range checked on parse)
+    digits = len(str(arg.high)) if arg.high is not None else 6
+    options = ['[0-9]'] + ['[1-9]' + ' [0-9]' * n for n in range(1, digits)]
+    rule = " | ".join(options)
+    return f'"-"? ({rule})' if arg.low is None or arg.low < 0 else f"({rule})"
+
+
+class CommandSet:
+    def __init__(self, specs):
+        self.specs = {spec.action: spec for spec in specs}
+        self._grammar = None
+
+    def grammar(self):
+        """GBNF for exactly one command object, compact and with keys in a fixed order"""
+        if self._grammar is None:
+            rules, names = [], []
+            for spec in self.specs.values():
+                name = "cmd-" + spec.action.replace("_", "-")
+                names.append(name)
+                parts = [_gbnf_literal(json.dumps(spec.action))]
+                for arg_name, arg in spec.args.items():
+                    parts.append(_gbnf_literal("," + json.dumps(arg_name) + ":"))
+                    if arg.kind == "integer":
+                        parts.append(_integer_rule(arg))
+                    elif arg.kind == "enum":
+                        parts.append("(" + " | ".join(_gbnf_literal(json.dumps(c)) for c in arg.choices) + ")")
+                    else:
+                        parts.append("string")
+                rules.append(f"{name} ::= " + " ".join(parts))
+            rules.insert(0, 'root ::= "{\\"action\\":" (' + " | ".join(names) + ') "}"')
+            rules.append('string ::= "\\"" char* "\\""')
+            rules.append('char ::= [^"\\\\\\x00-\\x1f] | "\\\\" ["\\\\/bfnrt]')
+            self._grammar = "\n".join(rules) + "\n"
+        return self._grammar
+
+    def schema(self):
+        """the same thing as a JSON schema, for OpenAI-style response_format"""
+        variants = []
+        for spec in self.specs.values():
+            properties = {"action": {"const": spec.action}}
+            for arg_name, arg in spec.args.items():
+                if arg.kind == "integer":
+                    prop = {"type": "integer"}
+                    if arg.low is not None:
+                        prop["minimum"] = arg.low
+                    if arg.high is not None:
+                        prop["maximum"] = arg.high
+                elif arg.kind == "enum":
+                    prop = {"type": "string", "enum": arg.choices}
+                else:
+                    prop = {"type": "string"}
+                properties[arg_name] = prop
+            variants.append({"type": "object", "properties": properties,
+                             "required": ["action"] + list(spec.args), "additionalProperties": False})
+        return {"anyOf": variants}
+
+    def prompt(self, request):
+        """the user message for a command turn: the choices, then what was asked"""
+        lines = ["Answer with the one command that does this request, as JSON. Commands:"]
+        for spec in self.specs.values():
+            args = ", ".join(f"{name}: {arg.describe()}" for name, arg in spec.args.items())
+            lines.append(f"- {spec.action}({args}): {spec.description}")
+        lines.append(f"Request: {request}")
+        return "\n".join(lines)
+
+    def parse(self, text):
+        """the model's JSON -> Command, ValueError if it isn't one of ours"""
+        end = object_end(text)
+        if end is None:
+            raise ValueError(f"no complete JSON object in {text[:80]!r}")
+        start = text.index("{")
+        try:
+            data = json.loads(text[start:end])
+        except json.JSONDecodeError as e:
+            raise ValueError(f"bad JSON: {e}")
+        if not isinstance(data, dict):
+            raise ValueError("not a JSON object")
+        spec = self.specs.get(data.pop("action", None))
+        if spec is None:
+            raise ValueError(f"unknown action in {text[start:end]}")
+        unknown = set(data) - set(spec.args)
+        if unknown:
+            raise ValueError(f"{spec.action} doesn't take {', '.join(sorted(unknown))}")
+        missing = [name for name in spec.args if name not in data]
+        if missing:
+            raise ValueError(f"{spec.action} needs {', '.join(missing)}")
+        return Command(spec.action, {name: arg.convert(name, data[name]) for name, arg in spec.args.items()})
+
+
+def object_end(text, start=0):
+    """index just past the '}' that closes the first JSON object in text, None while incomplete"""
+    depth = 0
+    in_string = escaped = False
+    for i in range(start, len(text)):
+        c = text[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif c == "\\":
+                escaped = True
+            elif c == '"':
+                in_string = False
+        elif c == '"':
+            in_string = depth > 0
+        elif c == "{":
+            depth += 1
+        elif c == "}" and depth:
+            depth -= 1
+            if not depth:
+                return i + 1
+    return None
+
+
+def read_object(chunks):
+    """join streamed chunks until the first JSON object is complete, then close the stream
+    (that stops the decode). returns (text up to the object's end, chunks read)"""
+    text = ""
+    n = 0
+    try:
+        for chunk in chunks:
+            n += 1
+            text += chunk
+            end = object_end(text)
+            if end is not None:
+                return text[:end], n
+    finally:
+        close = getattr(chunks, "close", None)
+        if close:
+            close()
+    return text, n
+
+
+def request_command(session, commands, request, max_tokens=64):
+    """one command turn on a ChatSession's backend. Constrained where the backend can do it,
+    otherwise the instructions alone and the first JSON object in the reply"""
+    start = time.perf_counter()
+    session.cancel_prefill()
+    backend = session.backend
+    prompt = commands.prompt(request)
+    history = list(session.history)
+    if hasattr(backend, "stream_structured"):
+        chunks = backend.stream_structured(prompt, grammar=commands.grammar(), schema=commands.schema(),
+                                           max_tokens=max_tokens, conversation_history=history)
+    else:
+        chunks = iter([backend.generate_response(prompt, conversation_history=history)])
+    text, _ = read_object(chunks)
+    try:
+        command = commands.parse(text)
+    except ValueError:
+        _parse_failures.inc()
+        raise
+    finally:
+        _command_seconds.observe(time.perf_counter() - start)
+    metrics.counter("commands_total", "structured commands parsed", labels={"action": command.action}).inc()
+    return command
+
+
+class CommandDispatcher:
+    """action name -> handler(**args) returning a short message for the user"""
+
+    def __init__(self):
+        self.handlers = {}
+
+    def register(self, action, handler):
+        self.handlers[action] = handler
+
+    def dispatch(self, command):
+        handler = self.handlers.get(command.action)
+        if handler is None:
+            return f"I don't know how to {command.action.replace('_', ' ')}."
+        try:
+            return handler(**command.args)
+        except Exception as e:
+            return f"{command.action} failed: {e}"
@@ -0,0 +1,117 @@
+# src/components/fan_out.py
+# Several prompts at once: the same question to a few models side by side (/compare), or
+# sub-questions answered in parallel. Remote calls go through one async HTTP client (httpx,
+# over HTTP/2 when the h2 package is installed, so requests to the same server share one
+# connection). The whole batch then takes about as long as its slowest request instead of
+# the sum of all of them.
+#
+# Each endpoint (host:port) gets its own limit on requests in flight (RemoteModel.max_concurrency)
+# so a batch doesn't trip a server's rate limit. Local models answer one prompt at a time
+# (llama.cpp holds one context) and run in a thread next to the remote requests. Without
+# httpx, remote requests fall back to the blocking client on a thread each.
+#
+# ask_all (the chat loop) runs its batches on one event loop on a background thread, with one
+# client kept open across batches: making an httpx client builds an SSL context (~150 ms on a
+# Pi), and a kept client can reuse its connections the next time.
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+
+def http2_available():
+    try:
+        import h2  # noqa: F401  (httpx only speaks HTTP/2 with it installed)
+        return True
+    except ImportError:
+        return False
+
+
+def open_client(timeout=60):
+    """a shared async client, or None when httpx isn't installed"""
+    if httpx is None:
+        return None
+    return httpx.AsyncClient(http2=http2_available(), timeout=timeout)
+
+
+def endpoint(backend):
+    """(key, limit) for the requests-in-flight limit a backend falls under"""
+    url = getattr(backend, "url", None)
+    if url:
+        return urlsplit(url).netloc, max(1, int(getattr(backend, "max_concurrency", 4) or 1))
+    return ("local", id(backend)), 1
+
+
+async def gather_responses(requests, client=None):
+    """requests: (backend, prompt) or (backend, prompt, history) tuples. Returns
+    [{'reply', 'seconds'}] in the same order, a failed request has an error string as its reply"""
+    own_client = client is None
+    client = client or open_client()
+    limits = {}
+    # blocking calls (local models, remote without httpx) each get a thread, the default pool
+    # is only cores+4 wide and would quietly cap the batch
+    executor = ThreadPoolExecutor(max_workers=max(1, len(requests)), thread_name_prefix="fan-out")
+    loop = asyncio.get_running_loop()
+
+    async def answer(backend, prompt, history=None):
+        key, limit = endpoint(backend)
+        if key not in limits:
+            limits[key] = asyncio.Semaphore(limit)
+        async with limits[key]:
+            start = time.perf_counter()
+            try:
+                if client is not None and hasattr(backend, "agenerate_response"):
+                    reply = await backend.agenerate_response(prompt, history, client=client)
+                else:
+                    reply = await loop.run_in_executor(
+                        executor, lambda: backend.generate_response(prompt, conversation_history=history))
+            except Exception as e:
+                # one broken backend shouldn't take the other answers down with it
+                reply = f"error: {e}"
+            return {'reply': reply, 'seconds': time.perf_counter() - start}
+
+    try:
+        return await asyncio.gather(*(answer(*request) for request in requests))
+    finally:
+        executor.shutdown(wait=False)
+        if own_client and client is not None:
+            await client.aclose()
+
+
+_loop = None
+_client = None
+_lock = threading.Lock()
+
+
+def _background():
+    global _loop, _client
+    with _lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="fan-out-loop", daemon=True).start()
+            _client = open_client()
+        return _loop, _client
+
+
+def ask_all(requests):
+    """gather_responses for synchronous code (the chat loop), on the shared client"""
+    loop, client = _background()
+    return asyncio.run_coroutine_threadsafe(gather_responses(requests, client), loop).result()
+
+
+def close_client():
+    """close the shared client and stop its loop (on exit)"""
+    global _loop, _client
+    with _lock:
+        if _loop is None:
+            return
+        if _client is not None:
+            asyncio.run_coroutine_threadsafe(_client.aclose(), _loop).result()
+        _loop.call_soon_threadsafe(_loop.stop)
+        _loop, _client = None, None
@@ -0,0 +1,203 @@
+# src/components/indicator_atlas.py
+# A cheaper way to draw the AI indicator animations, for fullscreen on a Pi.
+#
+# The classic loop in ai_indicator.py deletes and recreates every ring/bar each frame. It also
+# works out radii, random jitter and color strings (parsing hex and formatting it again) in
+# Python every time. Here all of that is worked out once. Colors are lookup tables indexed by
+# brightness. The animations are an atlas of frames indexed by (loop phase, audio level bucket),
+# each holding the finished coordinates, colors and widths, filled in lazily the first time a
+# frame is needed. The jitter comes from a seeded table, so every frame can be cached.
+#
+# Drawing a frame is then a lookup plus moving a fixed set of canvas items (coords/itemconfig),
+# skipping items whose look didn't change. Nothing is created or deleted while animating.
+import math
+import random
+
+RIPPLE_LOOP = 42  # frames per ripple cycle (~0.15 rad/frame like the classic animation)
+BAR_LOOP = 63  # frames per full bar rotation (~0.1 rad/frame)
+LEVELS = 16  # audio level buckets
+BAR_COUNT = 12
+
+
+def _rgb(hex_color):
+    hex_color = hex_color.lstrip('#')
+    return int(hex_color[0:2], 16), int(hex_color[2:4], 16), int(hex_color[4:6], 16)
+
+
+class ColorTable:
+    """hex color scaled by a factor in [0, max_factor], as ready-made '#rrggbb' strings"""
+
+    def __init__(self, hex_color, max_factor=2.0, steps=128):
+        r, g, b = _rgb(hex_color)
+        self.scale = (steps - 1) / max_factor
+        self.colors = []
+        for i in range(steps):
+            factor = i / self.scale
+            self.colors.append("#%02x%02x%02x" % (min(255, int(r * factor)), min(255, int(g * factor)),
+                                                  min(255, int(b * factor))))
+        self.last = steps - 1
+
+    def at(self, factor):
+        i = int(factor * self.scale)
+        return self.colors[0 if i < 0 else self.last if i > self.last else i]
+
+
+def level_index(level):
+    i = int(level * LEVELS)
+    return LEVELS - 1 if i >= LEVELS else 0 if i < 0 else i
+
+
+class FrameAtlas:
+    """ripple and bar frames for one canvas size, computed the first time they're asked for"""
+
+    def __init__(self, width, height, base_radius, wave_amplitude, wave_count, color, seed=7):
+        self.cx, self.cy = width // 2, height // 2
+        self.base_radius = base_radius
+        self.wave_amplitude = wave_amplitude
+        self.wave_count = wave_count
+        self.max_radius = min(width, height) // 2 - 20
+        self.colors = ColorTable(color)
+
+        # the classic animation's random.uniform() calls, drawn once per (frame, ring/bar)
+        rng = random.Random(seed)
+        self.offsets = [rng.uniform(0, 2 * math.pi) for _ in range(wave_count)]
+        self.ring_jitter = [[(rng.uniform(0.6, 1.4), rng.uniform(-5, 10), rng.uniform(-2, 2), rng.uniform(-2, 2))
+                             for _ in range(wave_count)] for _ in range(RIPPLE_LOOP)]
+        self.bar_jitter = [[rng.uniform(0.7, 1.3) for _ in range(BAR_COUNT)] for _ in range(BAR_LOOP)]
+
+        self._ripples = [None] * (RIPPLE_LOOP * LEVELS)
+        self._bars = [None] * (BAR_LOOP * LEVELS)
+        self._center = [None] * (RIPPLE_LOOP * LEVELS)
+
+    def ripple(self, frame, level):
+        """per ring (x0, y0, x1, y1, color, width), plus the center color"""
+        key = (frame % RIPPLE_LOOP) * LEVELS + level_index(level)
+        rings = self._ripples[key]
+        if rings is None:
+            rings = self._ripples[key] = self._make_ripple(frame % RIPPLE_LOOP, (level_index(level) + 0.5) / LEVELS)
+            self._center[key] = self._make_center(frame % RIPPLE_LOOP, (level_index(level) + 0.5) / LEVELS)
+        return rings, self._center[key]
+
+    def _make_ripple(self, phase, level):
+        rings = []
+        audio_boost = 1.0 + level * 2.0
+        width = max(1, int(2 * (1 + level)))
+        angle = 2 * math.pi * phase / RIPPLE_LOOP
+        for i in range(self.wave_count):
+            variation, spacing, dx, dy = self.ring_jitter[phase][i]
+            wave_time = angle + self.offsets[i]
+            radius = (self.base_radius + i * (25 + spacing)
+                      + math.sin(wave_time) * self.wave_amplitude * variation * audio_boost
+                      + math.sin(wave_time * 2 + i) * 8)  # 2x (not 1.7x) so the loop closes
+            radius = max(10, min(radius, self.max_radius))
+            alpha = max(0.15, (1.0 - i * 0.12) * (0.5 + level))
+            rings.append((self.cx - radius + dx, self.cy - radius + dy, self.cx + radius + dx, self.cy + radius + dy,
+                          self.colors.at(alpha), width))
+        return rings
+
+    def _make_center(self, phase, level):
+        # 0.4 rad/frame in the classic pulse, 6 cycles per loop here
+        return self.colors.at(1.0 + 0.3 * math.sin(2 * math.pi * 6 * phase / RIPPLE_LOOP) + level * 0.5)
+
+    def bars(self, frame, level):
+        """per bar (x0, y0, x1, y1, color), plus the center color"""
+        key = (frame % BAR_LOOP) * LEVELS + level_index(level)
+        bars = self._bars[key]
+        if bars is None:
+            bars = self._bars[key] = self._make_bars(frame % BAR_LOOP, (level_index(level) + 0.5) / LEVELS)
+        return bars, self.colors.at(1.0 + level * 0.8)
+
+    def _make_bars(self, phase, level):
+        bars = []
+        max_height = self.base_radius * 1.5
+        distance = self.base_radius + 20
+        step = 2 * math.pi / BAR_COUNT
+        rotation = 2 * math.pi * phase / BAR_LOOP
+        for i in range(BAR_COUNT):
+            angle = i * step + rotation
+            base_freq = math.sin(3 * rotation + i * 0.5) * 0.5 + 0.5  # ~0.3 rad/frame
+            height = (base_freq * 0.4 + level * self.bar_jitter[phase][i] * 0.6) * max_height
+            x = self.cx + math.cos(angle) * distance
+            y = self.cy + math.sin(angle) * distance
+            bars.append((x, y, x + math.cos(angle) * height, y + math.sin(angle) * height,
+                         self.colors.at(0.5 + height / max_height * 0.8)))
+        return bars
+
+    def cached_frames(self):
+        return sum(1 for f in self._ripples if f is not None) + sum(1 for f in self._bars if f is not None)
+
+
+class AtlasRenderer:
+    """draws the indicator animations from a FrameAtlas onto a fixed pool of canvas items"""
+
+    def __init__(self, canvas, width, height, base_radius, wave_amplitude, wave_count, colors):
+        self.canvas = canvas
+        self.colors = colors  # AIState -> hex, like AIIndicator.colors
+        self.atlas = None
+        self.pulse = {}  # state -> ColorTable for the center circle
+        self.rings = []
+        self.bars = []
+        self._shown = None  # which pool is visible: "rings", "bars" or None
+        self._last = {}  # item -> (color, width) last set, so unchanged items are skipped
+        self.resize(width, height, base_radius, wave_amplitude, wave_count)
+
+    def resize(self, width, height, base_radius, wave_amplitude, wave_count):
+        speaking = next(color for state, color in self.colors.items() if state.value == "speaking")
+        self.atlas = FrameAtlas(width, height, base_radius, wave_amplitude, wave_count, speaking)
+        self.pulse = {state: ColorTable(color) for state, color in self.colors.items()}
+        if not self.rings:
+            # created once, hidden when not in use, moved around every frame after that
+            self.rings = [self.canvas.create_oval(0, 0, 0, 0, outline="", width=1, fill="", state="hidden")
+                          for _ in range(wave_count)]
+            self.bars = [self.canvas.create_line(0, 0, 0, 0, fill="", width=4, capstyle="round", state="hidden")
+                         for _ in range(BAR_COUNT)]
+            self._shown = None
+            self._last.clear()
+
+    def _show(self, pool):
+        if pool == self._shown:
+            return
+        for name, items in (("rings", self.rings), ("bars", self.bars)):
+            state = "normal" if name == pool else "hidden"
+            for item in items:
+                self.canvas.itemconfigure(item, state=state)
+        self._shown = pool
+
+    def hide(self):
+        self._show(None)
+
+    def _set(self, item, **options):
+        key = tuple(options.values())
+        if self._last.get(item) != key:
+            self._last[item] = key
+            self.canvas.itemconfigure(item, **options)
+
+    def draw_ripples(self, frame, level, center_circle):
+        rings, center = self.atlas.ripple(frame, level)
+        self._show("rings")
+        for item, (x0, y0, x1, y1, color, width) in zip(self.rings, rings):
+            self.canvas.coords(item, x0, y0, x1, y1)
+            self._set(item, outline=color, width=width)
+        if center_circle:
+            self._set(center_circle, fill=center, outline=center)
+
+    def draw_bars(self, frame, level, center_circle):
+        bars, center = self.atlas.bars(frame, level)
+        self._show("bars")
+        for item, (x0, y0, x1, y1, color) in zip(self.bars, bars):
+            self.canvas.coords(item, x0, y0, x1, y1)
+            self._set(item, fill=color)
+        if center_circle:
+            self._set(center_circle, fill=center, outline=center)
+
+    def draw_pulse(self, state, frame, center_circle):
+        # processing: 0.2 rad/frame brightness pulse, idle: plain color
+        self.hide()
+        if center_circle:
+            factor = 1.0 + 0.4 * math.sin(frame * 0.2) if state.value == "processing" else 1.0
+            color = self.pulse[state].at(factor)
+            self._set(center_circle, fill=color, outline=color)
+
+    def forget(self, item):
+        """the indicator deleted/recreated an item (center circle on state change)"""
+        self._last.pop(item, None)
@@ -0,0 +1,363 @@
+# src/components/inference_worker.py
+# Runs a LocalModel in its own process so llama.cpp doesn't fight the tkinter indicator,
+# TTS and (later) STT for the GIL and the same cores.
+#
+# The main process talks to the worker over a multiprocessing Pipe using small binary
+# frames (1 byte type + 4 byte request id + payload) instead of pickled objects, one
+# frame per decoded chunk. The worker checks for a cancel frame between chunks, gets
+# pinned to its own CPUs, and is restarted if it dies, so a crashing model costs one
+# reply instead of the whole assistant.
+#
+# The worker is started as its own program (python -m components.inference_worker) and
+# connects back over a local socket / named pipe. A multiprocessing "spawn" child would
+# re-import main.py first, and with it every singleton main creates at import (TTS probing
+# espeak/SAPI, ...), on every start and every restart.
+import json
+import multiprocessing
+import os
+import struct
+import subprocess
+import sys
+import threading
+import time
+from multiprocessing import connection
+
+from components.chat_session import ChatSession
+
+# frame types
+_GENERATE, _CANCEL, _STOP, _PREFILL = 1, 2, 3, 4  # main -> worker
+_READY, _TOKEN, _DONE, _ERROR = 10, 11, 12, 13  # worker -> main
+_HEADER = struct.Struct("<BI")
+
+
+def _send(conn, kind, request_id=0, payload=b""):
+    conn.send_bytes(_HEADER.pack(kind, request_id) + payload)
+
+
+def _recv(conn):
+    frame = conn.recv_bytes()
+    kind, request_id = _HEADER.unpack_from(frame)
+    return kind, request_id, frame[_HEADER.size:]
+
+
+def default_worker_cpus():
+    """every core but the first, which is left for the UI / audio threads"""
+    if not hasattr(os, "sched_getaffinity"):
+        return None
+    cpus = sorted(os.sched_getaffinity(0))
+    return cpus[1:] if len(cpus) > 1 else cpus
+
+
+def _worker_main(conn, model_args, model_kwargs, cpus):
+    # runs in the child process
+    if cpus and hasattr(os, "sched_setaffinity"):
+        try:
+            os.sched_setaffinity(0, cpus)
+            # no point running more llama threads than the cores we are allowed on
+            params = dict(model_kwargs.get("llama_params") or {})
+            params["n_threads"] = min(params.get("n_threads", len(cpus)), len(cpus))
+            model_kwargs = dict(model_kwargs, llama_params=params)
+        except OSError as e:
+            print(f"couldn't pin inference worker to cpus {cpus}: {e}")
+
+    from components.local_model import LocalModel
+    model = LocalModel(*model_args, **model_kwargs)
+    _send(conn, _READY, 0, json.dumps({
+        'model_name': model.model_name,
+        'is_loaded': model.is_loaded,
+        'resident_mb': model.resident_mb(),
+    }).encode("utf-8"))
+
+    while True:
+        try:
+            kind, request_id, payload = _recv(conn)
+        except (EOFError, OSError):
+            return  # main process went away
+        if kind == _STOP:
+            model.unload()
+            return
+        if kind == _PREFILL:
+            # idle time, any frame arriving (normally the next GENERATE) cuts it short
+            try:
+                model.prefill(json.loads(payload), should_stop=conn.poll)
+            except Exception as e:
+                print(f"prefill failed: {e}")
+            continue
+        if kind != _GENERATE:
+            continue  # a late cancel for a reply that already finished
+
+        request = json.loads(payload)
+        try:
+            if request.get('grammar'):
+                chunks = model.stream_structured(request['prompt'], request['grammar'], max_tokens=request['max_tokens'],
+                                                 conversation_history=request['history'])
+            elif request['stream']:
+                chunks = model.stream_response(request['prompt'], request['max_tokens'], request['history'])
+            else:
+                chunks = [model.generate_response(request['prompt'], request['max_tokens'], request['history'])]
+            cancelled = False
+            for chunk in chunks:
+                _send(conn, _TOKEN, request_id, chunk.encode("utf-8"))
+                if conn.poll():
+                    kind, rid, _ = _recv(conn)
+                    if kind == _CANCEL and rid == request_id:
+                        cancelled = True
+                        break
+                    if kind == _STOP:
+                        model.unload()
+                        return
+            if cancelled and hasattr(chunks, "close"):
+                chunks.close()
+            done = {'cancelled': cancelled, 'last_decode': model.last_decode, 'error': model.last_error}
+            _send(conn, _DONE, request_id, json.dumps(done).encode("utf-8"))
+        except Exception as e:
+            _send(conn, _ERROR, request_id, str(e).encode("utf-8"))
+
+
+def _child_main():
+    # python -m components.inference_worker <address>, the key comes in the environment
+    authkey = bytes.fromhex(os.environ.pop("INFERENCE_WORKER_KEY"))
+    with connection.Listener(sys.argv[1], authkey=authkey) as listener:
+        conn = listener.accept()
+    model_args, model_kwargs, cpus = conn.recv()
+    _worker_main(conn, model_args, model_kwargs, cpus)
+
+
+class _WorkerProcess:
+    """subprocess.Popen with the bits of multiprocessing.Process that WorkerModel uses"""
+
+    def __init__(self, popen):
+        self.popen = popen
+        self.pid = popen.pid
+
+    @property
+    def exitcode(self):
+        return self.popen.poll()
+
+    def is_alive(self):
+        return self.popen.poll() is None
+
+    def kill(self):
+        self.popen.kill()
+
+    def join(self, timeout=None):
+        try:
+            self.popen.wait(timeout)
+        except subprocess.TimeoutExpired:
+            pass
+
+
+class WorkerModel:
+    """LocalModel hosted in a separate process, same interface as LocalModel.
+    start_method "subprocess" runs the module as a program, anything else is a multiprocessing
+    start method ("fork" lets the child inherit the parent's modules, the benchmarks use it)"""
+
+    def __init__(self, model_path, models_dir=None, cpus=None, start_method="subprocess",
+                 startup_timeout=300.0, **model_kwargs):
+        self.model_args = (model_path, models_dir)
+        self.model_kwargs = model_kwargs
+        self.cpus = cpus if cpus is not None else default_worker_cpus()
+        self.start_method = start_method
+        self.context = multiprocessing.get_context(start_method) if start_method != "subprocess" else None
+        self.startup_timeout = startup_timeout
+        self.model_name = os.path.splitext(os.path.basename(model_path))[0]
+        self.process = None
+        self.conn = None
+        self.info = {}
+        self.last_decode = None
+        self.last_error = None  # why the last reply failed, forwarded from the worker's LocalModel
+        self.restarts = 0
+        self._request_id = 0
+        self._active = None  # request id currently streaming
+        self._lock = threading.Lock()  # one reply at a time
+        self._send_lock = threading.Lock()  # cancel() can come from another thread
+        self._start()
+
+    @property
+    def is_loaded(self):
+        return bool(self.info.get('is_loaded')) and self.process is not None and self.process.is_alive()
+
+    def _start(self):
+        start = time.perf_counter()
+        if self.start_method == "subprocess":
+            self._launch()
+        else:
+            parent_conn, child_conn = self.context.Pipe()
+            self.process = self.context.Process(
+                target=_worker_main,
+                args=(child_conn, self.model_args, self.model_kwargs, self.cpus),
+                name=f"inference-{self.model_name}",
+                daemon=True,
+            )
+            self.process.start()
+            child_conn.close()
+            self.conn = parent_conn
+
+        if self.conn is None or not self._wait(self.startup_timeout):
+            print(f"inference worker for {self.model_name} didn't start")
+            self._kill()
+            return
+        kind, _, payload = _recv(self.conn)
+        if kind == _READY:
+            self.info = json.loads(payload)
+            self.model_name = self.info.get('model_name', self.model_name)
+            where = f" on cpus {self.cpus}" if self.cpus else ""
+            print(f"inference worker ready{where} (pid {self.process.pid}, {time.perf_counter() - start:.1f}s)")
+
+    def _launch(self):
+        address = connection.arbitrary_address(connection.default_family)
+        authkey = os.urandom(16)
+        env = dict(os.environ, INFERENCE_WORKER_KEY=authkey.hex())
+        src_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        env["PYTHONPATH"] = os.pathsep.join(path for path in (src_dir, env.get("PYTHONPATH")) if path)
+        self.process = _WorkerProcess(subprocess.Popen(
+            [sys.executable, "-m", "components.inference_worker", address], env=env))
+        self.conn = None
+        # the child opens the listener within a moment of starting, loading the model comes after
+        deadline = time.monotonic() + self.startup_timeout
+        while self.process.is_alive() and time.monotonic() < deadline:
+            try:
+                self.conn = connection.Client(address, authkey=authkey)
+            except OSError:
+                time.sleep(0.02)
+                continue
+            self.conn.send((self.model_args, self.model_kwargs, self.cpus))
+            return
+
+    def _wait(self, timeout):
+        """poll for a frame, False if the worker died or timed out first"""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.conn.poll(0.1):
+                return True
+            if not self.process.is_alive():
+                return self.conn.poll()  # it may have written its last frame before exiting
+        return False
+
+    def _kill(self):
+        if self.process is not None and self.process.is_alive():
+            self.process.kill()
+        if self.process is not None:
+            self.process.join(timeout=5)
+        if self.conn is not None:
+            self.conn.close()
+        self.info = {}
+
+    def _restart(self):
+        code = self.process.exitcode if self.process is not None else None
+        print(f"inference worker died (exit code {code}), restarting")
+        self._kill()
+        self.restarts += 1
+        self._start()
+
+    def stream_response(self, prompt, max_tokens=256, conversation_history=None, stream=True, grammar=None):
+        with self._lock:
+            self.last_error = None
+            if self.process is None or not self.process.is_alive():
+                self._restart()
+            if not self.is_loaded:
+                self.last_error = "model not loaded"
+                yield self.last_error
+                return
+
+            self._request_id += 1
+            request_id = self._request_id
+            request = {'prompt': prompt, 'max_tokens': max_tokens,
+                       'history': conversation_history or [], 'stream': stream, 'grammar': grammar}
+            finished = False
+            try:
+                with self._send_lock:
+                    _send(self.conn, _GENERATE, request_id, json.dumps(request).encode("utf-8"))
+                self._active = request_id
+                while True:
+                    if not self._wait(self.startup_timeout):
+                        raise EOFError
+                    kind, rid, payload = _recv(self.conn)
+                    if rid != request_id:
+                        continue  # leftovers of a cancelled reply
+                    if kind == _TOKEN:
+                        yield payload.decode("utf-8")
+                    elif kind == _DONE:
+                        done = json.loads(payload)
+                        self.last_decode = done.get('last_decode')
+                        self.last_error = done.get('error')
+                        finished = True
+                        return
+                    elif kind == _ERROR:
+                        finished = True
+                        self.last_error = f"error: {payload.decode('utf-8')}"
+                        yield self.last_error
+                        return
+            except (EOFError, OSError):
+                finished = True
+                self._active = None
+                self._restart()
+                self.last_error = "error: inference worker crashed, it has been restarted"
+                yield self.last_error
+            finally:
+                self._active = None
+                if not finished:
+                    # the caller stopped reading early, stop decoding and drain to DONE
+                    self._cancel_and_drain(request_id)
+
+    def _cancel_and_drain(self, request_id):
+        try:
+            with self._send_lock:
+                _send(self.conn, _CANCEL, request_id)
+            while self._wait(5.0):
+                kind, rid, _ = _recv(self.conn)
+                if rid == request_id and kind in (_DONE, _ERROR):
+                    return
+            self._restart()
+        except (EOFError, OSError):
+            self._restart()
+
+    def cancel(self):
+        """stop the reply being streamed right now (safe to call from another thread)"""
+        request_id = self._active
+        if request_id is None:
+            return
+        try:
+            with self._send_lock:
+                _send(self.conn, _CANCEL, request_id)
+        except OSError:
+            pass
+
+    def prefill(self, conversation_history=None, should_stop=None):
+        """hand the idle-time prefill to the worker and return right away,
+        the next request we send is what stops it"""
+        if not self.is_loaded:
+            return 0
+        try:
+            with self._send_lock:
+                _send(self.conn, _PREFILL, 0, json.dumps(conversation_history or []).encode("utf-8"))
+        except OSError:
+            pass
+        return 0
+
+    def generate_response(self, prompt, max_tokens=256, conversation_history=None):
+        return "".join(self.stream_response(prompt, max_tokens, conversation_history, stream=False))
+
+    def stream_structured(self, prompt, grammar=None, schema=None, max_tokens=64, conversation_history=None):
+        # the grammar text goes over the pipe, the worker's LocalModel parses and caches it
+        return self.stream_response(prompt, max_tokens, conversation_history, grammar=grammar)
+
+    def resident_mb(self):
+        return self.info.get('resident_mb', 0) if self.is_loaded else 0
+
+    def unload(self):
+        if self.process is not None and self.process.is_alive():
+            try:
+                with self._send_lock:
+                    _send(self.conn, _STOP)
+                self.process.join(timeout=5)
+            except OSError:
+                pass
+        self._kill()
+
+    def start_chat(self, **session_options):
+        return ChatSession(self, **session_options)
+
+
+if __name__ == "__main__":
+    _child_main()
@@ -4,23 +4,107 @@
 # TODO: May need to have a specialized ChatSession class for local & remote models
 import os
 import subprocess
+import time
 from pathlib import Path
 from typing import Optional
 from components.chat_session import ChatSession
+from components.speculative import make_draft_model
+from components.autotune import DEFAULT_LLAMA_PARAMS
+from components.model_registry import is_gguf, estimate_resident_mb
+from components.memory_budget import kv_bytes
+from components.prompt_cache import snapshot_path, save_snapshot, load_snapshot, remove_stale
+
+# chat formats, picked per model from the GGUF chat template
+# system wraps the persona, user/assistant wrap past turns, generation is appended to start the reply
+PROMPT_FORMATS = {
+    "phi3": {
+        "system": "<|system|>\n{text}<|end|>\n",
+        "user": "<|user|>\n{text}<|end|>\n",
+        "assistant": "<|assistant|>\n{text}<|end|>\n",
+        "generation": "<|assistant|>",
+        "stop": ["<|end|>", "<|endoftext|>"],
+    },
+    "zephyr": {  # TinyLlama-chat and friends
+        "system": "<|system|>\n{text}</s>\n",
+        "user": "<|user|>\n{text}</s>\n",
+        "assistant": "<|assistant|>\n{text}</s>\n",
+        "generation": "<|assistant|>\n",
+        "stop": ["</s>"],
+    },
+    "chatml": {
+        "system": "<|im_start|>system\n{text}<|im_end|>\n",
+        "user": "<|im_start|>user\n{text}<|im_end|>\n",
+        "assistant": "<|im_start|>assistant\n{text}<|im_end|>\n",
+        "generation": "<|im_start|>assistant\n",
+        "stop": ["<|im_end|>"],
+    },
+    "llama3": {
+        "system": "<|start_header_id|>system<|end_header_id|>\n\n{text}<|eot_id|>",
+        "user": "<|start_header_id|>user<|end_header_id|>\n\n{text}<|eot_id|>",
+        "assistant": "<|start_header_id|>assistant<|end_header_id|>\n\n{text}<|eot_id|>",
+        "generation": "<|start_header_id|>assistant<|end_header_id|>\n\n",
+        "stop": ["<|eot_id|>"],
+    },
+    "llama2": {
+        "system": "[INST] <<SYS>>\n{text}\n<</SYS>> [/INST]\n",
+        "user": "[INST] {text} [/INST]",
+        "assistant": " {text} </s><s>",
+        "generation": "",
+        "stop": ["</s>"],
+    },
+    "gemma": {
+        "system": "<start_of_turn>user\n{text}<end_of_turn>\n",  # gemma has no system role
+        "user": "<start_of_turn>user\n{text}<end_of_turn>\n",
+        "assistant": "<start_of_turn>model\n{text}<end_of_turn>\n",
+        "generation": "<start_of_turn>model\n",
+        "stop": ["<end_of_turn>"],
+    },
+    "generic": {
+        "system": "{text}\n\n",
+        "user": "Human: {text}\n",
+        "assistant": "Assistant: {text}\n",
+        "generation": "Assistant:",
+        "stop": [],
+    },
+}
 
 
 class LocalModel:
-    def __init__(self, model_path: str, models_dir: Optional[str] = None):
+    def __init__(self, model_path: str, models_dir: Optional[str] = None,
+                 draft: Optional[str] = None, draft_tokens: int = 8,
+                 llama_params: Optional[dict] = None, model_info: Optional[dict] = None,
+                 system_prompt: Optional[str] = None, prompt_cache_dir: Optional[str] = None):
         self.models_dir = models_dir or "models"
         self.model_filename = model_path
         self.full_model_path = os.path.join(self.models_dir, model_path) if models_dir else model_path
         self.model_name = Path(model_path).stem
+        self.model_info = model_info  # GGUF header summary from ModelRegistry, if router had one
+        self.system_prompt = system_prompt  # persona, evaluated once and snapshotted to prompt_cache_dir
+        self.prompt_cache_dir = prompt_cache_dir
         
-        # check if this looks like a gguf file or if we should use ollama
-        self.use_ollama = not model_path.endswith('.gguf')
+        # check the file header to see if this is a gguf file or if we should use ollama
+        # (a missing *.gguf still goes through _setup_gguf so it reports the missing file)
+        self.use_ollama = not (is_gguf(self.full_model_path) or model_path.lower().endswith('.gguf'))
         self.ollama_model = None
         self.llm = None
         self.is_loaded = False
+
+        # speculative decoding (see components/speculative.py), off unless the config entry asks for it
+        self.draft = draft
+        self.draft_tokens = draft_tokens
+        self.draft_model = None
+        self.last_decode = None  # tokens / seconds / tokens_per_s (+ acceptance) of the last reply
+        self.last_error = None  # why the last reply failed, None if it worked (see ChatSession._record)
+        self._prefilled = None  # what prefill() got into the cache since the last reply
+        self._prefill_used = None  # the part of it the current completion starts from
+        self._grammars = {}  # GBNF text -> parsed LlamaGrammar (structured commands)
+
+        # llama.cpp runtime settings, tuned values (components/autotune.py) override the defaults
+        self.llama_params = dict(DEFAULT_LLAMA_PARAMS, **(llama_params or {}))
+        train_ctx = (model_info or {}).get('context_length')
+        if isinstance(train_ctx, int) and 0 < train_ctx < self.llama_params['n_ctx']:
+            # no point allocating kv cache past what the model was trained for
+            self.llama_params['n_ctx'] = train_ctx
         
         # figure out what kind of model we're dealing with
         if self.use_ollama:
@@ -78,19 +162,24 @@ class LocalModel:
                 return
             
             print(f"loading {self.model_name}...")
-            
+
+            llama_options = dict(self.llama_params)
+            tuned = {k: v for k, v in llama_options.items() if DEFAULT_LLAMA_PARAMS.get(k) != v}
+            if tuned:
+                print(f"using tuned settings: {tuned}")
             self.llm = Llama(
                 model_path=self.full_model_path,
-                n_ctx=4096,
-                n_threads=4,
-                n_gpu_layers=0,
                 verbose=False,
-                use_mmap=True,
-                use_mlock=False,
+                **llama_options,
             )
+            # the drafter comes second so its vocabulary can be checked against this one
+            self.draft_model = self._load_draft_model(self.llm.n_vocab())
+            if self.draft_model:
+                self.llm.draft_model = self.draft_model
             
             self.is_loaded = True
             print(f"loaded {self.model_name}")
+            self._restore_preamble()
             
         except ImportError:
             print("llama-cpp-python not available, trying ollama fallback")
@@ -102,36 +191,135 @@ class LocalModel:
             self.use_ollama = True
             self._setup_ollama()
     
-    def _format_prompt(self, user_input: str, conversation_history: Optional[list] = None) -> str:
-        # format for phi-3 chat if it looks like phi, otherwise generic format
+    def _load_draft_model(self, n_vocab):
+        # a broken draft config shouldn't stop the main model from loading
+        if not self.draft:
+            return None
+        try:
+            draft_model = make_draft_model(
+                self.draft, self.models_dir,
+                num_pred_tokens=self.draft_tokens,
+                n_threads=self.llama_params['n_threads'],
+                n_ctx=self.llama_params['n_ctx'],
+                n_vocab=n_vocab,
+            )
+            print(f"speculative decoding: {self.draft} ({self.draft_tokens} tokens per draft)")
+            return draft_model
+        except Exception as e:
+            print(f"speculative decoding disabled: {e}")
+            return None
+
+    def _prompt_format(self) -> str:
+        # the GGUF header's chat template decides (components/model_registry.py),
+        # without one (ollama, unreadable header) fall back to guessing from the name
+        if self.model_info and not self.use_ollama:
+            return self.model_info.get('prompt_format', 'generic')
         is_phi = "phi" in self.model_name.lower() or (self.ollama_model and "phi" in self.ollama_model)
-        
-        if is_phi:
-            if conversation_history:
-                formatted = ""
-                for turn in conversation_history:
-                    formatted += f"<|user|>\n{turn['user']}<|end|>\n"
-                    formatted += f"<|assistant|>\n{turn['assistant']}<|end|>\n"
-                formatted += f"<|user|>\n{user_input}<|end|>\n<|assistant|>"
-                return formatted
-            else:
-                return f"<|user|>\n{user_input}<|end|>\n<|assistant|>"
-        else:
-            if conversation_history:
-                formatted = ""
-                for turn in conversation_history:
-                    formatted += f"Human: {turn['user']}\nAssistant: {turn['assistant']}\n"
-                formatted += f"Human: {user_input}\nAssistant:"
-                return formatted
-            else:
-                return f"Human: {user_input}\nAssistant:"
+        return "phi3" if is_phi else "generic"
+
+    def _format_prompt(self, user_input: str, conversation_history: Optional[list] = None) -> str:
+        fmt = PROMPT_FORMATS[self._prompt_format()]
+        return self._prompt_prefix(conversation_history) + user_input + fmt['user'].split("{text}")[1] + fmt['generation']
+
+    def _prompt_prefix(self, conversation_history: Optional[list] = None) -> str:
+        # everything before the new user message: history + the opening user tag
+        fmt = PROMPT_FORMATS[self._prompt_format()]
+        formatted = self._preamble()
+        for turn in conversation_history or []:
+            formatted += fmt['user'].format(text=turn['user'])
+            formatted += fmt['assistant'].format(text=turn['assistant'])
+        return formatted + fmt['user'].split("{text}")[0]
+
+    def _preamble(self) -> str:
+        # the fixed start of every prompt
+        if not self.system_prompt:
+            return ""
+        return PROMPT_FORMATS[self._prompt_format()]['system'].format(text=self.system_prompt)
+
+    def _restore_preamble(self):
+        # get the persona into the kv cache at load time: from the snapshot if there is a
+        # valid one, otherwise evaluate it once and write the snapshot for next time
+        preamble = self._preamble()
+        if not preamble or not self.prompt_cache_dir:
+            return
+        try:
+            path = snapshot_path(self.prompt_cache_dir, self.full_model_path, preamble, self.llama_params['n_ctx'])
+            start = time.perf_counter()
+            if os.path.exists(path):
+                try:
+                    n_tokens = load_snapshot(self.llm, path)
+                    print(f"persona restored from snapshot ({n_tokens} tokens, {time.perf_counter() - start:.2f}s)")
+                    return
+                except Exception as e:
+                    print(f"prompt snapshot unusable, rebuilding: {e}")
+                    self.llm.reset()
+
+            tokens = self.llm.tokenize(preamble.encode('utf-8'), special=True)
+            self.llm.eval(tokens)
+            elapsed = time.perf_counter() - start
+            size = save_snapshot(self.llm, path)
+            remove_stale(self.prompt_cache_dir, self.full_model_path, keep=path)
+            print(f"persona evaluated ({len(tokens)} tokens, {elapsed:.2f}s), "
+                  f"snapshot saved ({size / (1024 * 1024):.1f} MB)")
+        except Exception as e:
+            print(f"persona snapshot skipped: {e}")
+
+    def prefill(self, conversation_history: Optional[list] = None, should_stop=None, batch: int = 8) -> int:
+        """evaluate the next prompt's known prefix into the kv cache while the user is still
+        typing, in small batches so should_stop() can cut it short. returns tokens evaluated"""
+        if not self.is_loaded or self.use_ollama or self.llm is None:
+            return 0
+        prefix = self._prompt_prefix(conversation_history)
+        tokens = self.llm.tokenize(prefix.encode('utf-8'), special=True)
+
+        cached = self._cached_prefix(tokens)
+        if cached >= len(tokens):
+            return 0
+        self.llm.n_tokens = cached
+
+        start = time.perf_counter()
+        done = 0
+        for i in range(cached, len(tokens), batch):
+            if should_stop and should_stop():
+                break
+            self.llm.eval(tokens[i:i + batch])
+            done += len(tokens[i:i + batch])
+        # cache positions [start, end), _use_prefill() checks how much a completion keeps
+        self._prefilled = {'start': cached, 'end': cached + done, 'seconds': time.perf_counter() - start}
+        return done
+
+    def _cached_prefix(self, tokens) -> int:
+        # same longest-prefix reuse llama-cpp-python does for a completion
+        cached = 0
+        for old, new in zip(self.llm.input_ids[:self.llm.n_tokens], tokens):
+            if old != new:
+                break
+            cached += 1
+        return cached
+
+    def _use_prefill(self, formatted_prompt: str):
+        # the prefill only saved time for the prefilled tokens the completion doesn't evaluate
+        # again: the prefix was tokenized on its own and the history may have changed since
+        prefilled, self._prefilled = self._prefilled, None
+        self._prefill_used = None
+        if not prefilled or prefilled['end'] <= prefilled['start']:
+            return
+        tokens = self.llm.tokenize(formatted_prompt.encode('utf-8'), special=True)
+        # llama-cpp-python evaluates the last prompt token again even on a full match
+        kept = min(self._cached_prefix(tokens), len(tokens) - 1)
+        reused = max(0, min(kept, prefilled['end']) - prefilled['start'])
+        if reused:
+            share = reused / (prefilled['end'] - prefilled['start'])
+            self._prefill_used = {'tokens': reused, 'seconds': prefilled['seconds'] * share}
     
-    def generate_response(self, prompt: str, max_tokens: int = 256) -> str:
+    def generate_response(self, prompt: str, max_tokens: int = 256,
+                          conversation_history: Optional[list] = None) -> str:
+        self.last_error = None
         if not self.is_loaded:
-            return "model not loaded"
+            return self._failed("model not loaded")
         
         try:
-            formatted_prompt = self._format_prompt(prompt)
+            formatted_prompt = self._format_prompt(prompt, conversation_history)
             
             if self.use_ollama:
                 # use ollama cli
@@ -147,36 +335,162 @@ class LocalModel:
                 )
                 
                 if result.returncode != 0:
-                    return f"ollama error: {result.stderr}"
+                    return self._failed(f"ollama error: {result.stderr}")
                 
                 response = result.stdout.strip()
                 if response.endswith("<|end|>"):
                     response = response[:-7].strip()
                 
-                return response if response else "need more info"
+                return response if response else self._failed("need more info")
                 
             else:
                 # use llama-cpp-python
-                response = self.llm(
-                    formatted_prompt,
-                    max_tokens=max_tokens,
-                    temperature=0.7,
-                    top_p=0.9,
-                    stop=["<|end|>", "Human:", "\nHuman:"],
-                    echo=False
-                )
+                if self.draft_model:
+                    self.draft_model.reset()
+                self._use_prefill(formatted_prompt)
+                start = time.perf_counter()
+                response = self.llm(formatted_prompt, **self._sampling_params(max_tokens))
+                n_tokens = response.get('usage', {}).get('completion_tokens', 0)
+                self._record_decode(n_tokens, time.perf_counter() - start)
                 
                 generated_text = response['choices'][0]['text'].strip()
                 
                 if generated_text.endswith("<|end|>"):
                     generated_text = generated_text[:-7].strip()
                 
-                return generated_text if generated_text else "need more info"
+                return generated_text if generated_text else self._failed("need more info")
                 
         except subprocess.TimeoutExpired:
-            return "request timed out"
+            return self._failed("request timed out")
         except Exception as e:
-            return f"error: {str(e)}"
+            return self._failed(f"error: {str(e)}")
     
-    def start_chat(self):
-        return ChatSession(self)
+    def stream_response(self, prompt: str, max_tokens: int = 256,
+                        conversation_history: Optional[list] = None):
+        # yields text chunks as llama.cpp decodes them so the caller can print/speak early
+        # ollama cli has no streaming here so it just yields the whole reply once
+        if not self.is_loaded or self.use_ollama:
+            yield self.generate_response(prompt, max_tokens, conversation_history)
+            return
+
+        self.last_error = None
+        try:
+            formatted_prompt = self._format_prompt(prompt, conversation_history)
+            if self.draft_model:
+                self.draft_model.reset()
+            self._use_prefill(formatted_prompt)
+            stream = self.llm(formatted_prompt, stream=True, **self._sampling_params(max_tokens))
+
+            started = False
+            n_tokens = 0
+            first_token_at = None
+            for chunk in stream:
+                n_tokens += 1
+                if first_token_at is None:
+                    first_token_at = time.perf_counter()
+                text = chunk['choices'][0]['text']
+                if not started:
+                    # same as generate_response, drop leading whitespace from the reply
+                    text = text.lstrip()
+                    started = bool(text)
+                if text:
+                    yield text
+
+            if first_token_at is not None:
+                # decode speed only, prompt eval happens before the first chunk
+                self._record_decode(n_tokens - 1, time.perf_counter() - first_token_at)
+
+            if not started:
+                yield self._failed("need more info")
+
+        except Exception as e:
+            yield self._failed(f"error: {str(e)}")
+
+    def stream_structured(self, prompt: str, grammar: Optional[str] = None, schema: Optional[dict] = None,
+                          max_tokens: int = 64, conversation_history: Optional[list] = None):
+        # like stream_response but llama.cpp may only sample what the GBNF grammar allows
+        # (components/commands.py), greedy since there is one right answer. the caller closes
+        # the stream once the object is complete, anything after it is never decoded
+        if not self.is_loaded or self.use_ollama or not grammar:
+            yield from self.stream_response(prompt, max_tokens, conversation_history)
+            return
+
+        self.last_error = None
+        try:
+            formatted_prompt = self._format_prompt(prompt, conversation_history)
+            if self.draft_model:
+                self.draft_model.reset()
+            params = dict(self._sampling_params(max_tokens), temperature=0.0, grammar=self._grammar(grammar))
+            self._use_prefill(formatted_prompt)
+            n_tokens = 0
+            first_token_at = None
+            try:
+                for chunk in self.llm(formatted_prompt, stream=True, **params):
+                    n_tokens += 1
+                    if first_token_at is None:
+                        first_token_at = time.perf_counter()
+                    yield chunk['choices'][0]['text']
+            finally:
+                if first_token_at is not None:
+                    self._record_decode(n_tokens - 1, time.perf_counter() - first_token_at)
+        except Exception as e:
+            yield self._failed(f"error: {str(e)}")
+
+    def _failed(self, message: str) -> str:
+        # the message still goes to the user, last_error tells the caller it isn't a real reply
+        self.last_error = message
+        return message
+
+    def _grammar(self, text: str):
+        # parsing a grammar isn't free, the command set hands us the same text every time
+        if text not in self._grammars:
+            from llama_cpp import LlamaGrammar
+            self._grammars[text] = LlamaGrammar.from_string(text, verbose=False)
+        return self._grammars[text]
+
+    def _record_decode(self, n_tokens: int, seconds: float):
+        self.last_decode = {
+            'tokens': n_tokens,
+            'seconds': seconds,
+            'tokens_per_s': n_tokens / seconds if seconds > 0 else 0.0,
+        }
+        used, self._prefill_used = self._prefill_used, None
+        if used:
+            # reported through last_decode (ChatSession metrics), a print would land in the chat
+            self.last_decode['prefill_tokens'] = used['tokens']
+            self.last_decode['prefill_saved_ms'] = used['seconds'] * 1000.0
+        if self.draft_model:
+            rate = self.draft_model.acceptance_rate(n_tokens)
+            self.last_decode['acceptance_rate'] = rate
+            print(f"[{self.model_name}] {self.last_decode['tokens_per_s']:.1f} tok/s, "
+                  f"draft acceptance {rate:.0%} ({self.draft_model.proposed} proposed)")
+
+    def _sampling_params(self, max_tokens: int) -> dict:
+        # shared by generate_response and stream_response so both decode the same way
+        return {
+            'max_tokens': max_tokens,
+            'temperature': 0.7,
+            'top_p': 0.9,
+            'stop': PROMPT_FORMATS[self._prompt_format()]['stop'] + ["Human:", "\nHuman:"],
+            'echo': False,
+        }
+
+    def resident_mb(self) -> int:
+        # what this instance keeps in RAM (ollama models live in the ollama server, not here)
+        if not self.llm:
+            return 0
+        info = self.model_info or {'size_bytes': os.path.getsize(self.full_model_path)}
+        return estimate_resident_mb(info, self.llama_params['n_ctx'], kv_bytes(self.llama_params))
+
+    def unload(self):
+        # drop the weights + kv cache, used by ModelManager when it evicts this model
+        if self.llm is not None:
+            close = getattr(self.llm, 'close', None)  # newer llama-cpp-python frees eagerly
+            if close:
+                close()
+            self.llm = None
+        self.draft_model = None
+        self.is_loaded = False
+
+    def start_chat(self, **session_options):
+        return ChatSession(self, **session_options)
@@ -0,0 +1,333 @@
+# src/components/memory_budget.py
+# Keeps the whole assistant (llama.cpp, Whisper, the indicator, TTS, memory index) inside a
+# RAM budget, so a 4 GB Pi doesn't end up in swap where every token takes seconds.
+#
+# plan_runtime() estimates each component before it is loaded and shrinks the expensive
+# settings until the total fits. In order: quantised KV cache, smaller n_ctx, smaller Whisper,
+# 4-bit KV cache. MemoryProfile measures what each component actually cost (RSS before/after
+# it loaded, plus how much of each mmap'd model file is resident). Its watchdog warns, and
+# frees what it can, when the process nears the budget or the system starts swapping.
+# Numbers come from /proc (Linux). Elsewhere only the estimates are shown.
+import contextlib
+import threading
+import time
+
+from components.autotune import total_ram_mb
+from components.model_registry import estimate_resident_mb
+
+# llama.cpp KV cache element types: name -> (ggml type id for type_k/type_v, bytes per element)
+KV_TYPES = {
+    "f16": (1, 2.0),
+    "q8_0": (8, 34 / 32.0),
+    "q4_0": (2, 18 / 32.0),
+}
+
+# rough resident cost of the other pieces, measured on a Pi 5 / x86 laptop
+WHISPER_MB = {"tiny": 390, "base": 500, "small": 1050, "medium": 2700}
+COMPONENT_MB = {
+    "python": 60,  # interpreter + numpy + requests
+    "gui": 40,  # tkinter indicator
+    "audio": 15,  # output stream + ring buffer
+    "embedder": 250,  # sentence-transformers MiniLM (torch is shared with whisper)
+}
+DEFAULT_COMPONENTS = ("python", "gui", "audio")
+MIN_CTX = 1024
+LOW_MEMORY_RAM_MB = 4608  # "auto" picks the low-memory profile at or below this (a 4 GB Pi)
+
+
+def kv_type_name(llama_params):
+    """which KV_TYPES entry llama_params uses"""
+    type_k = (llama_params or {}).get('type_k')
+    for name, (type_id, _) in KV_TYPES.items():
+        if type_id == type_k:
+            return name
+    return "f16"
+
+
+def kv_bytes(llama_params):
+    return KV_TYPES[kv_type_name(llama_params)][1]
+
+
+def _kv_params(name):
+    type_id = KV_TYPES[name][0]
+    if name == "f16":
+        return {}
+    # a quantised V cache needs flash attention in llama.cpp
+    return {'type_k': type_id, 'type_v': type_id, 'flash_attn': True}
+
+
+def is_low_memory(profile="auto"):
+    if profile == "auto":
+        ram = total_ram_mb()
+        return 0 < ram <= LOW_MEMORY_RAM_MB
+    return profile == "low_memory"
+
+
+def default_budget_mb():
+    # leave room for the OS, page cache and espeak/ollama subprocesses
+    ram = total_ram_mb()
+    return int(ram * 0.85) if ram else 4096
+
+
+def plan_runtime(model_info, llama_params, budget_mb, components=("python",), whisper_size=None,
+                 embedder=False, low_memory=False, want_mlock=False):
+    """pick n_ctx / KV cache type / Whisper size / mlock so the estimated total fits budget_mb.
+    returns a dict with the chosen llama_params, whisper_size, per-component estimates and the
+    list of changes made (empty when the requested settings already fit)"""
+    params = dict(llama_params)
+    n_ctx = params.get('n_ctx', 4096)
+    kv = kv_type_name(params)
+    changes = []
+    if low_memory:
+        # Pi defaults even when things would fit: q8_0 KV is near-lossless at ~half the size
+        if kv == "f16":
+            kv = "q8_0"
+            changes.append("KV cache f16 -> q8_0 (low-memory profile)")
+        if n_ctx > 2048:
+            changes.append(f"n_ctx {n_ctx} -> 2048 (low-memory profile)")
+            n_ctx = 2048
+
+    def estimates():
+        est = {name: COMPONENT_MB[name] for name in components}
+        if embedder:
+            est["embedder"] = COMPONENT_MB["embedder"]
+        if whisper_size:
+            est[f"whisper-{whisper_size}"] = WHISPER_MB.get(whisper_size, WHISPER_MB["base"])
+        if model_info:
+            est["model"] = estimate_resident_mb(model_info, n_ctx, KV_TYPES[kv][1])
+        return est
+
+    # cheapest quality loss first
+    sizes = list(WHISPER_MB)
+    while sum(estimates().values()) > budget_mb:
+        if kv == "f16":
+            kv = "q8_0"
+            changes.append("KV cache f16 -> q8_0")
+        elif n_ctx > 2048:
+            changes.append(f"n_ctx {n_ctx} -> {n_ctx // 2}")
+            n_ctx //= 2
+        elif whisper_size in sizes and sizes.index(whisper_size) > 0:
+            smaller = sizes[sizes.index(whisper_size) - 1]
+            changes.append(f"whisper {whisper_size} -> {smaller}")
+            whisper_size = smaller
+        elif kv == "q8_0":
+            kv = "q4_0"
+            changes.append("KV cache q8_0 -> q4_0")
+        elif n_ctx > MIN_CTX:
+            changes.append(f"n_ctx {n_ctx} -> {n_ctx // 2}")
+            n_ctx //= 2
+        else:
+            break  # nothing left to shrink, the model itself is too big
+
+    est = estimates()
+    total = sum(est.values())
+    # mlock keeps the weights from being paged out under pressure, only worth it with headroom
+    use_mlock = bool(want_mlock or low_memory) and total <= budget_mb * 0.9
+    for key in ('type_k', 'type_v', 'flash_attn'):
+        params.pop(key, None)
+    params.update(_kv_params(kv), n_ctx=n_ctx, use_mlock=use_mlock)
+    return {
+        'budget_mb': budget_mb,
+        'llama_params': params,
+        'kv_type': kv,
+        'whisper_size': whisper_size,
+        'use_mlock': use_mlock,
+        'estimates': est,
+        'total_mb': total,
+        'fits': total <= budget_mb,
+        'changes': changes,
+    }
+
+
+# --- measuring -------------------------------------------------------------------------------
+
+def rss_mb(pid="self"):
+    """resident set size of a process, 0 if it can't be read"""
+    try:
+        with open(f"/proc/{pid}/status", "r") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) // 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return 0
+
+
+def mapped_files_mb(pid="self", min_mb=1):
+    """path -> resident MB for file-backed mappings (the mmap'd GGUF shows up here)"""
+    mapped = {}
+    path = None
+    try:
+        with open(f"/proc/{pid}/smaps", "r") as f:
+            for line in f:
+                first = line.split(None, 1)[0]
+                if "-" in first and not first.endswith(":"):
+                    # mapping header: "addr-addr perms offset dev inode [path]"
+                    parts = line.split(None, 5)
+                    path = parts[5].strip() if len(parts) > 5 and parts[5].startswith("/") else None
+                elif first == "Rss:" and path:
+                    mapped[path] = mapped.get(path, 0) + int(line.split()[1])
+    except (OSError, ValueError, IndexError):
+        return {}
+    return {p: kb // 1024 for p, kb in mapped.items() if kb // 1024 >= min_mb}
+
+
+def system_memory_mb():
+    """total / available / swap used, from /proc/meminfo"""
+    values = {}
+    try:
+        with open("/proc/meminfo", "r") as f:
+            for line in f:
+                key, _, rest = line.partition(":")
+                values[key] = int(rest.split()[0]) // 1024
+    except (OSError, ValueError, IndexError):
+        return {'total': total_ram_mb(), 'available': 0, 'swap_used': 0}
+    return {
+        'total': values.get("MemTotal", 0),
+        'available': values.get("MemAvailable", 0),
+        'swap_used': values.get("SwapTotal", 0) - values.get("SwapFree", 0),
+    }
+
+
+def pages_swapped_out():
+    """pages written to swap since boot, goes up once the system starts swapping"""
+    try:
+        with open("/proc/vmstat", "r") as f:
+            for line in f:
+                if line.startswith("pswpout "):
+                    return int(line.split()[1])
+    except (OSError, ValueError, IndexError):
+        pass
+    return 0
+
+
+class MemoryProfile:
+    """per-component RSS accounting + a watchdog thread that reacts before the box swaps"""
+
+    def __init__(self, budget_mb=None, warn_fraction=0.9, min_available_mb=200, swap_pages_per_s=256,
+                 cooldown_s=30.0):
+        self.budget_mb = budget_mb or default_budget_mb()
+        self.warn_fraction = warn_fraction
+        self.min_available_mb = min_available_mb
+        # some swapping always goes on (other processes, the kernel tidying up). It only counts
+        # when it's steady (pages/s) and either we are near the budget or RAM is nearly gone
+        self.swap_pages_per_s = swap_pages_per_s
+        self.cooldown_s = cooldown_s  # after acting on pressure, give the unloads time to show
+        self.components = {}  # name -> MB the process grew while it loaded
+        self.plans = {}  # model name -> plan_runtime() result it was loaded with
+        self.child_sources = []  # fn() -> {name: pid} of helper processes (inference worker)
+        self.pressure_callbacks = []  # fn(reason) called when the watchdog hits the limit
+        self.peak_mb = 0
+        self.warnings = 0
+        self.pressure_events = 0
+        self._thread = None
+        self._running = False
+        self._swap_out = pages_swapped_out()
+        self._swap_at = time.monotonic()
+        self._relieved_at = None
+        self._warned = False
+
+    @contextlib.contextmanager
+    def track(self, name):
+        """measure how much RSS loading `name` adds (mmap'd weights only count once touched)"""
+        before = rss_mb()
+        try:
+            yield
+        finally:
+            self.components[name] = self.components.get(name, 0) + max(0, rss_mb() - before)
+
+    def children(self):
+        pids = {}
+        for source in self.child_sources:
+            try:
+                pids.update(source())
+            except Exception:
+                pass  # a worker restarting right now
+        return pids
+
+    def total_rss_mb(self):
+        return rss_mb() + sum(rss_mb(pid) for pid in self.children().values())
+
+    def check(self):
+        """one watchdog sample, returns the reason if memory is under pressure"""
+        used = self.total_rss_mb()
+        self.peak_mb = max(self.peak_mb, used)
+        system = system_memory_mb()
+        now = time.monotonic()
+        swap_out = pages_swapped_out()
+        swap_rate = (swap_out - self._swap_out) / max(now - self._swap_at, 1e-3)
+        self._swap_out, self._swap_at = swap_out, now
+        tight = (used > self.budget_mb * self.warn_fraction
+                 or (system['available'] and system['available'] < self.min_available_mb * 2))
+
+        reason = None
+        if swap_rate >= self.swap_pages_per_s and tight:
+            reason = f"system swapping ({swap_rate:.0f} pages/s)"
+        elif used > self.budget_mb:
+            reason = f"{used} MB used, budget is {self.budget_mb} MB"
+        elif system['available'] and system['available'] < self.min_available_mb:
+            reason = f"only {system['available']} MB of RAM left"
+
+        if reason and self._relieved_at is not None and now - self._relieved_at < self.cooldown_s:
+            return reason  # still settling from the last time, don't unload/print again yet
+        if reason:
+            self._relieved_at = now
+            self.pressure_events += 1
+            print(f"memory pressure: {reason}, freeing what we can")
+            for callback in self.pressure_callbacks:
+                try:
+                    callback(reason)
+                except Exception as e:
+                    print(f"memory pressure callback failed: {e}")
+        elif used > self.budget_mb * self.warn_fraction:
+            if not self._warned:
+                self.warnings += 1
+                print(f"memory warning: {used}/{self.budget_mb} MB in use (/memory for details)")
+            self._warned = True
+        else:
+            self._warned = False
+        return reason
+
+    def start_watchdog(self, interval=5.0):
+        if self._thread:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._watch, args=(interval,), name="memory-watchdog", daemon=True)
+        self._thread.start()
+
+    def _watch(self, interval):
+        while self._running:
+            self.check()
+            deadline = time.monotonic() + interval
+            while self._running and time.monotonic() < deadline:
+                time.sleep(min(0.1, interval))
+
+    def stop_watchdog(self):
+        self._running = False
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def report(self):
+        """everything /memory prints: measured RSS, per-component deltas, mapped model files, plans"""
+        children = self.children()
+        mapped = mapped_files_mb()
+        for name, pid in children.items():
+            for path, mb in mapped_files_mb(pid).items():
+                mapped[f"{path} ({name})"] = mb
+        return {
+            'budget_mb': self.budget_mb,
+            'rss_mb': rss_mb(),
+            'children_mb': {name: rss_mb(pid) for name, pid in children.items()},
+            'peak_mb': max(self.peak_mb, self.total_rss_mb()),
+            'system': system_memory_mb(),
+            'components': dict(self.components),
+            'mapped': dict(sorted(mapped.items(), key=lambda item: -item[1])),
+            'plans': dict(self.plans),
+            'warnings': self.warnings,
+            'pressure_events': self.pressure_events,
+        }
+
+
+# shared instance, like tts: router records model plans here, main tracks the rest
+profile = MemoryProfile()
@@ -0,0 +1,317 @@
+# src/components/metrics.py
+# Live numbers for an assistant that runs unattended. Components record turns, tokens, TTFT,
+# remote errors, TTS/STT timings and indicator frame times here. MetricsServer serves them on
+# a local Prometheus-text endpoint (/metrics) and SnapshotWriter dumps them to a JSON file
+# every few seconds.
+#
+# Recording is meant to cost next to nothing on the hot paths (per token, per animation
+# frame). Every thread gets its own preallocated cells that only it writes, so inc() and
+# observe() are a couple of list updates with no lock. The scraper adds the cells up when
+# it reads them.
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# seconds, for latencies from a few ms (indicator frames) to long replies
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class _PerThreadCells:
+    """one preallocated list of numbers per thread, registered once per thread"""
+
+    def __init__(self, size):
+        self.size = size
+        self._local = threading.local()
+        self._all = []
+        self._lock = threading.Lock()  # only taken the first time a thread records
+
+    def mine(self):
+        try:
+            return self._local.cells
+        except AttributeError:
+            cells = [0] * self.size
+            with self._lock:
+                self._all.append(cells)
+            self._local.cells = cells
+            return cells
+
+    def totals(self):
+        with self._lock:
+            groups = list(self._all)
+        totals = [0] * self.size
+        for cells in groups:
+            for i, value in enumerate(cells):
+                totals[i] += value
+        return totals
+
+
+def _label_text(labels):
+    if not labels:
+        return ""
+    inner = ",".join(f'{key}="{str(value)}"'.replace("\n", " ") for key, value in sorted(labels.items()))
+    return "{" + inner + "}"
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help_text, labels=None):
+        self.name = name
+        self.help = help_text
+        self.labels = labels or {}
+        self._cells = _PerThreadCells(1)
+
+    def inc(self, amount=1):
+        self._cells.mine()[0] += amount
+
+    def value(self):
+        return self._cells.totals()[0]
+
+    def samples(self):
+        return [(self.name, self.labels, self.value())]
+
+
+class Gauge:
+    """last value set, or fn() evaluated when scraped (queue depths, buffered audio)"""
+    kind = "gauge"
+
+    def __init__(self, name, help_text, labels=None, fn=None):
+        self.name = name
+        self.help = help_text
+        self.labels = labels or {}
+        self.fn = fn
+        self._value = 0.0
+
+    def set(self, value):
+        self._value = value  # a single store, nothing to lock
+
+    def value(self):
+        if self.fn:
+            try:
+                return float(self.fn())
+            except Exception:
+                return float("nan")
+        return self._value
+
+    def samples(self):
+        return [(self.name, self.labels, self.value())]
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=None, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = labels or {}
+        self.bounds = tuple(sorted(buckets))
+        # per thread: one count per bucket, +Inf, then sum and count
+        self._n = len(self.bounds) + 1
+        self._cells = _PerThreadCells(self._n + 2)
+
+    def observe(self, value):
+        cells = self._cells.mine()
+        cells[bisect_left(self.bounds, value)] += 1
+        cells[self._n] += value
+        cells[self._n + 1] += 1
+
+    def time(self):
+        """with histogram.time(): ... observes the elapsed seconds"""
+        return _Timer(self)
+
+    def totals(self):
+        totals = self._cells.totals()
+        return totals[:self._n], totals[self._n], totals[self._n + 1]
+
+    def quantile(self, q):
+        """upper bound of the bucket holding the q-th observation (0 when empty)"""
+        buckets, _, count = self.totals()
+        if not count:
+            return 0.0
+        rank = q * count
+        seen = 0
+        for bound, n in zip(self.bounds + (float("inf"),), buckets):
+            seen += n
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+    def samples(self):
+        buckets, total, count = self.totals()
+        rows = []
+        seen = 0
+        for bound, n in zip(self.bounds + (float("inf"),), buckets):
+            seen += n
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            rows.append((self.name + "_bucket", dict(self.labels, le=le), seen))
+        rows.append((self.name + "_sum", self.labels, total))
+        rows.append((self.name + "_count", self.labels, count))
+        return rows
+
+
+class _Timer:
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start)
+
+
+class MetricsRegistry:
+    def __init__(self, prefix="k2so_"):
+        self.prefix = prefix
+        self._metrics = {}  # (name, labels) -> metric, in registration order
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name, help_text, labels, **kwargs):
+        key = (self.prefix + name, tuple(sorted((labels or {}).items())))
+        metric = self._metrics.get(key)
+        if metric is None:
+            with self._lock:
+                metric = self._metrics.get(key)
+                if metric is None:
+                    metric = cls(key[0], help_text, labels, **kwargs)
+                    self._metrics[key] = metric
+        return metric
+
+    def counter(self, name, help_text="", labels=None):
+        return self._get(Counter, name, help_text, labels)
+
+    def gauge(self, name, help_text="", labels=None, fn=None):
+        gauge = self._get(Gauge, name, help_text, labels)
+        if fn is not None:
+            gauge.fn = fn  # re-registering (e.g. a new AudioOutput) points it at the new source
+        return gauge
+
+    def histogram(self, name, help_text="", labels=None, buckets=DEFAULT_BUCKETS):
+        return self._get(Histogram, name, help_text, labels, buckets=buckets)
+
+    def render(self):
+        """Prometheus text exposition format"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        described = set()
+        for metric in metrics:
+            if metric.name not in described:
+                described.add(metric.name)
+                lines.append(f"# HELP {metric.name} {metric.help}")
+                lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{_label_text(labels)} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        """plain dict for the snapshot file: counters/gauges as numbers, histograms summarised"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        data = {}
+        for metric in metrics:
+            name = metric.name + _label_text(metric.labels)
+            if isinstance(metric, Histogram):
+                _, total, count = metric.totals()
+                data[name] = {
+                    'count': count,
+                    'mean': total / count if count else 0.0,
+                    'p50': metric.quantile(0.5),
+                    'p95': metric.quantile(0.95),
+                }
+            else:
+                data[name] = metric.value()
+        return data
+
+
+def _number(value):
+    if isinstance(value, float):
+        if value != value:
+            return "NaN"
+        if value in (float("inf"), float("-inf")):
+            return "+Inf" if value > 0 else "-Inf"
+        return repr(value)
+    return str(value)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        body = self.server.registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # scrapes every few seconds would drown the chat
+
+
+class MetricsServer:
+    """GET http://host:port/metrics, localhost only unless host says otherwise"""
+
+    def __init__(self, registry, host="127.0.0.1", port=9464):
+        self.httpd = ThreadingHTTPServer((host, port), _MetricsHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.registry = registry
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/metrics"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name="metrics-http", daemon=True)
+        self.thread.start()
+        return self
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class SnapshotWriter:
+    """writes registry.snapshot() to path every interval seconds (and once more on close)"""
+
+    def __init__(self, registry, path, interval=30.0):
+        self.registry = registry
+        self.path = path
+        self.interval = interval
+        self._stop = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name="metrics-snapshot", daemon=True)
+        self.thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.write()
+
+    def write(self):
+        tmp = self.path + ".tmp"
+        try:
+            with open(tmp, "w") as f:
+                json.dump({'time': time.time(), 'metrics': self.registry.snapshot()}, f, indent=1)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            print(f"couldn't write metrics snapshot: {e}")
+
+    def close(self):
+        self._stop.set()
+        if self.thread:
+            self.thread.join()
+        self.write()
+
+
+# shared registry, like tts: components grab their metrics from it at import time
+metrics = MetricsRegistry()
@@ -0,0 +1,121 @@
+# src/components/model_manager.py
+# Keeps several model backends loaded at once so the chat loop can switch between them
+# without restarting (and without reloading a multi-GB GGUF every time).
+# Backends are kept in least-recently-used order; when loading another one would go past
+# the RAM budget, the least recently used ones are unloaded first. The model in use is
+# never evicted, even if it alone is bigger than the budget.
+import threading
+import time
+from collections import OrderedDict
+
+
+class ModelManager:
+    def __init__(self, factory, ram_budget_mb, size_hint=None, log=print):
+        self.factory = factory  # (mode, name) -> backend, router.get_backend
+        self.size_hint = size_hint  # (mode, name) -> MB estimate before loading, optional
+        self.ram_budget_mb = ram_budget_mb
+        self.log = log
+        self.resident = OrderedDict()  # (mode, name) -> backend, oldest first
+        self.stats = {}  # (mode, name) -> counters, kept across evictions
+        self._lock = threading.Lock()
+
+    def get(self, mode, name, keep=()):
+        """the backend for mode/name, loading it (and evicting others) if it isn't resident.
+        keep: other keys that mustn't be evicted to make room (the model in use)"""
+        key = (mode, name)
+        keep = {key, *keep}
+        with self._lock:
+            stats = self.stats.setdefault(key, {
+                'hits': 0, 'misses': 0, 'evictions': 0,
+                'load_seconds': 0.0, 'resident_mb': 0,
+            })
+            if key in self.resident:
+                stats['hits'] += 1
+                self.resident.move_to_end(key)
+                return self.resident[key]
+
+            stats['misses'] += 1
+            expected = self.size_hint(mode, name) if self.size_hint else 0
+            self._evict(expected, keep)
+
+            start = time.perf_counter()
+            backend = self.factory(mode, name)
+            stats['load_seconds'] = time.perf_counter() - start
+            stats['resident_mb'] = self._resident_mb(backend)
+            self.resident[key] = backend
+            self.log(f"loaded {name} in {stats['load_seconds']:.2f}s (~{stats['resident_mb']} MB, "
+                     f"{self.used_mb()}/{self.ram_budget_mb} MB in use)")
+
+            # the size hint can be off, make room properly now that the real size is known
+            self._evict(0, keep)
+            return backend
+
+    def used_mb(self):
+        return sum(self.stats[key]['resident_mb'] for key in self.resident)
+
+    def _resident_mb(self, backend):
+        # remote backends are just an http client
+        size = getattr(backend, 'resident_mb', None)
+        return int(size()) if callable(size) else 0
+
+    def _evict(self, incoming_mb, keep):
+        for key in list(self.resident):
+            if self.used_mb() + incoming_mb <= self.ram_budget_mb:
+                return
+            if key in keep:
+                continue
+            self._unload(key)
+
+    def _unload(self, key):
+        backend = self.resident.pop(key)
+        stats = self.stats[key]
+        stats['evictions'] += 1
+        self.log(f"unloading {key[1]} (~{stats['resident_mb']} MB) to stay under {self.ram_budget_mb} MB")
+        unload = getattr(backend, 'unload', None)
+        if unload:
+            unload()
+
+    def key_of(self, backend):
+        """(mode, name) of a resident backend, None if the manager doesn't hold it"""
+        with self._lock:
+            for key, resident in self.resident.items():
+                if resident is backend:
+                    return key
+            return None
+
+    def touch(self, key):
+        """mark a resident model as just used, without counting a request"""
+        with self._lock:
+            if key in self.resident:
+                self.resident.move_to_end(key)
+
+    def unload_idle(self, keep):
+        """unload every model but keep, the (mode, name) in use (memory pressure), returns how many"""
+        with self._lock:
+            idle = [key for key in self.resident if key != keep]
+            for key in idle:
+                self._unload(key)
+            return len(idle)
+
+    def report(self):
+        """one row per model ever requested: residency, load time, size and hit rate"""
+        with self._lock:
+            rows = []
+            for (mode, name), stats in self.stats.items():
+                requests = stats['hits'] + stats['misses']
+                rows.append(dict(
+                    stats,
+                    mode=mode,
+                    name=name,
+                    resident=(mode, name) in self.resident,
+                    hit_rate=stats['hits'] / requests if requests else 0.0,
+                ))
+            return rows
+
+    def close(self):
+        with self._lock:
+            for key in list(self.resident):
+                backend = self.resident.pop(key)
+                unload = getattr(backend, 'unload', None)
+                if unload:
+                    unload()
@@ -0,0 +1,250 @@
+# src/components/model_registry.py
+# Knows what is in MODELS_DIR without loading any model.
+# GGUF files start with a key/value header (architecture, context length, quantization,
+# chat template, ...) before the tensor data, so reading just that header through mmap
+# only touches the first few MB of a multi-GB file. Results are cached in
+# model_index.json and re-read only when a file's mtime/size changes, so listing a big
+# model folder at startup is instant.
+import json
+import mmap
+import os
+import struct
+
+GGUF_MAGIC = b"GGUF"
+INDEX_NAME = "model_index.json"
+INDEX_VERSION = 1
+
+# gguf value types
+_UINT8, _INT8, _UINT16, _INT16, _UINT32, _INT32, _FLOAT32, _BOOL, _STRING, _ARRAY, _UINT64, _INT64, _FLOAT64 = range(13)
+_SCALARS = {
+    _UINT8: "<B", _INT8: "<b", _UINT16: "<H", _INT16: "<h", _UINT32: "<I", _INT32: "<i",
+    _FLOAT32: "<f", _BOOL: "<?", _UINT64: "<Q", _INT64: "<q", _FLOAT64: "<d",
+}
+
+# general.file_type -> the quantization name people know from file names
+FILE_TYPES = {
+    0: "F32", 1: "F16", 2: "Q4_0", 3: "Q4_1", 7: "Q8_0", 8: "Q5_0", 9: "Q5_1",
+    10: "Q2_K", 11: "Q3_K_S", 12: "Q3_K_M", 13: "Q3_K_L", 14: "Q4_K_S", 15: "Q4_K_M",
+    16: "Q5_K_S", 17: "Q5_K_M", 18: "Q6_K", 19: "IQ2_XXS", 20: "IQ2_XS", 21: "Q2_K_S",
+    22: "IQ3_XS", 23: "IQ3_XXS", 24: "IQ1_S", 25: "IQ4_NL", 26: "IQ3_S", 27: "IQ3_M",
+    28: "IQ2_S", 29: "IQ2_M", 30: "IQ4_XS", 31: "IQ1_M", 32: "BF16",
+}
+
+# arrays longer than this (token lists, merges...) are skipped, only their length is kept
+_MAX_ARRAY = 16
+
+
+class _HeaderReader:
+    def __init__(self, buf, version):
+        self.buf = buf
+        self.pos = 0
+        self.len_fmt = "<I" if version == 1 else "<Q"  # v1 used 32-bit lengths/counts
+
+    def scalar(self, fmt):
+        value = struct.unpack_from(fmt, self.buf, self.pos)[0]
+        self.pos += struct.calcsize(fmt)
+        return value
+
+    def length(self):
+        return self.scalar(self.len_fmt)
+
+    def string(self):
+        n = self.length()
+        value = bytes(self.buf[self.pos:self.pos + n]).decode("utf-8", errors="replace")
+        self.pos += n
+        return value
+
+    def skip_string(self):
+        n = self.length()  # (not `self.pos += self.length()`, that reads pos before length() moves it)
+        self.pos += n
+
+    def value(self, vtype):
+        if vtype == _STRING:
+            return self.string()
+        if vtype == _ARRAY:
+            item_type = self.scalar("<I")
+            count = self.length()
+            if count <= _MAX_ARRAY and item_type != _ARRAY:
+                return [self.value(item_type) for _ in range(count)]
+            # skip without decoding, strings have to be walked one length at a time
+            if item_type == _STRING:
+                for _ in range(count):
+                    self.skip_string()
+            elif item_type in _SCALARS:
+                self.pos += count * struct.calcsize(_SCALARS[item_type])
+            else:
+                for _ in range(count):
+                    self.value(item_type)
+            return {"array_len": count}
+        return self.scalar(_SCALARS[vtype])
+
+
+def is_gguf(path):
+    """cheap magic-bytes check, False for folders/missing files/other formats"""
+    try:
+        with open(path, "rb") as f:
+            return f.read(4) == GGUF_MAGIC
+    except OSError:
+        return False
+
+
+def read_gguf_metadata(path):
+    """header key/values of a GGUF file, without touching tensor data"""
+    with open(path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if mm[:4] != GGUF_MAGIC:
+                raise ValueError(f"not a GGUF file: {path}")
+            version = struct.unpack_from("<I", mm, 4)[0]
+            reader = _HeaderReader(mm, version)
+            reader.pos = 8
+            reader.length()  # tensor count
+            kv_count = reader.length()
+
+            metadata = {"gguf.version": version}
+            for _ in range(kv_count):
+                key = reader.string()
+                vtype = reader.scalar("<I")
+                metadata[key] = reader.value(vtype)
+            return metadata
+
+
+def detect_prompt_format(chat_template, architecture=""):
+    """map a jinja chat template (or the architecture) onto one of LocalModel's PROMPT_FORMATS"""
+    tpl = chat_template or ""
+    if "<|start_header_id|>" in tpl:
+        return "llama3"
+    if "<|im_start|>" in tpl:
+        return "chatml"
+    if "<start_of_turn>" in tpl:
+        return "gemma"
+    if "<|user|>" in tpl:
+        # phi-3 closes turns with <|end|>, zephyr/tinyllama-chat with the eos token
+        return "phi3" if "<|end|>" in tpl else "zephyr"
+    if "[INST]" in tpl:
+        return "llama2"
+    if architecture in ("phi3",):
+        return "phi3"
+    return "generic"
+
+
+def summarize(metadata, path, stat):
+    """the handful of fields the app cares about"""
+    arch = metadata.get("general.architecture", "unknown")
+    file_type = metadata.get("general.file_type")
+    template = metadata.get("tokenizer.chat_template")
+    return {
+        "file": os.path.basename(path),
+        "name": metadata.get("general.name") or os.path.splitext(os.path.basename(path))[0],
+        "architecture": arch,
+        "context_length": metadata.get(f"{arch}.context_length"),
+        "quantization": FILE_TYPES.get(file_type, str(file_type) if file_type is not None else "unknown"),
+        "prompt_format": detect_prompt_format(template if isinstance(template, str) else "", arch),
+        "chat_template": template if isinstance(template, str) else None,
+        "block_count": metadata.get(f"{arch}.block_count"),
+        "embedding_length": metadata.get(f"{arch}.embedding_length"),
+        "head_count": metadata.get(f"{arch}.attention.head_count"),
+        "head_count_kv": metadata.get(f"{arch}.attention.head_count_kv"),
+        "size_bytes": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+    }
+
+
+class ModelRegistry:
+    def __init__(self, models_dir):
+        self.models_dir = models_dir
+        self.index_path = os.path.join(models_dir, INDEX_NAME)
+        self.models = {}  # file name -> summary
+        self._loaded = False
+
+    def _load_index(self):
+        self._loaded = True
+        try:
+            with open(self.index_path, "r") as f:
+                data = json.load(f)
+            if data.get("version") == INDEX_VERSION:
+                self.models = data.get("models", {})
+        except (OSError, ValueError):
+            self.models = {}
+
+    def _save_index(self):
+        tmp = self.index_path + ".tmp"
+        try:
+            with open(tmp, "w") as f:
+                json.dump({"version": INDEX_VERSION, "models": self.models}, f, indent=1)
+            os.replace(tmp, self.index_path)
+        except OSError as e:
+            print(f"couldn't write model index: {e}")  # read-only models folder, just don't cache
+
+    def _refresh(self, name, path, stat):
+        """cached summary if the file is unchanged, otherwise re-read its header"""
+        cached = self.models.get(name)
+        if cached and cached.get("mtime_ns") == stat.st_mtime_ns and cached.get("size_bytes") == stat.st_size:
+            return cached, False
+        try:
+            self.models[name] = summarize(read_gguf_metadata(path), path, stat)
+        except (OSError, ValueError, KeyError, struct.error) as e:
+            print(f"skipping {name}: {e}")
+            self.models.pop(name, None)
+            return None, cached is not None
+        return self.models[name], True
+
+    def scan(self):
+        """every GGUF in models_dir (top level), re-reading only files that changed"""
+        if not self._loaded:
+            self._load_index()
+        if not self.models_dir or not os.path.isdir(self.models_dir):
+            return {}
+
+        changed = False
+        seen = set()
+        with os.scandir(self.models_dir) as entries:
+            for entry in entries:
+                if not entry.name.lower().endswith(".gguf") or not entry.is_file():
+                    continue
+                seen.add(entry.name)
+                _, updated = self._refresh(entry.name, entry.path, entry.stat())
+                changed = changed or updated
+
+        for gone in set(self.models) - seen:
+            del self.models[gone]
+            changed = True
+        if changed:
+            self._save_index()
+        return dict(self.models)
+
+    def info(self, filename):
+        """summary for one model file (path relative to models_dir), None if not a GGUF"""
+        if not self._loaded:
+            self._load_index()
+        path = os.path.join(self.models_dir, filename)
+        if not os.path.isfile(path) or not is_gguf(path):
+            return None
+        name = os.path.relpath(path, self.models_dir)
+        summary, updated = self._refresh(name, path, os.stat(path))
+        if updated:
+            self._save_index()
+        return summary
+
+
+def estimate_resident_mb(info, n_ctx=None, kv_bytes=2.0):
+    """rough RAM a loaded model costs: the weights plus a kv cache for n_ctx
+    (kv_bytes per element: 2 for f16, about 1 for q8_0)"""
+    mb = info["size_bytes"] // (1024 * 1024)
+    trained = info.get("context_length") or 0
+    n_ctx = min(n_ctx, trained) if n_ctx and trained else (n_ctx or trained)
+    try:
+        kv_dim = info["embedding_length"] * (info.get("head_count_kv") or info["head_count"]) // info["head_count"]
+        mb += int(2 * info["block_count"] * n_ctx * kv_dim * kv_bytes) // (1024 * 1024)
+    except (KeyError, TypeError, ZeroDivisionError):
+        pass  # header without shapes, weights only
+    return mb
+
+
+def describe(info):
+    """one-line summary for model menus"""
+    if not info:
+        return ""
+    ctx = info.get("context_length")
+    ctx_s = f"{ctx // 1024}k ctx" if isinstance(ctx, int) and ctx >= 1024 else "ctx ?"
+    return (f"{info['architecture']}, {info['quantization']}, {ctx_s}, "
+            f"{info['size_bytes'] / (1024 ** 3):.1f} GB, {info['prompt_format']} format")
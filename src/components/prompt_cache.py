@@ -0,0 +1,146 @@
+# src/components/prompt_cache.py
+# Saves the llama.cpp context right after the persona/system prompt has been evaluated,
+# so the next start loads it from disk instead of re-evaluating the same preamble
+# (several seconds on a Pi).
+#
+# A snapshot is only valid for the exact model file, preamble text and n_ctx, all three
+# go into the file name so anything changing just means a different (missing) file.
+# The KV state is stored page-aligned at the end of the file and read through an mmap
+# (no read() into a bytes object first). llama-cpp-python's load_state still copies it
+# once (from_buffer_copy) before handing it to llama.cpp.
+import hashlib
+import json
+import mmap
+import os
+import struct
+
+import numpy as np
+
+MAGIC = b"K2ST"
+VERSION = 1
+_ALIGN = 4096
+_SAMPLE = 1024 * 1024  # bytes hashed from each end of the model file
+
+
+def model_fingerprint(model_path):
+    """cheap stand-in for hashing a multi-GB file: size + first and last MB
+    (GGUF puts the header at the start, so a different model never collides)"""
+    digest = hashlib.sha1()
+    size = os.path.getsize(model_path)
+    digest.update(str(size).encode("utf-8"))
+    with open(model_path, "rb") as f:
+        _hash_range(f, digest, _SAMPLE)
+        if size > 2 * _SAMPLE:
+            f.seek(-_SAMPLE, os.SEEK_END)
+            _hash_range(f, digest, _SAMPLE)
+    return digest.hexdigest()
+
+
+def _hash_range(f, digest, n, block=64 * 1024):
+    while n > 0:
+        data = f.read(min(block, n))
+        if not data:
+            break
+        digest.update(data)
+        n -= len(data)
+
+
+def snapshot_path(cache_dir, model_path, preamble, n_ctx):
+    key = hashlib.sha1()
+    key.update(model_fingerprint(model_path).encode("utf-8"))
+    key.update(hashlib.sha1(preamble.encode("utf-8")).hexdigest().encode("utf-8"))
+    key.update(str(n_ctx).encode("utf-8"))
+    stem = os.path.splitext(os.path.basename(model_path))[0]
+    return os.path.join(cache_dir, f"{stem}-{key.hexdigest()[:16]}.state")
+
+
+def _pad(n):
+    return (-n) % _ALIGN
+
+
+def save_snapshot(llm, path):
+    """write llm's current state (the evaluated preamble) to path, returns bytes written"""
+    state = llm.save_state()
+    n_tokens = state.n_tokens
+    input_ids = np.asarray(state.input_ids, dtype=np.int32)[:n_tokens]
+    scores = np.asarray(state.scores, dtype=np.float32)
+    if not n_tokens or not len(scores):
+        raise ValueError("nothing evaluated, no snapshot to write")
+    # only the logits after the last token matter, the next eval recomputes the rest.
+    # without logits_all there are just n_batch rows, a longer preamble still needs one
+    # n_vocab-wide row or load_state can't take it back
+    last_scores = scores[min(n_tokens, len(scores)) - 1]
+
+    header = json.dumps({
+        'version': VERSION,
+        'n_ctx': llm.n_ctx(),
+        'n_tokens': n_tokens,
+        'n_vocab': int(last_scores.shape[0]),
+        'state_size': int(state.llama_state_size),
+        'seed': state.seed,
+    }).encode("utf-8")
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(MAGIC + struct.pack("<I", len(header)) + header)
+        f.write(b"\0" * (-f.tell() % 8))
+        f.write(input_ids.tobytes())
+        f.write(last_scores.tobytes())
+        f.write(b"\0" * _pad(f.tell()))
+        f.write(memoryview(state.llama_state)[:state.llama_state_size])
+        size = f.tell()
+    os.replace(tmp, path)
+    return size
+
+
+def load_snapshot(llm, path):
+    """restore a snapshot into llm, returns the number of preamble tokens now cached"""
+    from llama_cpp import LlamaState
+
+    with open(path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if mm[:4] != MAGIC:
+                raise ValueError("not a prompt snapshot")
+            header_len = struct.unpack_from("<I", mm, 4)[0]
+            header = json.loads(mm[8:8 + header_len])
+            if header.get('version') != VERSION or header['n_ctx'] != llm.n_ctx():
+                raise ValueError("snapshot from a different version / context size")
+
+            n_tokens, n_vocab = header['n_tokens'], header['n_vocab']
+            offset = 8 + header_len
+            offset += -offset % 8
+            input_ids = np.zeros(header['n_ctx'], dtype=np.intc)
+            input_ids[:n_tokens] = np.frombuffer(mm, dtype=np.int32, count=n_tokens, offset=offset)
+            offset += 4 * n_tokens
+            scores = np.frombuffer(mm, dtype=np.float32, count=n_vocab, offset=offset).reshape(1, n_vocab).copy()
+            offset += 4 * n_vocab
+            offset += _pad(offset)
+
+            with memoryview(mm)[offset:offset + header['state_size']] as kv_state:
+                llm.load_state(LlamaState(
+                    input_ids=input_ids,
+                    scores=scores,
+                    n_tokens=n_tokens,
+                    llama_state=kv_state,
+                    llama_state_size=header['state_size'],
+                    seed=header['seed'],
+                ))
+    return n_tokens
+
+
+def remove_stale(cache_dir, model_path, keep):
+    """drop older snapshots of the same model (previous preamble / n_ctx)"""
+    stem = os.path.splitext(os.path.basename(model_path))[0]
+    try:
+        names = os.listdir(cache_dir)
+    except OSError:
+        return
+    for name in names:
+        path = os.path.join(cache_dir, name)
+        ours = name.startswith(stem + "-") and name.endswith(".state") and len(name) == len(stem) + 23
+        if ours and path != keep:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
@@ -1,39 +1,144 @@
 # components/remote_model.py
+import asyncio
 import os
+import time
 import requests
 
 # TODO: Needs to be rewritten to use the new model backend interface
 # TODO: May need to have a specialized ChatSession class for local & remote models
 from components.chat_session import ChatSession
+from components.metrics import metrics
+
+_requests = metrics.counter("remote_requests_total", "requests sent to remote models")
+_errors = metrics.counter("remote_errors_total", "remote requests that failed after all retries")
+_retries = metrics.counter("remote_retries_total", "remote requests retried after a failure")
+_request_seconds = metrics.histogram("remote_request_seconds", "remote request round trip")
 
 # TODO: Needs to be rewritten to use the new model backend interface
 class RemoteModel:
-    def __init__(self, model_config):
+    def __init__(self, model_config, system_prompt=None, retries=2, timeout=60, max_concurrency=4):
         self.url = model_config["url"]
+        # requests in flight to this endpoint at once when fanning out (components/fan_out.py)
+        self.max_concurrency = model_config.get("max_concurrency", max_concurrency)
+        self.system_prompt = system_prompt
+        self.retries = retries  # extra attempts on connection errors / 429 / 5xx
+        self.timeout = timeout
         self.api_key_env = model_config.get("api_key_env")
         self.model_name = self.url.split("/")[-1] # extract model name from the URL
+        self.last_error = None  # why the last reply failed, None if it worked (see ChatSession._record)
 
         # get model name from the config key rather than parsing url
         # self.model_name = next(key for key, config in config.REMOTE_MODELS.items() if config["url"] == self.url)
 
-    def generate_response(self, prompt):
+    def generate_response(self, prompt, conversation_history=None):
         # Try to contact the remote API sending the prompt and get a response back
+        self.last_error = None
         try:
-            api_key = os.getenv(self.api_key_env) if self.api_key_env else None
-            headers = {"Authorization": f"Bearer {api_key}"} if api_key else {}
-            payload = {
-                "model": "gpt-3.5-turbo",  # @TODO make it easy to change models
-                "messages": [{"role": "user", "content": prompt}]
-            }
-            response = requests.post(self.url, json=payload, headers=headers)
-            response.raise_for_status()
-            data = response.json()
+            data = self._post(self._payload(prompt, conversation_history), self._headers())
             return data["choices"][0]["message"]["content"] # parsing and returning the response from the API
         except Exception as e: 
-            return f"Error contacting remote model: {e}"
+            _errors.inc()
+            return self._failed(f"Error contacting remote model: {e}")
+
+    async def agenerate_response(self, prompt, conversation_history=None, client=None):
+        # same as generate_response without blocking the event loop. client is an
+        # httpx.AsyncClient (fan_out shares one so connections/HTTP2 streams get reused),
+        # without one the blocking request runs in a thread instead
+        if client is None:
+            return await asyncio.to_thread(self.generate_response, prompt, conversation_history)
+        self.last_error = None
+        try:
+            data = await self._apost(client, self._payload(prompt, conversation_history), self._headers())
+            return data["choices"][0]["message"]["content"]
+        except Exception as e:
+            _errors.inc()
+            return self._failed(f"Error contacting remote model: {e}")
+
+    def _failed(self, message):
+        # still shown/spoken, but ChatSession keeps it out of history and the chat log
+        self.last_error = message
+        return message
+
+    def _headers(self):
+        api_key = os.getenv(self.api_key_env) if self.api_key_env else None
+        return {"Authorization": f"Bearer {api_key}"} if api_key else {}
+
+    def _payload(self, prompt, conversation_history=None, **extra):
+        return dict({
+            "model": "gpt-3.5-turbo",  # @TODO make it easy to change models
+            "messages": self._build_messages(prompt, conversation_history)
+        }, **extra)
     
+    def stream_structured(self, prompt, grammar=None, schema=None, max_tokens=64, conversation_history=None):
+        # OpenAI-style structured output, servers that don't know response_format get the
+        # plain request (the prompt still asks for JSON)
+        if schema is None:
+            yield self.generate_response(prompt, conversation_history)
+            return
+        self.last_error = None
+        try:
+            payload = self._payload(
+                prompt, conversation_history, max_tokens=max_tokens, temperature=0,
+                response_format={"type": "json_schema", "json_schema": {"name": "command", "schema": schema}},
+            )
+            data = self._post(payload, self._headers())
+            yield data["choices"][0]["message"]["content"]
+        except requests.HTTPError:
+            yield self.generate_response(prompt, conversation_history)
+        except Exception as e:
+            _errors.inc()
+            yield self._failed(f"Error contacting remote model: {e}")
+
+    def _post(self, payload, headers):
+        # transient failures (network, rate limit, server errors) get retried with a short backoff
+        for attempt in range(self.retries + 1):
+            _requests.inc()
+            start = time.perf_counter()
+            try:
+                response = requests.post(self.url, json=payload, headers=headers, timeout=self.timeout)
+                transient = response.status_code == 429 or response.status_code >= 500
+                if not transient or attempt == self.retries:
+                    response.raise_for_status()
+                    return response.json()
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.retries:
+                    raise
+            finally:
+                _request_seconds.observe(time.perf_counter() - start)
+            _retries.inc()
+            time.sleep(0.5 * 2 ** attempt)
+
+    async def _apost(self, client, payload, headers):
+        # _post for the async client, same retries/backoff/metrics
+        import httpx
+        for attempt in range(self.retries + 1):
+            _requests.inc()
+            start = time.perf_counter()
+            try:
+                response = await client.post(self.url, json=payload, headers=headers, timeout=self.timeout)
+                transient = response.status_code == 429 or response.status_code >= 500
+                if not transient or attempt == self.retries:
+                    response.raise_for_status()
+                    return response.json()
+            except httpx.TransportError:
+                if attempt == self.retries:
+                    raise
+            finally:
+                _request_seconds.observe(time.perf_counter() - start)
+            _retries.inc()
+            await asyncio.sleep(0.5 * 2 ** attempt)
+
+    # previous turns go in as alternating user/assistant messages (OpenAI chat format)
+    def _build_messages(self, prompt, conversation_history=None):
+        messages = [{"role": "system", "content": self.system_prompt}] if self.system_prompt else []
+        for turn in conversation_history or []:
+            messages.append({"role": "user", "content": turn['user']})
+            messages.append({"role": "assistant", "content": turn['assistant']})
+        messages.append({"role": "user", "content": prompt})
+        return messages
+
     # TODO: Only for testing purposes now remove later...
     # Prototype for chat interface
-    def start_chat(self):
+    def start_chat(self, **session_options):
         # TODO: Implement chat interface
-        return ChatSession(self)
+        return ChatSession(self, **session_options)
@@ -0,0 +1,359 @@
+# src/components/semantic_memory.py
+# Long-term memory: past turns from the chat log get embedded into a float16 matrix
+# stored as a memory-mapped .npy, and the few most similar ones are pulled back into
+# the prompt so K-2SO can "remember" older conversations.
+#
+# Search is a vectorized cosine scan in fixed-size chunks (no big temporary arrays),
+# and once the store passes ~100k entries an IVF index (spherical k-means lists)
+# keeps it to a few clusters per query.
+import json
+import os
+import re
+import threading
+import time
+import zlib
+
+import numpy as np
+from numpy.lib.format import open_memmap
+
+_WORD_RE = re.compile(r"[a-z0-9']+")
+
+
+class HashingEmbedder:
+    """dependency-free fallback: signed feature hashing of words + word pairs"""
+
+    def __init__(self, dim=384):
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+
+    def encode(self, texts):
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            words = _WORD_RE.findall(text.lower())
+            feats = words + [a + " " + b for a, b in zip(words, words[1:])]
+            if not feats:
+                continue
+            # crc32 is stable between runs, unlike hash()
+            hashes = np.fromiter((zlib.crc32(f.encode("utf-8")) for f in feats), dtype=np.uint32, count=len(feats))
+            signs = np.where(hashes & 0x80000000, -1.0, 1.0).astype(np.float32)
+            np.add.at(out[row], hashes % self.dim, signs)
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        np.divide(out, norms, out=out, where=norms > 0)
+        return out
+
+
+class SentenceEmbedder:
+    """small sentence-transformers model on CPU (all-MiniLM-L6-v2 is ~90MB)"""
+
+    def __init__(self, model_name):
+        from sentence_transformers import SentenceTransformer
+        self.model = SentenceTransformer(model_name, device="cpu")
+        self.dim = self.model.get_sentence_embedding_dimension()
+        self.name = model_name
+
+    def encode(self, texts):
+        vecs = self.model.encode(texts, batch_size=32, normalize_embeddings=True, convert_to_numpy=True)
+        return vecs.astype(np.float32, copy=False)
+
+
+def load_embedder(model_name):
+    """sentence-transformers model if installed, hashing embedder otherwise"""
+    if model_name and not model_name.startswith("hashing"):
+        try:
+            return SentenceEmbedder(model_name)
+        except ImportError:
+            print("sentence-transformers not available, using hashing embedder for memory")
+        except Exception as e:
+            print(f"failed to load embedding model {model_name}: {e}, using hashing embedder")
+    return HashingEmbedder()
+
+
+class VectorStore:
+    """append-only float16 vectors + int64 ids in memory-mapped .npy files"""
+
+    CHUNK = 4096  # rows scored per matmul, bounds the float32 scratch buffer
+
+    def __init__(self, directory, dim, model_name, initial_capacity=1024):
+        self.directory = directory
+        self.dim = dim
+        self.model_name = model_name
+        self.count = 0
+        self.last_id = 0
+        self.ivf_count = 0  # rows covered by the ivf lists, anything after is scanned directly
+        self.centroids = None
+        self.ivf_order = None
+        self.ivf_offsets = None
+        self._lock = threading.Lock()
+        self._scratch = np.empty((self.CHUNK, dim), dtype=np.float32)  # search() only, under _lock
+
+        os.makedirs(directory, exist_ok=True)
+        self.meta_path = os.path.join(directory, "meta.json")
+        self.vectors_path = os.path.join(directory, "vectors.npy")
+        self.ids_path = os.path.join(directory, "ids.npy")
+
+        meta = self._read_meta()
+        if meta and meta.get("dim") == dim and meta.get("model") == model_name and os.path.exists(self.vectors_path):
+            self.count = meta["count"]
+            self.last_id = meta["last_id"]
+            self.vectors = open_memmap(self.vectors_path, mode="r+")
+            self.ids = open_memmap(self.ids_path, mode="r+")
+            self._load_ivf(meta.get("ivf_count", 0))
+        else:
+            # new store, or the embedding model changed so old vectors are useless
+            self._create(initial_capacity)
+
+    def _read_meta(self):
+        if not os.path.exists(self.meta_path):
+            return None
+        try:
+            with open(self.meta_path, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_meta(self):
+        meta = {
+            "dim": self.dim, "model": self.model_name, "count": self.count,
+            "last_id": self.last_id, "ivf_count": self.ivf_count,
+        }
+        tmp = self.meta_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp, self.meta_path)
+
+    def _create(self, capacity):
+        for name in ("ivf_centroids.npy", "ivf_order.npy", "ivf_offsets.npy"):
+            path = os.path.join(self.directory, name)
+            if os.path.exists(path):
+                os.remove(path)
+        self.vectors = open_memmap(self.vectors_path, mode="w+", dtype=np.float16, shape=(capacity, self.dim))
+        self.ids = open_memmap(self.ids_path, mode="w+", dtype=np.int64, shape=(capacity,))
+        self.count = 0
+        self.last_id = 0
+        self.ivf_count = 0
+        self.centroids = None
+        self._write_meta()
+
+    def _grow(self, needed):
+        # double into new files then swap them in, old data is copied once
+        capacity = max(needed, 2 * self.vectors.shape[0])
+        for attr, path, dtype, shape in (
+            ("vectors", self.vectors_path, np.float16, (capacity, self.dim)),
+            ("ids", self.ids_path, np.int64, (capacity,)),
+        ):
+            old = getattr(self, attr)
+            tmp = path + ".grow"
+            new = open_memmap(tmp, mode="w+", dtype=dtype, shape=shape)
+            new[:self.count] = old[:self.count]
+            new.flush()
+            del new, old
+            setattr(self, attr, None)
+            os.replace(tmp, path)
+            setattr(self, attr, open_memmap(path, mode="r+"))
+
+    def add(self, ids, vectors):
+        """append unit-length vectors (n, dim) for the given row ids"""
+        n = len(ids)
+        if not n:
+            return
+        with self._lock:
+            if self.count + n > self.vectors.shape[0]:
+                self._grow(self.count + n)
+            self.vectors[self.count:self.count + n] = vectors
+            self.ids[self.count:self.count + n] = ids
+            self.count += n
+            self.last_id = int(ids[-1])
+            self.vectors.flush()
+            self.ids.flush()
+            self._write_meta()
+
+    def search(self, query, k=5):
+        """top-k (id, cosine score) for a unit-length query vector"""
+        query = np.asarray(query, dtype=np.float32)
+        with self._lock:
+            if not self.count:
+                return []
+            if self.centroids is not None:
+                rows, scores = self._search_ivf(query)
+            else:
+                rows, scores = None, self._scan(query, 0, self.count)
+
+            k = min(k, len(scores))
+            if not k:
+                return []
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            picked = top if rows is None else rows[top]
+            return [(int(self.ids[r]), float(scores[t])) for r, t in zip(picked, top)]
+
+    def _scan(self, query, start, stop):
+        # cast one chunk at a time into the preallocated scratch buffer, matmul in float32
+        scores = np.empty(stop - start, dtype=np.float32)
+        for s in range(start, stop, self.CHUNK):
+            e = min(s + self.CHUNK, stop)
+            block = self._scratch[:e - s]
+            block[...] = self.vectors[s:e]
+            np.matmul(block, query, out=scores[s - start:e - start])
+        return scores
+
+    def _search_ivf(self, query, nprobe=8):
+        probe = np.argpartition(-(self.centroids @ query), min(nprobe, len(self.centroids)) - 1)[:nprobe]
+        parts = [self.ivf_order[self.ivf_offsets[c]:self.ivf_offsets[c + 1]] for c in probe]
+        # rows added since the last build aren't in any list yet
+        parts.append(np.arange(self.ivf_count, self.count, dtype=np.int64))
+        rows = np.sort(np.concatenate(parts))
+        if not len(rows):
+            return rows, np.empty(0, dtype=np.float32)
+        scores = self.vectors[rows].astype(np.float32) @ query
+        return rows, scores
+
+    def ivf_stale(self, threshold):
+        if self.count < threshold:
+            return False
+        # rebuild once the unindexed tail is over 10% of the store
+        return self.centroids is None or (self.count - self.ivf_count) > 0.1 * self.ivf_count
+
+    def build_ivf(self, nlist=None, iterations=10, sample=20000, seed=0):
+        """spherical k-means over a sample, then bucket every row by nearest centroid"""
+        n = self.count
+        nlist = nlist or int(min(4096, max(16, np.sqrt(n))))
+        rng = np.random.default_rng(seed)
+
+        train_idx = np.sort(rng.choice(n, size=min(n, max(sample, nlist * 32)), replace=False))
+        train = self.vectors[train_idx].astype(np.float32)
+        centroids = train[rng.choice(len(train), size=nlist, replace=False)].copy()
+        assign = np.empty(len(train), dtype=np.int64)
+        for _ in range(iterations):
+            for s in range(0, len(train), self.CHUNK):
+                assign[s:s + self.CHUNK] = np.argmax(train[s:s + self.CHUNK] @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, train)
+            # empty clusters keep their old centroid
+            filled = np.bincount(assign, minlength=nlist) > 0
+            centroids[filled] = sums[filled]
+            centroids /= np.maximum(np.linalg.norm(centroids, axis=1, keepdims=True), 1e-8)
+        del train
+
+        # its own buffer: search() uses self._scratch under the lock while this runs without it
+        scratch = np.empty((self.CHUNK, self.dim), dtype=np.float32)
+        assign = np.empty(n, dtype=np.int32)
+        for s in range(0, n, self.CHUNK):
+            e = min(s + self.CHUNK, n)
+            block = scratch[:e - s]
+            block[...] = self.vectors[s:e]
+            assign[s:e] = np.argmax(block @ centroids.T, axis=1)
+
+        order = np.argsort(assign, kind="stable").astype(np.int64)
+        offsets = np.zeros(nlist + 1, dtype=np.int64)
+        np.cumsum(np.bincount(assign, minlength=nlist), out=offsets[1:])
+
+        np.save(os.path.join(self.directory, "ivf_centroids.npy"), centroids)
+        np.save(os.path.join(self.directory, "ivf_order.npy"), order)
+        np.save(os.path.join(self.directory, "ivf_offsets.npy"), offsets)
+        with self._lock:
+            self.centroids, self.ivf_order, self.ivf_offsets = centroids, order, offsets
+            self.ivf_count = n
+            self._write_meta()
+
+    def _load_ivf(self, ivf_count):
+        path = os.path.join(self.directory, "ivf_centroids.npy")
+        if not ivf_count or not os.path.exists(path):
+            return
+        self.centroids = np.load(path)
+        self.ivf_order = np.load(os.path.join(self.directory, "ivf_order.npy"), mmap_mode="r")
+        self.ivf_offsets = np.load(os.path.join(self.directory, "ivf_offsets.npy"))
+        self.ivf_count = ivf_count
+
+
+class LongTermMemory:
+    def __init__(self, chat_log, directory, embedder=None, top_k=3, token_budget=256,
+                 min_score=0.35, ivf_threshold=100000):
+        self.chat_log = chat_log
+        self.embedder = embedder or HashingEmbedder()
+        self.top_k = top_k
+        self.token_budget = token_budget
+        self.min_score = min_score
+        self.ivf_threshold = ivf_threshold
+        self.store = VectorStore(directory, self.embedder.dim, self.embedder.name)
+        self.last_search_ms = 0.0
+
+        self._wake = threading.Event()
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        """index whatever the chat log has in the background, then follow new turns"""
+        self._running = True
+        self._thread = threading.Thread(target=self._sync_loop, daemon=True)
+        self._thread.start()
+
+    def notify(self):
+        """a turn was just logged, pick it up soon"""
+        self._wake.set()
+
+    def _sync_loop(self):
+        while self._running:
+            try:
+                self.sync()
+            except Exception as e:
+                print(f"memory sync failed: {e}")
+            self._wake.wait(timeout=30)
+            self._wake.clear()
+
+    def sync(self, batch_size=256):
+        """embed any chat log turns newer than the last indexed one"""
+        self.chat_log.flush()
+        added = 0
+        while True:
+            rows = self.chat_log.turns_after(self.store.last_id, batch_size)
+            if not rows:
+                break
+            ids = np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows))
+            vecs = self.embedder.encode([f"{u}\n{a}" for _, u, a in rows])
+            self.store.add(ids, vecs)
+            added += len(rows)
+        if added and self.store.ivf_stale(self.ivf_threshold):
+            self.store.build_ivf()
+        return added
+
+    def retrieve(self, prompt, exclude=()):
+        """most similar past turns above min_score, best first"""
+        start = time.perf_counter()
+        query = self.embedder.encode([prompt])[0]
+        hits = [(i, s) for i, s in self.store.search(query, 2 * self.top_k + len(exclude)) if s >= self.min_score]
+        turns = self.chat_log.get_turns([i for i, _ in hits])
+        self.last_search_ms = (time.perf_counter() - start) * 1000
+
+        results = []
+        seen = set(exclude)
+        for turn_id, score in hits:
+            turn = turns.get(turn_id)
+            # turns already in the live history (or asked twice) would just repeat themselves
+            if turn is None or turn['user'] in seen:
+                continue
+            seen.add(turn['user'])
+            results.append(dict(turn, id=turn_id, score=score))
+        return results[:self.top_k]
+
+    def context_for(self, prompt, history=()):
+        """snippet block to put ahead of the prompt, trimmed to the token budget"""
+        turns = self.retrieve(prompt, exclude={t['user'] for t in history})
+        if not turns:
+            return ""
+
+        lines = ["Relevant notes from earlier conversations:"]
+        used = len(lines[0]) // 4  # ~4 chars per token, no tokenizer needed
+        for turn in turns:
+            snippet = f"- You asked: {turn['user'][:200]}\n  I answered: {turn['assistant'][:300]}"
+            cost = len(snippet) // 4
+            if used + cost > self.token_budget:
+                break
+            lines.append(snippet)
+            used += cost
+        return "\n".join(lines) + "\n" if len(lines) > 1 else ""
+
+    def close(self):
+        self._running = False
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout=5)
@@ -0,0 +1,298 @@
+# src/components/session_replay.py
+# Records a chat session so a slow conversation can be reproduced later, and replays it.
+#
+# SessionRecorder writes one JSON line per event: a header (mode, model, sampling/llama
+# settings), mic recordings (compressed int16 chunks, at the mic's own rate so replay goes through
+# the same front end), turns (prompt, reply, time to first token, reply time, decode stats)
+# and speech (how long TTS took). SessionReplayer feeds the turns back through ChatSession,
+# plus WhisperSTT / TextToSpeech when given. It uses either a real backend or RecordedBackend,
+# which plays the recorded replies back. Replay can run at the original pace (same pauses
+# between turns, recorded reply timing) or as fast as possible. latency_diff() then compares
+# the replay against the recording turn by turn.
+import base64
+import json
+import os
+import threading
+import time
+import zlib
+
+import numpy as np
+
+from components.chat_session import ChatSession
+
+AUDIO_CHUNK_SECONDS = 1.0
+
+
+def encode_audio(audio, samplerate, chunk_seconds=AUDIO_CHUNK_SECONDS):
+    """float32 -1..1 -> list of text chunks. Lossless int16: sample-to-sample differences with
+    the low and high bytes split apart, which zlib packs ~25% smaller than raw pcm"""
+    pcm = (np.clip(np.asarray(audio, dtype=np.float32).reshape(-1), -1.0, 1.0) * 32767).astype(np.int16)
+    step = max(1, int(samplerate * chunk_seconds))
+    chunks = []
+    for i in range(0, len(pcm), step):
+        delta = np.diff(pcm[i:i + step], prepend=np.int16(0)).astype("<i2")
+        shuffled = delta.view(np.uint8).reshape(-1, 2).T.tobytes()
+        chunks.append(base64.b85encode(zlib.compress(shuffled, 6)).decode("ascii"))
+    return chunks
+
+
+def decode_audio(chunks):
+    parts = []
+    for chunk in chunks:
+        shuffled = np.frombuffer(zlib.decompress(base64.b85decode(chunk)), dtype=np.uint8)
+        delta = np.ascontiguousarray(shuffled.reshape(2, -1).T).view("<i2").reshape(-1)
+        parts.append(np.cumsum(delta, dtype=np.int16))  # wraps around exactly like the diff did
+    if not parts:
+        return np.zeros(0, dtype=np.float32)
+    return np.concatenate(parts).astype(np.float32) / 32767.0
+
+
+def backend_settings(backend):
+    """what decides how a reply comes out (and how fast): sampling + llama.cpp params"""
+    settings = {'backend': type(backend).__name__, 'model_name': getattr(backend, "model_name", None)}
+    if hasattr(backend, "_sampling_params"):
+        settings['sampling'] = backend._sampling_params(256)
+    if getattr(backend, "llama_params", None):
+        settings['llama_params'] = dict(backend.llama_params)
+    return settings
+
+
+class SessionRecorder:
+    def __init__(self, path, mode=None, model=None, backend=None, history_turns=4):
+        self.path = path
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()  # turns come from the chat loop, audio from the stt caller
+        self._pending_audio = None  # id of the recording the next prompt was transcribed from
+        self._audio_ids = 0
+        self._file = open(path, "w", encoding="utf-8")
+        header = {'type': "session", 'created': time.time(), 'mode': mode, 'model': model,
+                  'history_turns': history_turns}
+        if backend is not None:
+            header.update(backend_settings(backend))
+        self._write(header)
+
+    def _now(self):
+        return round(time.perf_counter() - self.started, 4)
+
+    def _write(self, event):
+        with self._lock:
+            if self._file:
+                self._file.write(json.dumps(event) + "\n")
+                self._file.flush()  # a crash mid-session still leaves everything up to it
+
+    def audio(self, audio, samplerate, transcript, transcribe_s):
+        """a mic recording and what whisper made of it, the next turn's prompt comes from it"""
+        with self._lock:
+            self._audio_ids += 1
+            audio_id = self._pending_audio = self._audio_ids
+        self._write({'type': "audio", 't': self._now(), 'id': audio_id, 'samplerate': int(samplerate),
+                     'chunks': encode_audio(audio, samplerate), 'transcript': transcript,
+                     'transcribe_s': round(transcribe_s, 4)})
+
+    def turn(self, prompt, response, started, ttft_s, reply_s, decode=None):
+        """started is the perf_counter() value when the prompt was sent"""
+        with self._lock:
+            audio_id, self._pending_audio = self._pending_audio, None
+        self._write({'type': "turn", 't': round(started - self.started, 4), 'prompt': prompt,
+                     'audio': audio_id, 'response': response,
+                     'ttft_s': None if ttft_s is None else round(ttft_s, 4),
+                     'reply_s': round(reply_s, 4), 'decode': decode})
+
+    def switch(self, mode, model, backend):
+        """/model switched backends, the turns after this one ran on the new one"""
+        event = {'type': "switch", 't': self._now(), 'mode': mode, 'model': model}
+        event.update(backend_settings(backend))
+        self._write(event)
+
+    def speech(self, text, seconds):
+        self._write({'type': "speech", 't': self._now(), 'chars': len(text), 'seconds': round(seconds, 4)})
+
+    def close(self):
+        with self._lock:
+            if self._file:
+                self._file.close()
+                self._file = None
+
+
+def load_session(path):
+    """header dict + list of turns, each with its audio and speech events attached and the
+    (mode, model) it ran on"""
+    header, turns, audio = {}, [], {}
+    current = (None, None)
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                event = json.loads(line)
+            except json.JSONDecodeError:
+                break  # recording was cut off mid-line
+            kind = event.get('type')
+            if kind == "session":
+                header = event
+                current = (event.get('mode'), event.get('model'))
+            elif kind == "switch":
+                current = (event.get('mode'), event.get('model'))
+            elif kind == "audio":
+                audio[event['id']] = event
+            elif kind == "turn":
+                event['audio'] = audio.get(event.get('audio'))
+                event['speech'] = None
+                event['mode'], event['model'] = current
+                turns.append(event)
+            elif kind == "speech" and turns:
+                turns[-1]['speech'] = event
+    return header, turns
+
+
+class RecordedBackend:
+    """plays the recorded replies back in order instead of running a model. realtime=True keeps
+    the recorded timing (first chunk after ttft_s, the rest spread over the reply time)"""
+
+    def __init__(self, turns, realtime=False, model_name="recorded"):
+        self.queue = list(turns)
+        self.realtime = realtime
+        self.model_name = model_name
+        self.last_decode = None
+
+    def stream_response(self, prompt, conversation_history=None):
+        if not self.queue:
+            yield "(no recorded reply)"
+            return
+        turn = self.queue.pop(0)
+        ttft = turn.get('ttft_s') or 0.0
+        words = turn['response'].split(" ")
+        if self.realtime:
+            time.sleep(ttft)
+        yield words[0]
+        gap = max(0.0, turn['reply_s'] - ttft) / max(1, len(words) - 1)
+        for word in words[1:]:
+            if self.realtime:
+                time.sleep(gap)
+            yield " " + word
+        self.last_decode = dict(turn['decode']) if turn.get('decode') else None
+
+    def generate_response(self, prompt, conversation_history=None):
+        return "".join(self.stream_response(prompt, conversation_history))
+
+    def start_chat(self, **session_options):
+        return ChatSession(self, **session_options)
+
+
+class SessionReplayer:
+    """backend_factory(mode, model) -> a real backend, used for every model the session ran on
+    (the recorded replies are played back when there is none)"""
+
+    def __init__(self, path, backend_factory=None, stt=None, tts=None, realtime=False):
+        self.header, self.turns = load_session(path)
+        self.backend_factory = backend_factory
+        self.backend = RecordedBackend(self.turns, realtime=realtime)
+        self.stt = stt  # WhisperSTT: recorded mic audio is transcribed again instead of reusing the text
+        self.tts = tts
+        self.realtime = realtime
+        self.results = []
+
+    def replay(self):
+        self.results = []
+        session = self.backend.start_chat(history_turns=self.header.get('history_turns', 4))
+        previous_end = 0.0  # recorded time the previous turn (and its speech) finished
+        current = None
+        for turn in self.turns:
+            if self.backend_factory and (turn['mode'], turn['model']) != current:
+                current = (turn['mode'], turn['model'])
+                session.backend = self.backend_factory(*current)
+            if self.realtime:
+                # same pause the user took, measured from when the last reply was done
+                time.sleep(max(0.0, turn['t'] - previous_end))
+            result = {'prompt': turn['prompt']}
+
+            prompt = turn['prompt']
+            if self.stt and turn['audio']:
+                recording = turn['audio']
+                start = time.perf_counter()
+                prompt = self.stt.transcribe(decode_audio(recording['chunks']), recording['samplerate']) or prompt
+                result['transcribe_s'] = time.perf_counter() - start
+                result['transcript'] = prompt
+
+            start = time.perf_counter()
+            chunks, ttft = [], None
+            for chunk in session.stream_message(prompt):
+                if ttft is None:
+                    ttft = time.perf_counter() - start
+                chunks.append(chunk)
+            result['reply_s'] = time.perf_counter() - start
+            result['ttft_s'] = ttft
+            result['response'] = "".join(chunks)
+            result['decode'] = getattr(session.backend, "last_decode", None)
+
+            if self.tts and turn['speech']:
+                start = time.perf_counter()
+                self.tts.speak(result['response'])
+                result['speech_s'] = time.perf_counter() - start
+
+            self.results.append(result)
+            previous_end = (turn['speech'] or {}).get('t') or turn['t'] + turn['reply_s']
+        return self.results
+
+    def diff(self):
+        return latency_diff(self.turns, self.results)
+
+
+_COMPARED = (
+    ("ttft_s", lambda t: t.get('ttft_s')),
+    ("reply_s", lambda t: t.get('reply_s')),
+    ("transcribe_s", lambda t: (t.get('audio') or {}).get('transcribe_s')),
+    ("speech_s", lambda t: (t.get('speech') or {}).get('seconds')),
+)
+
+
+def latency_diff(recorded, replayed):
+    """per turn and overall (p50 / p95 / total) recorded vs replayed latency, in ms"""
+    rows = []
+    totals = {name: ([], []) for name, _ in _COMPARED}
+    for i, (before, after) in enumerate(zip(recorded, replayed)):
+        row = {'turn': i + 1, 'prompt': before['prompt'][:40], 'same_response': before['response'] == after.get('response')}
+        for name, pick in _COMPARED:
+            old, new = pick(before), after.get(name)
+            if old is None or new is None:
+                continue
+            row[name] = (old * 1000.0, new * 1000.0)
+            totals[name][0].append(old * 1000.0)
+            totals[name][1].append(new * 1000.0)
+        rows.append(row)
+
+    summary = {}
+    for name, (old, new) in totals.items():
+        if not old:
+            continue
+        summary[name] = {
+            'p50': (float(np.percentile(old, 50)), float(np.percentile(new, 50))),
+            'p95': (float(np.percentile(old, 95)), float(np.percentile(new, 95))),
+            'total': (sum(old), sum(new)),
+        }
+    return {'turns': rows, 'summary': summary}
+
+
+def format_diff(diff):
+    def cell(pair):
+        old, new = pair
+        change = f"{(new - old) / old * 100:+.0f}%" if old else "-"
+        return f"{old:9.1f} {new:9.1f} {change:>6}"
+
+    lines = [f"{'turn':<6}{'metric':<14}{'recorded':>9} {'replayed':>9} {'change':>6}"]
+    for row in diff['turns']:
+        for name, _ in _COMPARED:
+            if name in row:
+                lines.append(f"{row['turn']:<6}{name:<14}{cell(row[name])}")
+        if not row['same_response']:
+            lines.append(f"{row['turn']:<6}(reply differs from the recording)")
+    for name, stats in diff['summary'].items():
+        for stat, pair in stats.items():
+            lines.append(f"{stat:<6}{name:<14}{cell(pair)}")
+    return "\n".join(lines)
+
+
+def default_session_path(directory):
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, time.strftime("session-%Y%m%d-%H%M%S.jsonl"))
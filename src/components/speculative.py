@@ -0,0 +1,100 @@
+# src/components/speculative.py
+# Draft models for llama.cpp speculative decoding.
+# A cheap drafter guesses the next few tokens, the main model checks them all in one
+# batched eval and keeps the ones it agrees with, so the text is the same as normal
+# decoding but several tokens can come out per (slow) main-model step.
+#
+# Two kinds of drafter:
+#   "prompt_lookup"  - llama-cpp-python's n-gram lookup in the prompt, free, great when
+#                      answers quote the history/recalled notes
+#   "<file>.gguf"    - a small model with exactly the main model's vocabulary, special
+#                      tokens included (e.g. Llama-3.2-1B for Llama-3.1-8B). Checked at load:
+#                      TinyLlama looks close to Phi-3-mini (Llama-2 based) but stops at 32000,
+#                      and every Phi-3 prompt has <|user|>/<|assistant|>/<|end|> ids above that.
+#                      For Phi-3-mini use prompt_lookup
+import os
+
+import numpy as np
+
+
+class GGUFDraftModel:
+    """greedy drafter backed by a second, much smaller llama.cpp model"""
+
+    def __init__(self, model_path, num_pred_tokens=8, n_threads=4, n_ctx=4096, n_vocab=None):
+        from llama_cpp import Llama
+        self.num_pred_tokens = num_pred_tokens
+        self.llm = Llama(
+            model_path=model_path,
+            n_ctx=n_ctx,
+            n_threads=n_threads,
+            n_gpu_layers=0,
+            verbose=False,
+            use_mmap=True,
+        )
+        # token ids go straight from the main model into this one, llama.cpp rejects any it doesn't have
+        if n_vocab is not None and self.llm.n_vocab() != n_vocab:
+            found = self.llm.n_vocab()
+            close = getattr(self.llm, "close", None)
+            if close:
+                close()
+            raise ValueError(f"{os.path.basename(model_path)} has a {found}-token vocabulary, the main model "
+                             f"{n_vocab}. A draft model needs the same tokenizer (prompt_lookup works with any model)")
+        self.eos = self.llm.token_eos()
+
+    def __call__(self, input_ids, **kwargs):
+        # generate() reuses the longest cached prefix, so each call only evals the new tokens
+        draft = []
+        for token in self.llm.generate(list(input_ids), top_k=1, top_p=1.0, temp=0.0, reset=True):
+            if token == self.eos:
+                break
+            draft.append(token)
+            if len(draft) >= self.num_pred_tokens:
+                break
+        return np.array(draft, dtype=np.intc)
+
+
+class CountingDraftModel:
+    """wraps a drafter to count proposals, used for the acceptance-rate report"""
+
+    def __init__(self, inner, name):
+        self.inner = inner
+        self.name = name
+        self.calls = 0
+        self.proposed = 0
+
+    def __call__(self, input_ids, **kwargs):
+        draft = self.inner(input_ids, **kwargs)
+        self.calls += 1
+        self.proposed += len(draft)
+        return draft
+
+    def reset(self):
+        self.calls = 0
+        self.proposed = 0
+
+    def acceptance_rate(self, generated_tokens):
+        # each verify step emits (accepted drafts + 1) tokens and is followed by one draft call,
+        # so accepted ~= generated - calls (an estimate, llama-cpp-python doesn't expose it)
+        if not self.proposed:
+            return 0.0
+        accepted = max(0, generated_tokens - self.calls)
+        return min(1.0, accepted / self.proposed)
+
+
+def make_draft_model(draft, models_dir=None, num_pred_tokens=8, n_threads=4, n_ctx=4096, n_vocab=None):
+    """build the drafter named in a LOCAL_MODELS entry, None if speculative decoding is off.
+    n_vocab is the main model's, a GGUF drafter with another vocabulary raises ValueError"""
+    if not draft:
+        return None
+
+    if draft == "prompt_lookup":
+        from llama_cpp.llama_speculative import LlamaPromptLookupDecoding
+        inner = LlamaPromptLookupDecoding(num_pred_tokens=num_pred_tokens)
+    else:
+        path = draft if os.path.isabs(draft) or not models_dir else os.path.join(models_dir, draft)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"draft model not found: {path}")
+        inner = GGUFDraftModel(path, num_pred_tokens=num_pred_tokens, n_threads=n_threads, n_ctx=n_ctx,
+                               n_vocab=n_vocab)
+
+    return CountingDraftModel(inner, os.path.basename(draft))
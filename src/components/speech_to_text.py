@@ -1,20 +1,76 @@
+import time
+
 import whisper
 import sounddevice as sd
 import numpy as np
 
+from components.audio_frontend import AudioFrontEnd
+from components.metrics import metrics
+
+_transcriptions = metrics.counter("stt_transcriptions_total", "recordings transcribed")
+# transcribe time / audio length, above 1 whisper can't keep up with speech
+_real_time_factor = metrics.histogram(
+    "stt_real_time_factor", "whisper transcribe time per second of audio",
+    buckets=(0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 5.0),
+)
+
 class WhisperSTT:
-    def __init__(self, model_size="tiny"):
+    # samplerate=None records at the mic's own rate (many only do 44.1/48 kHz),
+    # the front end resamples to 16 kHz and cleans the audio up for whisper
+    def __init__(self, model_size="tiny", device=None, samplerate=None, denoise=True, agc=True):
         self.model = whisper.load_model(model_size)
+        self.device = device
+        self.samplerate = int(samplerate or sd.query_devices(device, 'input')['default_samplerate'])
+        self.denoise = denoise
+        self.agc = agc
+        self.recorder = None  # SessionRecorder, gets the raw mic audio so a session can be replayed
 
-    def record_and_transcribe(self, duration=5, samplerate=16000):
+    def record_and_transcribe(self, duration=5):
         print(f"Recording for {duration} seconds...")
-        audio = sd.rec(int(duration * samplerate), samplerate=samplerate, channels=1, dtype='float32')
-        sd.wait()
-        audio = np.squeeze(audio)
-        print("Transcribing...")
+        frontend = AudioFrontEnd(self.samplerate, denoise=self.denoise, agc=self.agc)
+        audio = np.zeros(int(duration * frontend.out_rate) + frontend.hop * 4, dtype=np.float32)
+        filled = 0
+        # the raw input too when recording the session, replay runs it through the front end again
+        raw = np.zeros(int(duration * self.samplerate) + frontend.frame * 4, dtype=np.float32) if self.recorder else None
+        raw_filled = 0
+
+        def callback(indata, frames, time_info, status):
+            # runs on the audio thread, each block is cleaned as it arrives
+            nonlocal filled, raw_filled
+            if raw is not None:
+                n = min(frames, len(raw) - raw_filled)
+                raw[raw_filled:raw_filled + n] = indata[:n, 0]
+                raw_filled += n
+            out = frontend.process(indata)
+            n = min(len(out), len(audio) - filled)
+            audio[filled:filled + n] = out[:n]
+            filled += n
+
+        with sd.InputStream(samplerate=self.samplerate, blocksize=frontend.frame, channels=1,
+                            dtype='float32', device=self.device, callback=callback):
+            sd.sleep(int(duration * 1000))
+
+        start = time.perf_counter()
+        text = self._transcribe(audio[:filled], frontend.out_rate)
+        if self.recorder:
+            self.recorder.audio(raw[:raw_filled], self.samplerate, text, time.perf_counter() - start)
+        return text
+
+    def transcribe(self, audio, samplerate):
+        """a finished recording at any rate (float32 mono), cleaned up the same way as live input"""
+        frontend = AudioFrontEnd(samplerate, denoise=self.denoise, agc=self.agc)
+        return self._transcribe(frontend.process_recording(audio), frontend.out_rate)
+
+    def _transcribe(self, audio, samplerate, announce=True):
+        if announce:
+            print("Transcribing...")
+        start = time.perf_counter()
         result = self.model.transcribe(audio, fp16=False)
+        _transcriptions.inc()
+        if len(audio):
+            _real_time_factor.observe((time.perf_counter() - start) / (len(audio) / samplerate))
         return result["text"].strip()
 
 # Example usage:
 # stt = WhisperSTT()
-# print(stt.record_and_transcribe())
\ No newline at end of file
+# print(stt.record_and_transcribe())
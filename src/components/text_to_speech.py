@@ -1,10 +1,28 @@
+import io
 import subprocess
 import platform
+import time
+import wave
+
+import numpy as np
+
+from components.metrics import metrics
+from components.tts_scheduler import SynthesisScheduler, split_sentences
+
+_utterances = metrics.counter("tts_utterances_total", "replies spoken")
+_failures = metrics.counter("tts_failures_total", "replies no TTS backend could speak")
+_synth_seconds = metrics.histogram("tts_synth_seconds", "time for the engine to render a reply to audio")
+_speak_seconds = metrics.histogram("tts_speak_seconds", "speak() call, synthesis through end of playback")
 
 class TextToSpeech:
     def __init__(self):
         self.backends = []
         self.ai_indicator = None  # will be set by main.py
+        self.audio_output = None  # AudioOutput, when set backends that can render PCM play through it
+        self.synthesis_workers = 1  # >1: long replies are rendered a few sentences at a time in parallel
+        self.parallel_min_chars = 160  # shorter replies are rendered in one go
+        self._scheduler = None
+        self._stops = 0  # bumped by stop() so a reply being spoken sentence by sentence gives up
         self._initialize_backends()
         print(f"TTS backends available: {[b['name'] for b in self.backends]}")
     
@@ -12,6 +30,66 @@ class TextToSpeech:
         """set the AI indicator for visual feedback"""
         self.ai_indicator = indicator
 
+    def set_audio_output(self, audio_output):
+        """route speech through an AudioOutput (volume, barge-in, level taps)"""
+        self.audio_output = audio_output
+        # read when scraped, so the audio callback never touches the metrics
+        metrics.gauge("tts_queued_seconds", "speech buffered in the audio output, not played yet",
+                      fn=lambda: audio_output.ring.available() / audio_output.samplerate)
+        metrics.gauge("audio_underruns", "audio output blocks that ran dry", fn=lambda: audio_output.underruns)
+
+    def set_synthesis_workers(self, workers):
+        """how many sentences of a long reply may be synthesized at once (engine processes)"""
+        workers = max(1, int(workers or 1))
+        if self._scheduler and self._scheduler.workers != workers:
+            self._scheduler.close()
+            self._scheduler = None
+        self.synthesis_workers = workers
+
+    def stop(self):
+        """cut off whatever is being said (only possible through the audio output)"""
+        self._stops += 1
+        if self.audio_output:
+            self.audio_output.stop()
+
+    def close(self):
+        if self._scheduler:
+            self._scheduler.close()
+            self._scheduler = None
+
+    def _decode_wav(self, wav_bytes):
+        # wav from a TTS engine -> (int16 samples, samplerate)
+        with wave.open(io.BytesIO(wav_bytes), 'rb') as wav:
+            pcm = np.frombuffer(wav.readframes(wav.getnframes()), dtype=np.int16)
+            if wav.getnchannels() > 1:
+                pcm = pcm.reshape(-1, wav.getnchannels())
+            return pcm, wav.getframerate()
+
+    def _play_wav(self, wav_bytes):
+        # returns once it has been played
+        pcm, samplerate = self._decode_wav(wav_bytes)
+        self.audio_output.play(pcm, samplerate=samplerate)
+        self.audio_output.wait()
+        return True
+
+    def _speak_parallel(self, name, text):
+        """render sentences on the worker pool, play them in order as they become ready"""
+        if self._scheduler is None:
+            self._scheduler = SynthesisScheduler(getattr(self, f"_render_{name}"), self.synthesis_workers)
+        stops = self._stops
+        played = False
+        for result in self._scheduler.synthesize(split_sentences(text)):
+            if self._stops != stops:
+                break  # barge-in, the rest is dropped
+            if result is None:
+                continue  # that sentence failed to render, keep going with the next
+            pcm, samplerate = result
+            self.audio_output.play(pcm, samplerate=samplerate)
+            played = True
+        if self._stops == stops:
+            self.audio_output.wait()
+        return played
+
     def _initialize_backends(self):
         """Initialize available TTS backends in order of preference"""
         
@@ -50,9 +128,6 @@ class TextToSpeech:
         if not text or not text.strip():
             return
         
-        if len(text) > 1000:
-            text = text[:1000] + " ...truncated"
-        
         if not self.backends:
             print(f"No TTS backends available. Text: {text}")
             return
@@ -62,17 +137,23 @@ class TextToSpeech:
             self.ai_indicator.set_speaking()
         
         # try each backend until one works
+        start = time.perf_counter()
         success = False
         for backend in self.backends:
             try:
-                if backend['name'] == 'windows_sapi':
-                    if self._speak_windows_sapi(text):
-                        success = True
-                        break
-                elif backend['name'] == 'espeak':
-                    if self._speak_espeak(text):
+                if self._can_speak_parallel(backend['name'], text):
+                    # long reply: sentence by sentence, nothing to truncate
+                    if self._speak_parallel(backend['name'], text):
                         success = True
                         break
+                    continue
+                if len(text) > 1000:
+                    text = text[:1000] + " ...truncated"
+                # each backend has a matching _speak_<name> method
+                speak_fn = getattr(self, f"_speak_{backend['name']}")
+                if speak_fn(text):
+                    success = True
+                    break
             except Exception as e:
                 print(f"TTS backend {backend['name']} failed: {e}")
                 continue
@@ -81,9 +162,18 @@ class TextToSpeech:
         if self.ai_indicator:
             self.ai_indicator.set_idle()
         
-        if not success:
+        if success:
+            _utterances.inc()
+            _speak_seconds.observe(time.perf_counter() - start)
+        else:
+            _failures.inc()
             print(f"All TTS backends failed. Text: {text}")
 
+    def _can_speak_parallel(self, name, text):
+        # backends with a _render_<name> (text -> pcm) can be split up, if we do the playing
+        return (self.synthesis_workers > 1 and self.audio_output is not None
+                and len(text) >= self.parallel_min_chars and hasattr(self, f"_render_{name}"))
+
     def _speak_windows_sapi(self, text):
         """Speak using Windows Speech API via PowerShell"""
         # escape quotes in text
@@ -101,8 +191,21 @@ class TextToSpeech:
         result = subprocess.run(cmd, capture_output=True, timeout=15)
         return result.returncode == 0
 
+    def _render_espeak(self, text):
+        """espeak to (int16 samples, samplerate) without playing it, one process per call"""
+        result = subprocess.run(['espeak', '--stdout', text], capture_output=True, timeout=10)
+        if result.returncode != 0:
+            raise RuntimeError(f"espeak exited with {result.returncode}")
+        return self._decode_wav(result.stdout)
+
     def _speak_espeak(self, text):
         """Speak using espeak"""
+        if self.audio_output:
+            # render to wav and play it ourselves instead of letting espeak open the device
+            start = time.perf_counter()
+            result = subprocess.run(['espeak', '--stdout', text], capture_output=True, timeout=10)
+            _synth_seconds.observe(time.perf_counter() - start)
+            return result.returncode == 0 and self._play_wav(result.stdout)
         cmd = ['espeak', text]
         result = subprocess.run(cmd, capture_output=True, timeout=10)
         return result.returncode == 0
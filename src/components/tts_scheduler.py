@@ -0,0 +1,144 @@
+# src/components/tts_scheduler.py
+# Speaks long replies without waiting for the whole thing to be synthesized. The reply is cut
+# into sentences and a bounded pool of workers renders them at the same time. Playback takes
+# them strictly in order.
+#
+# Each worker drives its own engine process (espeak --stdout), so with N workers N sentences
+# really do render on N cores while this process just waits on pipes. A worker always takes
+# the lowest sentence number still waiting, which is the one playback needs next. Only
+# `lookahead` sentences are handed out ahead of playback, so a ten-paragraph answer doesn't
+# render everything up front, and barge-in has less to throw away.
+import heapq
+import itertools
+import re
+import threading
+import time
+
+from components.metrics import metrics
+
+_sentence_seconds = metrics.histogram("tts_sentence_synth_seconds", "time for a worker to render one sentence")
+_waits = metrics.counter("tts_playback_waits_total", "sentences playback had to wait for (synthesis fell behind)")
+
+_SENTENCE_END = re.compile(r"(?<=[.!?…])[\"')\]]*\s+|\n\s*\n")
+_CLAUSE_END = re.compile(r"(?<=[,;:])\s+")
+
+
+def split_sentences(text, max_chars=240, min_chars=24):
+    """sentences to synthesize one by one. Very short ones are merged into the next (engines
+    have a fixed start-up cost), overly long ones are cut at commas, then at spaces"""
+    pieces = []
+    for sentence in _SENTENCE_END.split(text.strip()):
+        sentence = " ".join(sentence.split())
+        while len(sentence) > max_chars:
+            cut = max((m.end() for m in _CLAUSE_END.finditer(sentence, 0, max_chars)), default=0)
+            if cut < min_chars:
+                cut = sentence.rfind(" ", 0, max_chars) + 1 or max_chars
+            pieces.append(sentence[:cut].strip())
+            sentence = sentence[cut:].strip()
+        if sentence:
+            pieces.append(sentence)
+
+    merged = []
+    for piece in pieces:
+        # the first one stays short however small it is, it decides when speech starts
+        if merged and len(merged) > 1 and len(merged[-1]) < min_chars:
+            merged[-1] += " " + piece
+        else:
+            merged.append(piece)
+    return merged
+
+
+class _Job:
+    __slots__ = ("key", "text", "done", "result", "cancelled")
+
+    def __init__(self, key, text):
+        self.key = key
+        self.text = text
+        self.done = threading.Event()
+        self.result = None  # (pcm, samplerate), or None if rendering failed
+        self.cancelled = False
+
+    def __lt__(self, other):
+        return self.key < other.key
+
+
+class SynthesisScheduler:
+    """render(text) -> (pcm, samplerate) runs on `workers` threads. synthesize() hands the
+    results back in order, and cancel() drops whatever hasn't been rendered yet"""
+
+    def __init__(self, render, workers=2, lookahead=None):
+        self.render = render
+        self.workers = max(1, int(workers))
+        self.lookahead = lookahead or self.workers * 2  # sentences rendered ahead of playback
+        self._heap = []  # jobs waiting for a worker, lowest (utterance, sentence) first
+        self._cond = threading.Condition()
+        self._utterances = itertools.count()
+        self._threads = []
+        self._running = True
+        self.ready_ahead = 0  # rendered sentences waiting for playback (metrics gauge)
+        metrics.gauge("tts_sentences_ahead", "rendered sentences waiting to be played", fn=lambda: self.ready_ahead)
+
+    def _start(self):
+        while len(self._threads) < self.workers:
+            thread = threading.Thread(target=self._work, name=f"tts-synth-{len(self._threads)}", daemon=True)
+            self._threads.append(thread)
+            thread.start()
+
+    def _work(self):
+        while True:
+            with self._cond:
+                while self._running and not self._heap:
+                    self._cond.wait()
+                if not self._running:
+                    return
+                job = heapq.heappop(self._heap)
+            if job.cancelled:
+                job.done.set()
+                continue
+            start = time.perf_counter()
+            try:
+                job.result = self.render(job.text)
+            except Exception as e:
+                print(f"TTS synthesis failed for '{job.text[:40]}': {e}")
+            _sentence_seconds.observe(time.perf_counter() - start)
+            job.done.set()
+
+    def _submit(self, job):
+        with self._cond:
+            heapq.heappush(self._heap, job)
+            self._cond.notify()
+
+    def synthesize(self, sentences):
+        """yields (pcm, samplerate) per sentence in order (None for one that failed to render)"""
+        self._start()
+        utterance = next(self._utterances)
+        jobs = [_Job((utterance, i), text) for i, text in enumerate(sentences)]
+        for job in jobs[:self.lookahead]:
+            self._submit(job)
+        try:
+            for i, job in enumerate(jobs):
+                if not job.done.is_set():
+                    _waits.inc()
+                    job.done.wait()
+                if i + self.lookahead < len(jobs):
+                    self._submit(jobs[i + self.lookahead])
+                self.ready_ahead = sum(1 for j in jobs[i + 1:i + self.lookahead] if j.done.is_set())
+                yield job.result
+                job.result = None  # played, don't hold on to the samples
+        finally:
+            # finished, stopped (barge-in) or the consumer gave up: drop what is still queued
+            self.ready_ahead = 0
+            for job in jobs:
+                job.cancelled = True
+
+    def close(self):
+        with self._cond:
+            self._running = False
+            for job in self._heap:
+                job.cancelled = True
+                job.done.set()
+            self._heap.clear()
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
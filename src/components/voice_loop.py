@@ -0,0 +1,266 @@
+# src/components/voice_loop.py
+# One spoken turn: mic (or a WAV file) -> front end -> endpoint detection -> Whisper -> chat.
+#
+# Normally the model could only start once the user has clearly stopped talking (final_ms of
+# silence) and the final transcript is in. Here Whisper also runs on the audio so far: now and
+# then while the user talks, and repeatedly once a pause looks like the end (likely_ms of
+# silence). When two transcripts in a row agree, that partial counts as stable and the reply is
+# started from it in the background. When the final transcript arrives it is either the same
+# text, and the reply (often already a few tokens in) is kept, or it differs (the user kept
+# talking, or Whisper changed its mind). Then the speculative reply is cancelled and a new one
+# started. Speculative replies don't touch the history until they are kept.
+import queue
+import re
+import threading
+import time
+import wave
+
+import numpy as np
+
+from components.audio_frontend import AudioFrontEnd
+from components.metrics import metrics
+
+_wins = metrics.counter("speculation_wins_total", "speculative replies kept (final transcript matched)")
+_misses = metrics.counter("speculation_misses_total", "speculative replies thrown away")
+_saved_seconds = metrics.histogram("speculation_saved_seconds", "time to first token saved by a kept speculative reply")
+
+_WORDS = re.compile(r"[\w']+")
+
+
+def same_words(a, b):
+    """transcripts equal up to case and punctuation (whisper flips those between runs)"""
+    return _WORDS.findall((a or "").lower()) == _WORDS.findall((b or "").lower())
+
+
+def wav_frames(path, frame_ms=20):
+    """(samplerate, float32 mono frames of frame_ms) from a 16-bit WAV file"""
+    with wave.open(path, "rb") as wav:
+        rate, channels = wav.getframerate(), wav.getnchannels()
+        pcm = np.frombuffer(wav.readframes(wav.getnframes()), dtype=np.int16).astype(np.float32) / 32768.0
+    if channels > 1:
+        pcm = pcm.reshape(-1, channels).mean(axis=1)
+    step = int(round(rate * frame_ms / 1000.0))
+    return rate, [pcm[i:i + step] for i in range(0, len(pcm), step)]
+
+
+class EndpointDetector:
+    """speech / pause bookkeeping on 16 kHz frames: 'silence' (not started), 'speech',
+    'likely' (a pause long enough that the user may be done) and 'final'"""
+
+    def __init__(self, samplerate=16000, likely_ms=300, final_ms=800, threshold_rms=0.02, min_speech_ms=150):
+        self.samplerate = samplerate
+        self.likely = likely_ms / 1000.0
+        self.final = final_ms / 1000.0
+        self.threshold = threshold_rms
+        self.min_speech = min_speech_ms / 1000.0
+        self.speech_s = 0.0
+        self.silence_s = 0.0
+        self.state = "silence"
+
+    def feed(self, samples):
+        n = len(samples)
+        if not n:
+            return self.state
+        seconds = n / float(self.samplerate)
+        rms = float(np.sqrt(np.dot(samples, samples) / n))
+        if rms >= self.threshold:
+            self.speech_s += seconds
+            self.silence_s = 0.0
+            if self.speech_s >= self.min_speech:
+                self.state = "speech"
+        elif self.state != "silence":
+            self.silence_s += seconds
+            if self.silence_s >= self.final:
+                self.state = "final"
+            elif self.silence_s >= self.likely:
+                self.state = "likely"
+        return self.state
+
+
+class SpeculativeResponder:
+    """runs session.stream_message(prompt, record=False) in the background and either hands
+    its chunks over (the final transcript matched) or cancels it"""
+
+    def __init__(self, session):
+        self.session = session
+        self.stats = {'attempts': 0, 'wins': 0, 'misses': 0, 'saved_s': 0.0, 'wasted_s': 0.0}
+        self.prompt = None
+        self._thread = None
+
+    @property
+    def running(self):
+        return self.prompt is not None
+
+    def start(self, prompt):
+        self.cancel()
+        self.stats['attempts'] += 1
+        self.prompt = prompt
+        self._chunks = queue.Queue()
+        self._stop = threading.Event()
+        self._started = time.perf_counter()
+        self._first_at = None
+        self._raised = False
+        self._decode = getattr(self.session.backend, "last_decode", None)  # to tell this reply's apart
+        self._thread = threading.Thread(target=self._generate, args=(prompt, self._chunks, self._stop),
+                                         name="speculative-reply", daemon=True)
+        self._thread.start()
+
+    def _generate(self, prompt, chunks, stop):
+        replies = self.session.stream_message(prompt, record=False)
+        try:
+            for chunk in replies:
+                if stop.is_set():
+                    break
+                if self._first_at is None:
+                    self._first_at = time.perf_counter()
+                chunks.put(chunk)
+        except Exception as e:
+            self._raised = True
+            chunks.put(f"error: {e}")
+        finally:
+            replies.close()  # stops the decode (the worker drains and cancels)
+            chunks.put(None)
+
+    def cancel(self):
+        """the user kept talking or said something else, drop the speculative reply"""
+        if not self.running:
+            return
+        self._stop.set()
+        cancel = getattr(self.session.backend, "cancel", None)
+        if cancel:
+            cancel()  # don't wait for the next chunk to notice
+        self._thread.join()
+        self.stats['misses'] += 1
+        self.stats['wasted_s'] += time.perf_counter() - self._started
+        _misses.inc()
+        self.prompt = None
+
+    def finish(self, final):
+        """chunks of the reply to the final transcript, reusing the speculative one if it matches"""
+        final_at = time.perf_counter()
+        if not (self.running and same_words(self.prompt, final)):
+            self.cancel()
+            yield from self.session.stream_message(final)
+            return
+
+        self.stats['wins'] += 1
+        _wins.inc()
+        self.prompt = None
+        parts = []
+        try:
+            while True:
+                chunk = self._chunks.get()
+                if chunk is None:
+                    break
+                if not parts:
+                    # a normal start would have taken the whole time to first token after the endpoint
+                    saved = max(0.0, ((self._first_at or final_at) - self._started) - (time.perf_counter() - final_at))
+                    self.stats['saved_s'] += saved
+                    _saved_seconds.observe(saved)
+                parts.append(chunk)
+                yield chunk
+        finally:
+            self._stop.set()  # only matters if the caller stopped reading early
+            self._thread.join()
+        if self._raised:
+            return  # the reply blew up, like a failed stream_message nothing gets recorded
+        ttft = self._first_at - self._started if self._first_at else None
+        self.session.commit_turn(final, "".join(parts), self._started, ttft, self._decode)
+
+
+class VoiceLoop:
+    def __init__(self, stt, session, speculate=True, partial_every_ms=1000, recheck_ms=150,
+                 likely_ms=300, final_ms=800, max_seconds=15.0):
+        self.stt = stt  # WhisperSTT (its model, front end settings, device and recorder are used)
+        self.session = session
+        self.speculate = speculate
+        self.partial_every = partial_every_ms / 1000.0
+        self.recheck = recheck_ms / 1000.0
+        self.likely_ms = likely_ms
+        self.final_ms = final_ms
+        self.max_seconds = max_seconds
+        self.responder = SpeculativeResponder(session)
+        self.last_turn = {}
+
+    def _partial(self, audio):
+        return self.stt._transcribe(audio, 16000, announce=False)
+
+    def listen(self, frames, in_rate, realtime=False):
+        """consume input frames until the user is done, returns (transcript, reply chunks).
+        realtime=True paces frames like a live mic (for WAV input)"""
+        frontend = AudioFrontEnd(in_rate, denoise=self.stt.denoise, agc=self.stt.agc)
+        detector = EndpointDetector(frontend.out_rate, self.likely_ms, self.final_ms)
+        audio = np.zeros(int(self.max_seconds * frontend.out_rate) + frontend.hop * 4, dtype=np.float32)
+        filled = 0
+        raw = [] if self.stt.recorder else None
+        previous = None  # last partial transcript
+        checked_at = 0.0  # audio position (s) of the last partial
+        clock = time.perf_counter()
+        state = "silence"
+
+        for frame in frames:
+            if realtime:
+                clock += len(frame) / float(in_rate)
+                time.sleep(max(0.0, clock - time.perf_counter()))
+            if raw is not None:
+                raw.append(np.array(frame, dtype=np.float32).reshape(-1))
+            out = frontend.process(frame)
+            n = min(len(out), len(audio) - filled)
+            audio[filled:filled + n] = out[:n]
+            filled += n
+            was, state = state, detector.feed(out[:n])
+            position = filled / float(frontend.out_rate)
+
+            if state == "speech" and was == "likely":
+                self.responder.cancel()  # it wasn't the end after all
+            if state == "final" or n < len(out) or filled >= len(audio):
+                break
+            if not self.speculate or state == "silence":
+                continue
+            due = self.recheck if state == "likely" else self.partial_every
+            if position - checked_at < due:
+                continue
+            partial = self._partial(audio[:filled])
+            checked_at = position
+            if state == "likely" and partial and same_words(partial, previous) and not self.responder.running:
+                self.responder.start(partial)
+            previous = partial
+
+        endpoint_at = time.perf_counter()
+        final = self.stt._transcribe(audio[:filled], frontend.out_rate)
+        self.last_turn = {'endpoint_at': endpoint_at, 'transcript': final, 'speculated': self.responder.running}
+        if not final:
+            self.responder.cancel()
+            return final, iter(())
+        # only recordings that become a turn, an empty one would get attached to the next typed prompt
+        if self.stt.recorder and raw:
+            self.stt.recorder.audio(np.concatenate(raw), in_rate, final, time.perf_counter() - endpoint_at)
+        return final, self.responder.finish(final)
+
+    def listen_mic(self):
+        """one turn from the microphone"""
+        import sounddevice as sd
+        frames = queue.Queue()
+        frame = int(round(self.stt.samplerate * 0.02))
+
+        def callback(indata, n, time_info, status):
+            frames.put(indata[:, 0].copy())
+
+        def incoming():
+            deadline = time.monotonic() + self.max_seconds
+            while time.monotonic() < deadline:
+                try:
+                    yield frames.get(timeout=0.5)
+                except queue.Empty:
+                    return
+
+        with sd.InputStream(samplerate=self.stt.samplerate, blocksize=frame, channels=1, dtype='float32',
+                            device=self.stt.device, callback=callback):
+            print("Listening...")
+            transcript, replies = self.listen(incoming(), self.stt.samplerate)
+        return transcript, replies
+
+    def report(self):
+        stats = dict(self.responder.stats)
+        stats['win_rate'] = stats['wins'] / stats['attempts'] if stats['attempts'] else 0.0
+        return stats
@@ -4,14 +4,25 @@
 MODE = "local"  # or "remote" # Run locally or remotely
 
 MODELS_DIR = None # "C:\Users\jacks\models" # None # Will be set at runtime by setup() funciton in main.py
+USER_CONFIG_PATH = None  # user_config.json, set at runtime by main.py (also holds calibrate.py results)
 
 # WIP @ToDo
 # Dictionary of available local models
 # Key -> model name
 # Val -> model path (relative to MODELS_DIR) name only
+#        or a dict: {"file": <model path>, ...options}
+#          draft        - speculative decoding drafter: "prompt_lookup" or a small GGUF with the
+#                         same vocabulary, special tokens included (checked at load, see
+#                         components/speculative.py; TinyLlama does NOT match Phi-3-mini)
+#          draft_tokens - tokens proposed per draft (default 8)
 LOCAL_MODELS = {
     "testLocal": "",
-    "phi3-mini": "Phi-3-mini-4k-instruct-q4.gguf"  # RECOMMENDED for K-2SO (LOCAL imported Model)
+    "phi3-mini": "Phi-3-mini-4k-instruct-q4.gguf",  # RECOMMENDED for K-2SO (LOCAL imported Model)
+    "phi3-mini-speculative": {
+        "file": "Phi-3-mini-4k-instruct-q4.gguf",
+        "draft": "prompt_lookup",  # a GGUF drafter would need Phi-3's exact 32064-token vocab
+        "draft_tokens": 8,
+    },
 }
 
 # WIP @ToDo
@@ -20,6 +31,7 @@ LOCAL_MODELS = {
 # Val -> url & api_key_env
 #       url - API endpoint where user input is sent (via an HTTP POST or GET request) and received
 #       api_key_env - Environment variable name for the API key in the .env file
+#       max_concurrency - (optional) requests in flight to this server at once, default REMOTE_MAX_CONCURRENCY
 REMOTE_MODELS = {
     "testRemote": {
         "url": "http://192.168.1.10:8000/chat",
@@ -39,13 +51,97 @@ REMOTE_MODELS = {
     }
 }
 
+# /compare <prompt> asks these models at the same time (components/fan_out.py) and prints the
+# answers side by side. Empty -> every remote model
+COMPARE_MODELS = ["tinyllama", "deepseek"]
+REMOTE_MAX_CONCURRENCY = 4  # per server, for fan-out batches
+
 # Set which model to use
 SELECTED_MODEL = "testLocal"
 
+# Persona sent at the start of every prompt. Local models evaluate it once and keep the result
+# on disk (components/prompt_cache.py), so it costs nothing after the first start.
+SYSTEM_PROMPT = (
+    "You are K-2SO, a reprogrammed Imperial security droid. You are blunt, dry and loyal, "
+    "and you like to quote the odds. Answer in one to three short sentences. "
+    "If you don't know something, say so instead of making it up."
+)
+PROMPT_CACHE_DIR = None  # None -> prompt_cache/ in MODELS_DIR; snapshots are replaced when the model, persona or n_ctx change
+
+# Models kept loaded at once (switch with /model <name> in the chat, see components/model_manager.py)
+MODEL_RAM_BUDGET_MB = None  # None -> 60% of total RAM; least recently used models are unloaded past this
+
+# Run local models in a separate process (components/inference_worker.py) so generation
+# doesn't make the indicator animation and audio stutter. A crashed worker is restarted.
+INFERENCE_WORKER = False
+INFERENCE_WORKER_CPUS = None  # e.g. [1, 2, 3]; None -> every core but the first
+
+# Memory budget (components/memory_budget.py). Before a local model loads, its context size,
+# KV cache type and mlock (and the Whisper size) are chosen so everything fits in the budget;
+# a watchdog warns and unloads idle models if the process gets close anyway. /memory shows
+# where the memory went.
+RUNTIME_PROFILE = "auto"  # "low_memory", "default", or "auto" -> low_memory on machines with <= 4 GB
+MEMORY_BUDGET_MB = None  # None -> 85% of total RAM
+MEMORY_WATCHDOG_INTERVAL = 5.0  # seconds between RSS/swap checks, 0 turns the watchdog off
+MEMORY_SWAP_PAGES_PER_S = 256  # swap-out rate (4 KB pages/s) that counts as pressure, only when memory is tight too
+MEMORY_PRESSURE_COOLDOWN = 30.0  # seconds after freeing memory before the watchdog acts again
+
+# Structured commands (components/commands.py): "/do <request>" asks the model for one command
+# (set the volume, switch model, search history...) as grammar-constrained JSON instead of prose
+COMMANDS_ENABLED = True
+COMMAND_MAX_TOKENS = 64  # the JSON is cut off at its closing brace long before this
+
+# Speech-to-text (components/speech_to_text.py), spoken turns with /listen
+STT_ENABLED = False  # counted in the memory budget when True
+WHISPER_MODEL_SIZE = "base"  # tiny / base / small / medium, the memory plan may pick a smaller one
+
+# Voice turns (components/voice_loop.py), /listen in the chat loop when STT_ENABLED. The turn ends
+# after ENDPOINT_FINAL_MS of silence; with SPECULATIVE_START the reply already starts at
+# ENDPOINT_LIKELY_MS if the partial transcript has stopped changing, and is thrown away if the
+# final transcript turns out different
+SPECULATIVE_START = True
+ENDPOINT_LIKELY_MS = 300
+ENDPOINT_FINAL_MS = 800
+LISTEN_MAX_SECONDS = 15.0
+
 # Set whether to use text-to-speech
 TTS_ENABLED = True  # set to False to disable text-to-speech
 
+# Audio output (components/audio_output.py): speech is rendered to PCM and played through one
+# long-lived sounddevice stream instead of letting the TTS engine open the sound card itself
+AUDIO_OUTPUT_ENABLED = True  # without sounddevice/PortAudio the TTS engines play directly like before
+AUDIO_OUTPUT_DEVICE = None  # None -> default device, a sounddevice name/index, or "null" for no sound
+AUDIO_SAMPLE_RATE = 22050  # espeak's native rate, other rates are resampled
+AUDIO_BLOCKSIZE = 256  # frames per callback, smaller = lower latency but more underrun risk
+AUDIO_VOLUME = 1.0
+TTS_SYNTH_WORKERS = None  # TTS engine processes rendering sentences of a long reply at once, None -> cores - 1 (max 4)
+
 # Set whether to show visual AI indicator
 GUI_ENABLED = True  # set to False to disable visual indicator GUI
 GUI_FULLSCREEN = False  # set to True for fullscreen Jarvis-style display
 GUI_ANIMATION_MODE = "ripples"  # "ripples" for water-like, "frequency" for audio-style
+GUI_RENDERER = "atlas"  # "atlas" draws precomputed frames (light on a Pi), "classic" recomputes every frame
+
+# Chat history (SQLite, see components/chat_log.py)
+CHAT_LOG_ENABLED = True  # set to False to stop saving conversations
+CHAT_LOG_PATH = None  # None -> chat_log.db in the working directory (next to user_config.json)
+CHAT_HISTORY_TURNS = 4  # previous turns sent with each prompt (and reloaded at startup)
+IDLE_PREFILL = True  # evaluate history into the model's cache while you type, so replies start sooner
+
+# Long-term memory (embeds past chat log turns, see components/semantic_memory.py)
+MEMORY_ENABLED = True  # needs CHAT_LOG_ENABLED
+MEMORY_DIR = None  # None -> memory/ in the working directory
+MEMORY_EMBED_MODEL = "all-MiniLM-L6-v2"  # sentence-transformers model, falls back to a hashing embedder
+MEMORY_TOP_K = 3  # past turns recalled per prompt
+MEMORY_TOKEN_BUDGET = 256  # max prompt tokens spent on recalled turns
+MEMORY_IVF_THRESHOLD = 100000  # switch from brute-force scan to an IVF index past this many turns
+
+# Metrics (components/metrics.py): live counters for turns, tokens/s, TTFT, remote errors, TTS/STT
+METRICS_ENABLED = True
+METRICS_PORT = 9464  # Prometheus text at http://127.0.0.1:9464/metrics, None for no HTTP endpoint
+METRICS_SNAPSHOT_PATH = None  # e.g. "metrics.json", rewritten every METRICS_SNAPSHOT_INTERVAL seconds
+METRICS_SNAPSHOT_INTERVAL = 30.0
+
+# Session recording (components/session_replay.py): saves prompts, mic audio and timings of each
+# run so a slow conversation can be replayed later with `python src/replay.py <file>`
+SESSION_RECORD_DIR = None  # e.g. "sessions", one .jsonl file per run
@@ -3,6 +3,8 @@ import platform
 import sys
 import os
 import json 
+import time
+import gc
 
 # MUST LOAD ENV VARS FIRST
 from dotenv import load_dotenv
@@ -11,9 +13,22 @@ load_dotenv()  # required for reading API keys and config from .env
 
 # Project Modules
 import config
-from router import get_backend
+from router import get_backend, estimate_backend_mb
 from components.text_to_speech import tts
 from components.ai_indicator import AIIndicator
+from components.audio_output import AudioOutput
+from components.chat_log import ChatLog
+from components.semantic_memory import LongTermMemory, load_embedder
+from components.autotune import read_user_config, write_user_config
+from components.model_registry import ModelRegistry, describe
+from components.model_manager import ModelManager
+from components.autotune import total_ram_mb
+from components.memory_budget import profile as memory_profile, default_budget_mb, is_low_memory
+from components.metrics import metrics, MetricsServer, SnapshotWriter
+from components.session_replay import SessionRecorder, default_session_path
+from components.voice_loop import VoiceLoop
+from components.commands import CommandDispatcher, default_commands, request_command
+from components.fan_out import ask_all, close_client
 
 # User config file
 CONFIG_PATH = os.path.join(os.getcwd(), "user_config.json") # remembers users choice for future runs so setup is not repeated every time
@@ -30,27 +45,56 @@ def run_setup():
     print(f"Platform: {platform.system()} {platform.machine()}")
     
     # Load or prompt for models directory, saving choice to user_config.json for future runs
+    config.USER_CONFIG_PATH = CONFIG_PATH
     models_dir = load_models_dir()  # Load the models directory from the config file user_config.json
     if not models_dir: # if the models directory is not set, select it
         models_dir = select_models_dir()
         save_models_dir(models_dir)
     config.MODELS_DIR = models_dir
 
+    # everything that gets loaded from here on is planned/measured against this
+    memory_profile.budget_mb = config.MEMORY_BUDGET_MB or default_budget_mb()
+    memory_profile.swap_pages_per_s = config.MEMORY_SWAP_PAGES_PER_S
+    memory_profile.cooldown_s = config.MEMORY_PRESSURE_COOLDOWN
+    profile_name = "low-memory" if is_low_memory(config.RUNTIME_PROFILE) else "default"
+    print(f"Memory budget: {memory_profile.budget_mb} MB ({profile_name} profile)")
+
     print("Setup complete\n")
     
     # create and start AI indicator GUI if enabled
     global ai_indicator
     if config.GUI_ENABLED:
         print("Starting AI indicator...")
-        ai_indicator = AIIndicator(
-            fullscreen=config.GUI_FULLSCREEN,
-            animation_mode=config.GUI_ANIMATION_MODE
-        )
-        ai_indicator.start_gui()
+        with memory_profile.track("gui"):
+            ai_indicator = AIIndicator(
+                fullscreen=config.GUI_FULLSCREEN,
+                animation_mode=config.GUI_ANIMATION_MODE,
+                renderer=config.GUI_RENDERER,
+            )
+            ai_indicator.start_gui()
         
         # connect TTS to AI indicator for visual feedback
         tts.set_ai_indicator(ai_indicator)
 
+    # speech plays through one stream the app controls (volume, stop, levels for the indicator)
+    if config.TTS_ENABLED and config.AUDIO_OUTPUT_ENABLED:
+        audio_output = AudioOutput(
+            samplerate=config.AUDIO_SAMPLE_RATE,
+            blocksize=config.AUDIO_BLOCKSIZE,
+            device=config.AUDIO_OUTPUT_DEVICE,
+            volume=config.AUDIO_VOLUME,
+        )
+        try:
+            with memory_profile.track("audio"):
+                audio_output.start()
+            if ai_indicator:
+                audio_output.level_taps.append(ai_indicator.set_audio_level)
+            tts.set_audio_output(audio_output)
+            # long replies: several sentences rendered at once on the spare cores
+            tts.set_synthesis_workers(config.TTS_SYNTH_WORKERS or max(1, min(4, (os.cpu_count() or 1) - 1)))
+        except Exception as e:
+            print(f"Audio output disabled, TTS engines play directly: {e}")
+
 # FIRST - HELPER A
 def load_models_dir():
     if os.path.exists(CONFIG_PATH):
@@ -80,9 +124,11 @@ def select_models_dir():
     return models_dir
 
 # FIRST - HELPER C
+# keep whatever else is in the file (e.g. llama_tuning from calibrate.py)
 def save_models_dir(models_dir):
-    with open(CONFIG_PATH, "w") as f:
-        json.dump({"models_dir": models_dir}, f)
+    data = read_user_config(CONFIG_PATH)
+    data["models_dir"] = models_dir
+    write_user_config(CONFIG_PATH, data)
 
 # SECOND
 # Ask the user whether they want to run locally or connect remotely
@@ -106,12 +152,19 @@ def select_mode():
 # THIRD
 # Show available models based on the selected mode
 def select_model(mode):
+    infos = discover_local_models() if mode == "local" else {}
     models = config.LOCAL_MODELS if mode == "local" else config.REMOTE_MODELS
     model_keys = list(models.keys())
 
     print("\nAvailable models:")
     for idx, name in enumerate(model_keys, start=1):
-        print(f"{idx}. {name}")
+        if mode == "local":
+            entry = models[name]
+            filename = entry["file"] if isinstance(entry, dict) else entry
+            details = describe(infos.get(filename)) if filename else "ollama"
+            print(f"{idx}. {name}  ({details or 'not found'})")
+        else:
+            print(f"{idx}. {name}")
 
     while True:
         selection = input("Select a model by number: ").strip()
@@ -120,24 +173,84 @@ def select_model(mode):
         else:
             print("Invalid choice. Try again.\n")
 
+# any GGUF dropped into the models folder shows up in the menu without editing config.py
+# (header metadata is cached in model_index.json so this stays fast with big files)
+def discover_local_models():
+    infos = ModelRegistry(config.MODELS_DIR).scan()
+    known = {entry["file"] if isinstance(entry, dict) else entry for entry in config.LOCAL_MODELS.values()}
+    for filename in sorted(infos):
+        if filename not in known:
+            config.LOCAL_MODELS.setdefault(os.path.splitext(filename)[0], filename)
+    return infos
+
 # TODO: Add voice input later
-# TODO: Add chat history later
 # TODO: Add error handling later
 # TODO: Add GUI later
 # FOURTH
 # Start the chat session using the model backend object
-def run_chat_session(model_backend_obj):
+def run_chat_session(model_backend_obj, model_manager=None, recorder=None):
     # We don't call .run() directly since the model backend should expose methods
     # for chat interaction rather than a generic run command
+    chat_log = open_chat_log()
+    memory = open_memory(chat_log)
+    exporters = start_metrics()
+    chat_session = None
+    voice_loop = None
     try:
-        chat_session = model_backend_obj.start_chat()
+        chat_session = model_backend_obj.start_chat(
+            chat_log=chat_log,
+            history_turns=config.CHAT_HISTORY_TURNS,
+            memory=memory,
+            recorder=recorder,
+        )
+        if model_manager:
+            # the model the chat is using stays, the others can go
+            memory_profile.pressure_callbacks.append(lambda reason: relieve_memory_pressure(model_manager, chat_session))
+        commands = open_commands(model_manager, chat_session, chat_log) if config.COMMANDS_ENABLED else None
         while True:
+            # model gets the known part of the next prompt ready while the user types
+            if config.IDLE_PREFILL:
+                chat_session.prefill()
+
             # TODO: Add voice input later
             # Text input for now
             user_input = input("\nYou: ").strip()
             if user_input.lower() in ['quit', 'exit']:
                 break
+
+            # /search <words> looks through past conversations instead of asking the model
+            if user_input.lower().startswith("/search"):
+                print_search_results(chat_log, user_input[len("/search"):].strip())
+                continue
+
+            # /model lists loaded models, /model <name> switches (history, log and memory carry over)
+            if user_input.lower().startswith("/model"):
+                switch_model(model_manager, chat_session, user_input[len("/model"):].strip())
+                continue
+
+            # /compare <prompt> asks several models at once and shows their answers side by side
+            if user_input.lower().startswith("/compare"):
+                compare_models(model_manager, chat_session, user_input[len("/compare"):].strip())
+                continue
+
+            # /memory shows where the RAM went
+            if user_input.lower() == "/memory":
+                print_memory_report(model_manager)
+                continue
             
+            # /do <request> asks for a structured command instead of a reply ("turn it down to 30")
+            if commands and user_input.lower().startswith("/do "):
+                if run_command(chat_session, commands, user_input[len("/do "):].strip()):
+                    continue
+                user_input = user_input[len("/do "):].strip()  # not a command after all, just answer it
+
+            # /listen takes the next turn from the mic (STT_ENABLED)
+            if user_input.lower() == "/listen":
+                voice_loop = voice_loop or open_voice_loop(chat_session, recorder)
+                if voice_loop:
+                    reply_to_voice(voice_loop, recorder)
+                continue
+
             # show processing state
             if config.GUI_ENABLED and ai_indicator:
                 ai_indicator.set_processing()
@@ -152,10 +265,12 @@ def run_chat_session(model_backend_obj):
             # Print response
             print(f"\nAssistant: {response}")
             if config.TTS_ENABLED: # TODO: Add command line arg for user text to speech...
+                speak_start = time.perf_counter()
                 tts.speak(response)
+                if recorder:
+                    recorder.speech(response, time.perf_counter() - speak_start)
 
             # TODO: Add voice output later
-            # TODO: Add chat history later
     
     # TODO: Add more specific error handling later
     # Exception handling for chat session errors
@@ -163,7 +278,300 @@ def run_chat_session(model_backend_obj):
     except Exception as e:
         print(f"Error during chat session: {e}")
         sys.exit(1)
+    finally:
+        memory_profile.stop_watchdog()
+        for exporter in exporters:
+            exporter.close()
+        if recorder:
+            recorder.close()
+            print(f"Session recorded to {recorder.path}")
+        if chat_session:
+            chat_session.cancel_prefill()
+        if memory:
+            memory.close()
+        if chat_log:
+            chat_log.close()  # flush any turns still queued
+        close_client()  # the /compare http client, if one was opened
+        if model_manager:
+            model_manager.close()
+        tts.close()
+        if tts.audio_output:
+            tts.audio_output.close()
+
+# FOURTH - HELPER A
+def open_chat_log():
+    if not config.CHAT_LOG_ENABLED:
+        return None
+    path = config.CHAT_LOG_PATH or os.path.join(os.getcwd(), "chat_log.db")
+    try:
+        chat_log = ChatLog(path)
+        print(f"Chat log: {path} ({chat_log.count()} turns)")
+        return chat_log
+    except Exception as e:
+        print(f"Chat log disabled: {e}")
+        return None
+
+# FOURTH - HELPER B
+def open_memory(chat_log):
+    if not (config.MEMORY_ENABLED and chat_log):
+        return None
+    path = config.MEMORY_DIR or os.path.join(os.getcwd(), "memory")
+    try:
+        with memory_profile.track("memory index"):
+            memory = LongTermMemory(
+                chat_log, path,
+                embedder=load_embedder(config.MEMORY_EMBED_MODEL),
+                top_k=config.MEMORY_TOP_K,
+                token_budget=config.MEMORY_TOKEN_BUDGET,
+                ivf_threshold=config.MEMORY_IVF_THRESHOLD,
+            )
+        memory.start()  # indexes new chat log turns in the background
+        print(f"Long-term memory: {path} ({memory.embedder.name})")
+        return memory
+    except Exception as e:
+        print(f"Long-term memory disabled: {e}")
+        return None
+
+# FOURTH - HELPER C
+def print_search_results(chat_log, query):
+    if not chat_log:
+        print("Chat log is disabled.")
+        return
+    if not query:
+        print("Usage: /search <words>")
+        return
+    results = chat_log.search(query)
+    if not results:
+        print(f"No past turns match '{query}'.")
+        return
+    for turn in results:
+        when = time.strftime("%Y-%m-%d %H:%M", time.localtime(turn['created']))
+        print(f"\n[{when}] You: {turn['user']}")
+        print(f"  Assistant: {turn['assistant']}")
+
+# FOURTH - HELPER D
+def open_model_manager():
+    budget = config.MODEL_RAM_BUDGET_MB or int(total_ram_mb() * 0.6) or 4096
+    model_manager = ModelManager(get_backend, budget, size_hint=estimate_backend_mb)
+
+    # inference worker processes count towards the budget too
+    memory_profile.child_sources.append(lambda: {
+        f"worker {name}": backend.process.pid
+        for (mode, name), backend in list(model_manager.resident.items())
+        if getattr(backend, 'process', None) is not None
+    })
+    if config.MEMORY_WATCHDOG_INTERVAL:
+        memory_profile.start_watchdog(config.MEMORY_WATCHDOG_INTERVAL)
+    return model_manager
+
+# FOURTH - HELPER E
+def switch_model(model_manager, chat_session, name):
+    if not model_manager:
+        print("Model switching is not available.")
+        return
+    if not name:
+        for row in model_manager.report():
+            state = "loaded" if row['resident'] else "unloaded"
+            print(f"  {row['name']:<24} {row['mode']:<6} {state:<8} ~{row['resident_mb']} MB  "
+                  f"load {row['load_seconds']:.2f}s  hit rate {row['hit_rate']:.0%}")
+        print(f"  {model_manager.used_mb()}/{model_manager.ram_budget_mb} MB in use. Usage: /model <name>")
+        return
+    if name in config.LOCAL_MODELS:
+        mode = "local"
+    elif name in config.REMOTE_MODELS:
+        mode = "remote"
+    else:
+        print(f"Unknown model '{name}'. Available: {', '.join(list(config.LOCAL_MODELS) + list(config.REMOTE_MODELS))}")
+        return
+    chat_session.cancel_prefill()  # don't swap the model out from under a running prefill
+    chat_session.backend = load_model(model_manager, mode, name)
+    if chat_session.recorder:
+        chat_session.recorder.switch(mode, name, chat_session.backend)
+    print(f"Switched to {name}.")
+
+# FOURTH - HELPER F
+def print_memory_report(model_manager):
+    report = memory_profile.report()
+    system = report['system']
+    print(f"  process: {report['rss_mb']} MB resident (peak {report['peak_mb']} MB), budget {report['budget_mb']} MB")
+    for name, mb in report['children_mb'].items():
+        print(f"  {name}: {mb} MB resident")
+    if system['total']:
+        print(f"  system: {system['available']}/{system['total']} MB available, {system['swap_used']} MB swap used")
+    if report['components']:
+        print("  loaded (RSS growth while loading):")
+        for name, mb in report['components'].items():
+            print(f"    {name:<24} {mb:>6} MB")
+    if report['mapped']:
+        print("  mapped files (resident part):")
+        for path, mb in list(report['mapped'].items())[:8]:
+            print(f"    {mb:>6} MB  {path}")
+    for name, plan in report['plans'].items():
+        estimates = ", ".join(f"{part} {mb}" for part, mb in plan['estimates'].items())
+        llama = plan['llama_params']
+        print(f"  plan for {name}: n_ctx {llama['n_ctx']}, kv {plan['kv_type']}, mlock {'on' if plan['use_mlock'] else 'off'}"
+              f" - estimated {plan['total_mb']} MB ({estimates})")
+    if model_manager:
+        print(f"  models: {model_manager.used_mb()}/{model_manager.ram_budget_mb} MB (/model for details)")
+    print(f"  warnings: {report['warnings']}, pressure events: {report['pressure_events']}")
+
+# FOURTH - HELPER G
+# called by the memory watchdog before the system starts swapping
+def relieve_memory_pressure(model_manager, chat_session):
+    unloaded = model_manager.unload_idle(keep=model_manager.key_of(chat_session.backend))
+    gc.collect()
+    if unloaded:
+        print(f"unloaded {unloaded} idle model(s)")
+
+# FOURTH - HELPER H
+# load through the manager, recording what the model cost in /memory
+def load_model(model_manager, mode, name, keep=()):
+    with memory_profile.track(f"model {name}"):
+        return model_manager.get(mode, name, keep=keep)
+
+
+# FOURTH - HELPER I
+def start_metrics():
+    # a /metrics endpoint to scrape and/or a json file that is rewritten every few seconds
+    exporters = []
+    if not config.METRICS_ENABLED:
+        return exporters
+    metrics.gauge("memory_rss_mb", "resident memory of the assistant and its workers", fn=memory_profile.total_rss_mb)
+    if config.METRICS_PORT:
+        try:
+            server = MetricsServer(metrics, port=config.METRICS_PORT).start()
+            exporters.append(server)
+            print(f"Metrics at {server.url}")
+        except OSError as e:
+            print(f"Metrics endpoint not started (port {config.METRICS_PORT}): {e}")
+    if config.METRICS_SNAPSHOT_PATH:
+        exporters.append(SnapshotWriter(metrics, config.METRICS_SNAPSHOT_PATH, config.METRICS_SNAPSHOT_INTERVAL).start())
+    return exporters
+
+# FOURTH - HELPER J
+def open_session_recorder(mode, name, backend):
+    # everything needed to replay this run later (python src/replay.py <file>)
+    if not config.SESSION_RECORD_DIR:
+        return None
+    try:
+        return SessionRecorder(default_session_path(config.SESSION_RECORD_DIR), mode=mode, model=name,
+                               backend=backend, history_turns=config.CHAT_HISTORY_TURNS)
+    except OSError as e:
+        print(f"Session recording off: {e}")
+        return None
+
+# FOURTH - HELPER K
+def open_voice_loop(chat_session, recorder):
+    if not config.STT_ENABLED:
+        print("Voice input is off (STT_ENABLED in config.py)")
+        return None
+    try:
+        from components.speech_to_text import WhisperSTT
+        with memory_profile.track(f"whisper {config.WHISPER_MODEL_SIZE}"):
+            stt = WhisperSTT(config.WHISPER_MODEL_SIZE)
+    except Exception as e:
+        print(f"Voice input unavailable: {e}")
+        return None
+    stt.recorder = recorder
+    return VoiceLoop(stt, chat_session, speculate=config.SPECULATIVE_START, likely_ms=config.ENDPOINT_LIKELY_MS,
+                     final_ms=config.ENDPOINT_FINAL_MS, max_seconds=config.LISTEN_MAX_SECONDS)
+
+# FOURTH - HELPER L
+def reply_to_voice(voice_loop, recorder):
+    # the reply may already be under way (speculative start), it streams in the same way either way
+    try:
+        transcript, replies = voice_loop.listen_mic()
+    except Exception as e:
+        print(f"Listening failed: {e}")
+        return
+    if not transcript:
+        print("Didn't catch that.")
+        return
+    print(f"\nYou (voice): {transcript}")
+    if config.GUI_ENABLED and ai_indicator:
+        ai_indicator.set_processing()
+    response = "".join(replies)
+    if config.GUI_ENABLED and ai_indicator:
+        ai_indicator.set_idle()
+    print(f"\nAssistant: {response}")
+    if config.TTS_ENABLED:
+        speak_start = time.perf_counter()
+        tts.speak(response)
+        if recorder:
+            recorder.speech(response, time.perf_counter() - speak_start)
+
+# FOURTH - HELPER M
+def open_commands(model_manager, chat_session, chat_log):
+    # the command set the model picks from, and what each command actually does here
+    model_names = list(config.LOCAL_MODELS) + list(config.REMOTE_MODELS) if model_manager else []
+    commands = default_commands(model_names)
+    dispatcher = CommandDispatcher()
+
+    def set_volume(level):
+        if not tts.audio_output:
+            return "No volume control without the audio output (AUDIO_OUTPUT_ENABLED)."
+        tts.audio_output.volume = level / 100.0
+        return f"Volume {level}%."
+
+    def stop_speaking():
+        tts.stop()
+        return "Stopped."
+
+    def set_animation(mode):
+        if not ai_indicator:
+            return "The indicator isn't running."
+        ai_indicator.animation_mode = mode
+        return f"Animation: {mode}."
+
+    dispatcher.register("set_volume", set_volume)
+    dispatcher.register("stop_speaking", stop_speaking)
+    dispatcher.register("search_history", lambda query: print_search_results(chat_log, query))
+    dispatcher.register("show_memory", lambda: print_memory_report(model_manager))
+    dispatcher.register("set_animation", set_animation)
+    dispatcher.register("switch_model", lambda name: switch_model(model_manager, chat_session, name))
+    return commands, dispatcher
+
+# FOURTH - HELPER N
+def run_command(chat_session, commands, request):
+    # False when the model says it's not a command ("chat"), the caller answers it normally then
+    command_set, dispatcher = commands
+    try:
+        command = request_command(chat_session, command_set, request, max_tokens=config.COMMAND_MAX_TOKENS)
+    except ValueError as e:
+        print(f"Couldn't turn that into a command: {e}")
+        return True
+    if command.action == "chat":
+        return False
+    message = dispatcher.dispatch(command)
+    if message:
+        print(f"\nAssistant: {message}")
+    return True
 
+# FOURTH - HELPER O
+def compare_models(model_manager, chat_session, prompt):
+    if not model_manager or not prompt:
+        print("Usage: /compare <prompt> (asks the COMPARE_MODELS from config.py)")
+        return
+    # loading the others mustn't evict the chat's model (or each other)
+    active = model_manager.key_of(chat_session.backend)
+    keep = [active] if active else []
+    backends = []
+    for name in config.COMPARE_MODELS or list(config.REMOTE_MODELS):
+        mode = "local" if name in config.LOCAL_MODELS else "remote" if name in config.REMOTE_MODELS else None
+        if mode is None:
+            print(f"Unknown model '{name}' in COMPARE_MODELS, skipped.")
+            continue
+        backends.append((name, load_model(model_manager, mode, name, keep=keep)))
+        keep.append((mode, name))
+    chat_session.cancel_prefill()  # a local model in the list may be the one prefilling
+    start = time.perf_counter()
+    # everyone gets the same conversation so far, nothing is added to it
+    results = ask_all([(backend, prompt, list(chat_session.history)) for _, backend in backends])
+    for (name, _), result in zip(backends, results):
+        print(f"\n[{name}, {result['seconds']:.1f}s] {result['reply']}")
+    print(f"\n{len(results)} answers in {time.perf_counter() - start:.1f}s")
+    if active:
+        model_manager.touch(active)  # still the model in use, not the oldest one
 
 if __name__ == "__main__":
     run_setup()
@@ -175,9 +583,11 @@ if __name__ == "__main__":
     selected_mode = select_mode()
     selected_model = select_model(selected_mode)
 
-    # Initialize the model
-    model_backend_obj = get_backend(selected_mode, selected_model)
+    # Initialize the model (through the manager so /model can switch later without a restart)
+    model_manager = open_model_manager()
+    model_backend_obj = load_model(model_manager, selected_mode, selected_model)
 
     # Initialize chat session and start conversation loop
-    run_chat_session(model_backend_obj)
+    recorder = open_session_recorder(selected_mode, selected_model, model_backend_obj)
+    run_chat_session(model_backend_obj, model_manager, recorder)
     
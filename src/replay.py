@@ -0,0 +1,69 @@
+# src/replay.py
+# Replays a session recorded with SESSION_RECORD_DIR and prints how its latencies compare
+# with the original run. Without --live the recorded replies are played back, which is handy
+# for timing the STT/TTS side or the chat plumbing on its own.
+#
+# usage (from the project root, same place you run main.py):
+#   python src/replay.py sessions/session-20250101-120000.jsonl
+#   python src/replay.py sessions/session-20250101-120000.jsonl --live --stt --tts
+#   python src/replay.py sessions/session-20250101-120000.jsonl --realtime --json diff.json
+import argparse
+import json
+import os
+import sys
+
+import config
+from components.autotune import read_user_config
+from components.session_replay import SessionReplayer, format_diff
+
+CONFIG_PATH = os.path.join(os.getcwd(), "user_config.json")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay a recorded chat session and diff its latency")
+    parser.add_argument("session", help=".jsonl file written by the session recorder")
+    parser.add_argument("--live", action="store_true", help="run the prompts through the recorded model(s) again")
+    parser.add_argument("--stt", action="store_true", help="transcribe recorded mic audio with whisper again")
+    parser.add_argument("--tts", action="store_true", help="speak the replies again")
+    parser.add_argument("--realtime", action="store_true", help="keep the original pauses and reply timing")
+    parser.add_argument("--models-dir", help="defaults to models_dir from user_config.json")
+    parser.add_argument("--json", help="also write the diff here")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.session):
+        print(f"session file not found: {args.session}")
+        return 2
+
+    backend_factory = None
+    if args.live:
+        from router import get_backend
+        config.MODELS_DIR = args.models_dir or read_user_config(CONFIG_PATH).get("models_dir")
+
+        def backend_factory(mode, model):
+            print(f"loading {mode} model {model}...")
+            return get_backend(mode, model)
+
+    stt = None
+    if args.stt:
+        from components.speech_to_text import WhisperSTT
+        stt = WhisperSTT(config.WHISPER_MODEL_SIZE, samplerate=16000)
+
+    tts = None
+    if args.tts:
+        from components.text_to_speech import tts
+
+    replayer = SessionReplayer(args.session, backend_factory=backend_factory, stt=stt, tts=tts, realtime=args.realtime)
+    header = replayer.header
+    print(f"{len(replayer.turns)} turns recorded with {header.get('mode')} model {header.get('model')}")
+    replayer.replay()
+    diff = replayer.diff()
+    print(format_diff(diff))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(diff, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
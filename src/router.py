@@ -5,17 +5,83 @@ import os
 import config 
 from components.local_model import LocalModel
 from components.remote_model import RemoteModel
+from components.inference_worker import WorkerModel
+from components.autotune import load_tuned_params, DEFAULT_LLAMA_PARAMS
+from components.model_registry import ModelRegistry, estimate_resident_mb
+from components.memory_budget import profile, plan_runtime, is_low_memory, kv_bytes
 
 # switchboard that decides which backend to use
 # local: instantiates local model with the correct model path
 # remote: instantiates remote model with the correct endpoint
 def get_backend(selected_mode, selected_model):
     if selected_mode == "local":
-        model_path = os.path.join(config.MODELS_DIR, config.LOCAL_MODELS[selected_model])
+        # entries are either just a filename or a dict with per-model options
+        entry = config.LOCAL_MODELS[selected_model]
+        options = entry if isinstance(entry, dict) else {"file": entry}
+        model_path = os.path.join(config.MODELS_DIR, options["file"])
         print("model path: ", model_path)
-        return LocalModel(model_path, config.MODELS_DIR)
+        # architecture / context length / chat template straight from the GGUF header
+        model_info = ModelRegistry(config.MODELS_DIR).info(options["file"]) if options["file"] else None
+        # settings from `python src/calibrate.py` for this machine (if it was ever run),
+        # then shrunk to fit the memory budget
+        llama_params = plan_memory(selected_model, model_info,
+                                   dict(DEFAULT_LLAMA_PARAMS, **load_tuned_params(config.USER_CONFIG_PATH, model_path)))
+        model_options = dict(
+            draft=options.get("draft"),
+            draft_tokens=options.get("draft_tokens", 8),
+            llama_params=llama_params,
+            model_info=model_info,
+            # persona, evaluated once per model and then restored from a snapshot
+            system_prompt=config.SYSTEM_PROMPT,
+            prompt_cache_dir=config.PROMPT_CACHE_DIR or os.path.join(config.MODELS_DIR, "prompt_cache"),
+        )
+        if config.INFERENCE_WORKER:
+            # llama.cpp in its own process, pinned away from the UI/audio core
+            return WorkerModel(model_path, config.MODELS_DIR, cpus=config.INFERENCE_WORKER_CPUS, **model_options)
+        return LocalModel(model_path, config.MODELS_DIR, **model_options)
     elif selected_mode == "remote":
         model_config = config.REMOTE_MODELS[selected_model]
-        return RemoteModel(model_config)
+        return RemoteModel(model_config, system_prompt=config.SYSTEM_PROMPT, max_concurrency=config.REMOTE_MAX_CONCURRENCY)
     else:
-        raise ValueError("Invalid MODE setting")
\ No newline at end of file
+        raise ValueError("Invalid MODE setting")
+
+# context size / kv cache type / mlock (and Whisper size) that fit config.MEMORY_BUDGET_MB
+# next to everything else that is switched on
+def plan_memory(name, model_info, llama_params):
+    components = ["python"]
+    if config.GUI_ENABLED:
+        components.append("gui")
+    if config.TTS_ENABLED and config.AUDIO_OUTPUT_ENABLED:
+        components.append("audio")
+    plan = plan_runtime(
+        model_info, llama_params,
+        budget_mb=config.MEMORY_BUDGET_MB or profile.budget_mb,
+        components=components,
+        whisper_size=config.WHISPER_MODEL_SIZE if config.STT_ENABLED else None,
+        embedder=config.MEMORY_ENABLED and config.CHAT_LOG_ENABLED,
+        low_memory=is_low_memory(config.RUNTIME_PROFILE),
+        want_mlock=llama_params.get('use_mlock', False),
+    )
+    profile.plans[name] = plan
+    if plan['changes']:
+        print(f"memory plan ({plan['total_mb']}/{plan['budget_mb']} MB): {', '.join(plan['changes'])}")
+    if not plan['fits']:
+        print(f"warning: {name} needs ~{plan['total_mb']} MB even at the smallest settings, "
+              f"budget is {plan['budget_mb']} MB - expect swapping")
+    if plan['whisper_size']:
+        config.WHISPER_MODEL_SIZE = plan['whisper_size']
+    return plan['llama_params']
+
+# what loading selected_model will roughly cost in RAM, so ModelManager can make room first
+def estimate_backend_mb(selected_mode, selected_model):
+    if selected_mode != "local":
+        return 0
+    entry = config.LOCAL_MODELS[selected_model]
+    filename = entry["file"] if isinstance(entry, dict) else entry
+    info = ModelRegistry(config.MODELS_DIR).info(filename) if filename else None
+    if not info:
+        return 0
+    # the settings the memory plan will pick, if it already planned this model
+    plan = profile.plans.get(selected_model)
+    params = plan['llama_params'] if plan else load_tuned_params(config.USER_CONFIG_PATH, os.path.join(config.MODELS_DIR, filename))
+    return estimate_resident_mb(info, params.get("n_ctx", DEFAULT_LLAMA_PARAMS["n_ctx"]), kv_bytes(params))